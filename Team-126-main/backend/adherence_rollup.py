@@ -0,0 +1,108 @@
+"""
+Daily medication adherence rollup
+
+medication_adherence_daily holds per-user, per-day dose counts. Counts are
+adjusted in the same transaction as the dose change that affects them
+(scheduling doses, recording a dose status); rebuild_adherence_rollup
+recomputes them from medication_doses for backfills and bulk changes such as
+deleting a medication.
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from health_models import Medication, MedicationDose, MedicationAdherenceDaily
+
+# Dose statuses with their own rollup column
+ROLLUP_STATUSES = ("taken", "missed", "skipped")
+
+ROLLUP_COUNTS = ("scheduled",) + ROLLUP_STATUSES
+
+
+def adjust_adherence_rollup(db: Session, deltas: Dict[Tuple[int, date], Dict[str, int]]):
+    """
+    Add count deltas to the rollup with one multi-row upsert
+
+    Args:
+        db: Database session (the caller commits)
+        deltas: (user_id, day) -> {count column: delta}
+    """
+    rows = []
+    for (user_id, day), counts in deltas.items():
+        if any(counts.values()):
+            rows.append({"user_id": user_id, "day": day, **{c: counts.get(c, 0) for c in ROLLUP_COUNTS}})
+    if not rows:
+        return
+
+    upsert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    table = MedicationAdherenceDaily.__table__
+    stmt = upsert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={c: table.c[c] + stmt.excluded[c] for c in ROLLUP_COUNTS}
+    )
+    db.execute(stmt)
+
+
+def record_doses_scheduled(db: Session, user_id: int, scheduled_times: Iterable[datetime]):
+    """Count newly created doses in the rollup"""
+    per_day = Counter(scheduled_time.date() for scheduled_time in scheduled_times)
+    adjust_adherence_rollup(db, {(user_id, day): {"scheduled": count} for day, count in per_day.items()})
+
+
+def record_dose_status_change(
+    db: Session,
+    user_id: int,
+    scheduled_time: datetime,
+    old_status: Optional[str],
+    new_status: Optional[str]
+):
+    """Move a dose between status counts in the rollup"""
+    if old_status == new_status:
+        return
+
+    counts: Dict[str, int] = defaultdict(int)
+    if old_status in ROLLUP_STATUSES:
+        counts[old_status] -= 1
+    if new_status in ROLLUP_STATUSES:
+        counts[new_status] += 1
+    adjust_adherence_rollup(db, {(user_id, scheduled_time.date()): counts})
+
+
+def rebuild_adherence_rollup(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute rollup rows from medication_doses with one INSERT ... SELECT
+
+    Args:
+        db: Database session (the caller commits)
+        user_id: Only rebuild this user's rows (all users if None)
+
+    Returns:
+        Number of rollup rows written
+    """
+    table = MedicationAdherenceDaily.__table__
+    clear = delete(table)
+    if user_id is not None:
+        clear = clear.where(table.c.user_id == user_id)
+    db.execute(clear)
+
+    day = func.date(MedicationDose.scheduled_time)
+    counts = select(
+        Medication.user_id,
+        day,
+        func.count(),
+        *(func.count().filter(MedicationDose.status == status) for status in ROLLUP_STATUSES)
+    ).select_from(MedicationDose).join(Medication, Medication.id == MedicationDose.medication_id)
+    if user_id is not None:
+        counts = counts.where(Medication.user_id == user_id)
+    counts = counts.group_by(Medication.user_id, day)
+
+    result = db.execute(insert(table).from_select(["user_id", "day", *ROLLUP_COUNTS], counts))
+    return result.rowcount
+
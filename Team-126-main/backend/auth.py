@@ -4,13 +4,14 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import os
 from dotenv import load_dotenv
 import json
 import numpy as np
 
-from database import get_db
+from database import get_async_db
 from models import User
 
 load_dotenv()
@@ -83,7 +84,7 @@ def authenticate_face(db: Session, face_encoding_list: list) -> Optional[User]:
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[User]:
     if token is None:
         return None
@@ -104,7 +105,7 @@ async def get_current_user(
     except (ValueError, TypeError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,80 @@
+"""
+Backfill embeddings for chat messages stored without one
+
+Messages are saved with a NULL embedding and filled in by the background
+embedding writer. Run this script to embed any that were missed (server
+restarts, provider outages, messages stored before the writer existed).
+
+Usage:
+    python backfill_embeddings.py [--batch-size 250] [--limit N]
+"""
+
+import argparse
+import time
+
+from database import SessionLocal
+from embedding_writer import write_message_embeddings
+from embeddings import generate_embeddings_batch
+from models import Message
+
+
+def backfill_embeddings(batch_size: int = 250, limit: int = None) -> int:
+    """
+    Embed messages with a NULL embedding, oldest first
+
+    Args:
+        batch_size: Messages embedded and written per batch
+        limit: Optional maximum number of messages to process
+
+    Returns:
+        Number of messages updated
+    """
+    db = SessionLocal()
+    updated = 0
+    processed = 0
+    last_id = 0
+    start = time.time()
+
+    try:
+        while limit is None or processed < limit:
+            size = batch_size if limit is None else min(batch_size, limit - processed)
+            rows = (
+                db.query(Message.id, Message.content)
+                .filter(Message.embedding.is_(None), Message.id > last_id)
+                .order_by(Message.id)
+                .limit(size)
+                .all()
+            )
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            processed += len(rows)
+
+            rows = [row for row in rows if row.content and row.content.strip()]
+            embeddings = generate_embeddings_batch([row.content for row in rows])
+
+            batch = {row.id: embedding for row, embedding in zip(rows, embeddings) if embedding is not None}
+            updated += write_message_embeddings(db, batch)
+
+            failed = len(rows) - len(batch)
+            print(f"  Processed {processed} messages, updated {updated}" + (f" ({failed} failed in this batch)" if failed else ""))
+
+    finally:
+        db.close()
+
+    elapsed = time.time() - start
+    print(f"✓ Backfilled {updated} message embeddings in {elapsed:.1f}s")
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill missing chat message embeddings")
+    parser.add_argument("--batch-size", type=int, default=250, help="Messages per batch (default: 250)")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of messages to process")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Backfilling message embeddings...")
+    print("=" * 60)
+    backfill_embeddings(batch_size=args.batch_size, limit=args.limit)
@@ -0,0 +1,250 @@
+"""
+Bounded prompt context for long conversations
+
+The model sees a conversation through a fixed-size window instead of its
+whole history:
+- the latest turns verbatim (CONTEXT_RECENT_TURNS, plus up to
+  CONTEXT_SUMMARY_EVERY_TURNS - 1 not yet summarized)
+- a running summary of everything older, stored on the conversation and
+  extended in the background once CONTEXT_SUMMARY_EVERY_TURNS turns have
+  left the window
+- a few older messages recalled by hybrid search when they match the
+  current user message
+
+A turn is a user message and the replies that follow it.
+"""
+
+from typing import Dict, List, Optional
+import asyncio
+import os
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Conversation, Message
+from embeddings import generate_embedding_async, get_similar_messages
+from chatbot import summarize_conversation
+
+# Turns always kept verbatim in the prompt
+CONTEXT_RECENT_TURNS = int(os.getenv("CONTEXT_RECENT_TURNS", "8"))
+
+# Turns folded into the summary at a time
+CONTEXT_SUMMARY_EVERY_TURNS = int(os.getenv("CONTEXT_SUMMARY_EVERY_TURNS", "4"))
+
+# Older messages recalled per user message
+CONTEXT_RECALL_LIMIT = int(os.getenv("CONTEXT_RECALL_LIMIT", "3"))
+
+# Minimum cosine similarity for a recalled message
+CONTEXT_RECALL_THRESHOLD = float(os.getenv("CONTEXT_RECALL_THRESHOLD", "0.75"))
+
+# Characters kept per recalled message and for the summary
+CONTEXT_RECALL_MAX_CHARS = 600
+CONTEXT_SUMMARY_MAX_CHARS = 2000
+
+# Most turns ever sent verbatim (reached only while a summary is pending or failing)
+MAX_WINDOW_TURNS = CONTEXT_RECENT_TURNS + CONTEXT_SUMMARY_EVERY_TURNS
+
+
+def split_turns(messages: List[Dict]) -> List[List[Dict]]:
+    """Group messages into turns, each starting at a user message"""
+    turns: List[List[Dict]] = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def load_context_messages(db: Session, conversation_id: int, after_message_id: Optional[int]) -> List[Dict]:
+    """
+    Messages not yet covered by the summary, oldest first
+
+    At most enough messages for MAX_WINDOW_TURNS long turns are loaded, so a
+    conversation whose summaries keep failing is still read in one bounded
+    query.
+
+    Args:
+        db: Database session (sync; use AsyncSession.run_sync from async code)
+        conversation_id: Conversation ID
+        after_message_id: Last message covered by the summary (None for all)
+
+    Returns:
+        Message dicts with id, role and content
+    """
+    query = select(Message.id, Message.role, Message.content).where(Message.conversation_id == conversation_id)
+    if after_message_id is not None:
+        query = query.where(Message.id > after_message_id)
+    rows = db.execute(query.order_by(Message.id.desc()).limit(MAX_WINDOW_TURNS * 4)).all()
+    return [{"id": row.id, "role": row.role, "content": row.content} for row in reversed(rows)]
+
+
+def store_summary(conversation_id: int, summary: str, summary_message_id: int) -> bool:
+    """
+    Save a running summary unless one covering later messages is already stored
+
+    Returns:
+        Whether the summary was stored
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(Conversation).where(
+                Conversation.id == conversation_id,
+                or_(Conversation.summary_message_id.is_(None), Conversation.summary_message_id < summary_message_id)
+            ).values(summary=summary, summary_message_id=summary_message_id)
+        )
+        db.commit()
+        return result.rowcount > 0
+    finally:
+        db.close()
+
+
+def recall_messages(
+    conversation_id: int,
+    query_text: str,
+    query_embedding: Optional[List[float]],
+    before_message_id: int
+) -> List[Dict]:
+    """get_similar_messages on its own session (safe to run in a worker thread)"""
+    db = SessionLocal()
+    try:
+        return get_similar_messages(
+            query_embedding,
+            conversation_id,
+            db,
+            limit=CONTEXT_RECALL_LIMIT,
+            similarity_threshold=CONTEXT_RECALL_THRESHOLD,
+            query_text=query_text,
+            before_message_id=before_message_id
+        )
+    finally:
+        db.close()
+
+
+def _clip(text: str, limit: int) -> str:
+    """Text cut to limit characters"""
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+class ConversationContext:
+    """Prompt window, running summary and recall for one conversation"""
+
+    def __init__(
+        self,
+        conversation_id: int,
+        summary: Optional[str] = None,
+        summary_message_id: Optional[int] = None,
+        messages: Optional[List[Dict]] = None
+    ):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.summary_message_id = summary_message_id
+        self.messages: List[Dict] = messages or []  # Not yet summarized, oldest first
+        self._summarizing: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def load(cls, db: AsyncSession, conversation: Conversation) -> "ConversationContext":
+        """Load the summary and the messages after it"""
+        messages = await db.run_sync(load_context_messages, conversation.id, conversation.summary_message_id)
+        return cls(conversation.id, conversation.summary, conversation.summary_message_id, messages)
+
+    def append(self, message: Dict):
+        """Add a stored message (dict with id, role and content)"""
+        self.messages.append(message)
+
+    def window(self) -> List[Dict]:
+        """Messages sent verbatim, oldest first"""
+        turns = split_turns(self.messages)[-MAX_WINDOW_TURNS:]
+        return [message for turn in turns for message in turn]
+
+    def has_older_messages(self) -> bool:
+        """Whether some messages are only reachable through the summary or recall"""
+        return self.summary_message_id is not None or len(split_turns(self.messages)) > MAX_WINDOW_TURNS
+
+    async def recall(self, query_text: str) -> List[Dict]:
+        """
+        Older messages relevant to the current user message
+
+        Returns:
+            Message dicts from get_similar_messages, best first (empty if
+            every message is already in the window or recall fails)
+        """
+        window = self.window()
+        if not self.has_older_messages() or not window:
+            return []
+
+        try:
+            query_embedding = await generate_embedding_async(query_text)
+            return await asyncio.to_thread(
+                recall_messages, self.conversation_id, query_text, query_embedding, window[0]["id"]
+            )
+        except Exception as e:
+            print(f"[Context] Recall failed for conversation {self.conversation_id}: {str(e)}")
+            return []
+
+    def prompt_messages(self, recalled: Optional[List[Dict]] = None) -> List[Dict[str, str]]:
+        """
+        Messages for get_chatbot_response / stream_chatbot_response
+
+        The summary is put in front of the first message of the window and
+        recalled messages in front of the last (current) user message, so
+        the message list keeps alternating roles.
+
+        Args:
+            recalled: Output of recall for the current user message
+
+        Returns:
+            Message dicts ending with the current user message
+        """
+        messages = [{"role": message["role"], "content": message["content"]} for message in self.window()]
+        if not messages:
+            return messages
+
+        if self.summary:
+            messages[0]["content"] = (
+                f"[Summary of our earlier conversation]\n{self.summary}\n\n"
+                f"[Conversation continues]\n{messages[0]['content']}"
+            )
+
+        if recalled:
+            lines = "\n".join(
+                f"- {message['role']}: {_clip(message['content'], CONTEXT_RECALL_MAX_CHARS)}"
+                for message in sorted(recalled, key=lambda message: message["id"])
+            )
+            messages[-1]["content"] = f"[Relevant earlier messages]\n{lines}\n\n[Current message]\n{messages[-1]['content']}"
+
+        return messages
+
+    def maybe_summarize(self):
+        """Start folding old turns into the summary once enough have left the window"""
+        if self._summarizing is not None and not self._summarizing.done():
+            return
+        turns = split_turns(self.messages)
+        if len(turns) - CONTEXT_RECENT_TURNS < CONTEXT_SUMMARY_EVERY_TURNS:
+            return
+
+        folded = [message for turn in turns[:len(turns) - CONTEXT_RECENT_TURNS] for message in turn]
+        self._summarizing = asyncio.get_running_loop().create_task(self._summarize(folded))
+
+    async def _summarize(self, folded: List[Dict]):
+        """Extend the summary with folded messages and drop them from the window"""
+        try:
+            summary = await summarize_conversation(self.summary, folded)
+            summary = _clip(summary, CONTEXT_SUMMARY_MAX_CHARS)
+            last_id = folded[-1]["id"]
+            if not await asyncio.to_thread(store_summary, self.conversation_id, summary, last_id):
+                print(f"[Context] Newer summary already stored for conversation {self.conversation_id}")
+            self.summary = summary
+            self.summary_message_id = last_id
+            self.messages = [message for message in self.messages if message["id"] > last_id]
+            print(f"[Context] Summarized {len(folded)} messages of conversation {self.conversation_id}")
+        except Exception as e:
+            print(f"[Context] Summary failed for conversation {self.conversation_id}: {str(e)}")
+
+    async def close(self):
+        """Wait for a running summary so it is not lost when the connection ends"""
+        if self._summarizing is not None:
+            await asyncio.gather(self._summarizing, return_exceptions=True)
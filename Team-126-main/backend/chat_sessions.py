@@ -0,0 +1,156 @@
+"""
+Conversation session layer for the Gemini chatbot
+
+Keeps one live ChatSession per conversation_id so each websocket turn costs a
+single model call. Sessions are rebuilt from stored messages in one step when
+they are missing or out of sync, and idle sessions are evicted.
+"""
+
+from typing import List, Dict, Optional
+from collections import OrderedDict
+import os
+import time
+from vertexai.generative_models import ChatSession, Content, Part, GenerativeModel
+
+# Sessions unused for this long are dropped (seconds)
+SESSION_IDLE_SECONDS = int(os.getenv("CHAT_SESSION_IDLE_SECONDS", "1800"))
+
+# Upper bound on live sessions kept in memory
+MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX", "500"))
+
+
+def build_history(messages: List[Dict[str, str]]) -> List[Content]:
+    """
+    Convert stored messages into a Gemini Content history
+
+    Consecutive messages with the same role are merged so the history
+    alternates between user and model turns.
+
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+
+    Returns:
+        List of Content objects suitable for start_chat(history=...)
+    """
+    turns = []
+
+    for msg in messages:
+        content = msg.get('content')
+        if not content:
+            continue
+
+        role = "model" if msg['role'] == 'assistant' else "user"
+        if turns and turns[-1][0] == role:
+            turns[-1][1].append(content)
+        else:
+            turns.append((role, [content]))
+
+    return [
+        Content(role=role, parts=[Part.from_text("\n\n".join(texts))])
+        for role, texts in turns
+    ]
+
+
+def _history_head(messages: List[Dict[str, str]]) -> Optional[str]:
+    """First message of a history (changes when the context window slides)"""
+    return messages[0]['content'] if messages else None
+
+
+class _SessionEntry:
+    """A live chat session, the number of stored messages it covers and its first message"""
+
+    def __init__(self, chat: ChatSession, message_count: int, head: Optional[str]):
+        self.chat = chat
+        self.message_count = message_count
+        self.head = head
+        self.last_used = time.monotonic()
+
+
+class ChatSessionStore:
+    """LRU store of live chat sessions keyed by conversation_id"""
+
+    def __init__(self, idle_seconds: int = SESSION_IDLE_SECONDS, max_sessions: int = MAX_SESSIONS):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[int, _SessionEntry]" = OrderedDict()
+
+    def get_session(
+        self,
+        conversation_id: int,
+        model: GenerativeModel,
+        prior_messages: List[Dict[str, str]]
+    ) -> ChatSession:
+        """
+        Get the live session for a conversation, rebuilding it if needed
+
+        The cached session is reused only if it covers exactly the messages
+        stored before the current turn and starts at the same message (the
+        context window has not slid to a new summary); otherwise it is
+        rebuilt in one call from prior_messages.
+
+        Args:
+            conversation_id: ID of the conversation
+            model: Model used to start a new chat if one must be rebuilt
+            prior_messages: Messages before the current user turn (the context window)
+
+        Returns:
+            ChatSession ready to receive the next user message
+        """
+        self.evict_idle()
+
+        head = _history_head(prior_messages)
+        entry = self._sessions.get(conversation_id)
+        if entry is not None and entry.head is None:
+            # Started empty: its first message is the first one sent to it
+            entry.head = head
+        if entry is None or entry.message_count != len(prior_messages) or entry.head != head:
+            if entry is not None:
+                print(f"[Sessions] Rebuilding out-of-sync session for conversation {conversation_id}")
+            chat = model.start_chat(history=build_history(prior_messages))
+            entry = _SessionEntry(chat, len(prior_messages), head)
+            self._sessions[conversation_id] = entry
+
+        entry.last_used = time.monotonic()
+        self._sessions.move_to_end(conversation_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+        return entry.chat
+
+    def complete_turn(self, conversation_id: int, turn_messages: int = 2):
+        """
+        Record that a turn finished and its messages will be stored
+
+        Args:
+            conversation_id: ID of the conversation
+            turn_messages: Number of stored messages the turn adds (user + assistant)
+        """
+        entry = self._sessions.get(conversation_id)
+        if entry is not None:
+            entry.message_count += turn_messages
+            entry.last_used = time.monotonic()
+
+    def drop(self, conversation_id: int):
+        """Discard a session so the next turn rebuilds it from the database"""
+        self._sessions.pop(conversation_id, None)
+
+    def evict_idle(self) -> int:
+        """
+        Remove sessions that have been idle longer than idle_seconds
+
+        Returns:
+            Number of sessions evicted
+        """
+        cutoff = time.monotonic() - self.idle_seconds
+        expired = [cid for cid, entry in self._sessions.items() if entry.last_used < cutoff]
+        for cid in expired:
+            del self._sessions[cid]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+# Process-wide session store
+session_store = ChatSessionStore()
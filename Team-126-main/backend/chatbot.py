@@ -1,4 +1,5 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import os
 import json
 from google.cloud import aiplatform
@@ -8,7 +9,9 @@ import vertexai
 from dotenv import load_dotenv
 
 from prompts import HOMELESS_ASSISTANT_PROMPT, REPORT_GENERATION_PROMPT
-from tools import get_location_func, search_web_func, perform_web_search
+from tools import get_location_func, search_web_func, perform_web_search_async
+from tools.result_encoding import encode_search_results, verbose_search_tokens, tool_token_stats
+from chat_sessions import session_store, build_history
 
 load_dotenv()
 
@@ -61,165 +64,280 @@ except Exception as e:
     print("  3. Ensure the service account has Vertex AI permissions")
 
 
-async def get_chatbot_response(messages: List[Dict[str, str]], conversation: Optional[object] = None) -> str:
-    """
-    Get response from Vertex AI chatbot using Gemini with Function Calling
+_chat_model: Optional[GenerativeModel] = None
 
-    Args:
-        messages: List of message dictionaries with 'role' and 'content' keys
-        conversation: Optional Conversation object containing user's location (latitude, longitude)
+# Generation settings shared by every chat turn
+CHAT_GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'max_output_tokens': 20000,
+}
+
+GREETING = "Hello! I'm here to help. How can I assist you today?"
+
+# Start of the reply sent when the model call fails
+CONNECTION_ERROR_REPLY = "I apologize, but I'm having trouble connecting right now."
+
+
+def get_chat_model() -> GenerativeModel:
+    """
+    Get the shared chat model with the assistant prompt and tools (created once)
 
     Returns:
-        Assistant's response as a string or JSON for function calls
+        GenerativeModel configured for the homeless assistant
     """
-    try:
+    global _chat_model
+
+    if _chat_model is None:
         # Combine all function declarations into a single tool
         # Vertex AI requires all functions in one Tool object
         combined_tool = Tool(
             function_declarations=[get_location_func, search_web_func],
         )
 
-        # Initialize the model with the combined tool
-        model = GenerativeModel(
+        _chat_model = GenerativeModel(
             model_name="gemini-2.5-pro",
             system_instruction=HOMELESS_ASSISTANT_PROMPT,
             tools=[combined_tool],
         )
 
-        # Start chat session
-        chat = model.start_chat()
+    return _chat_model
+
+
+def _get_chat(messages: List[Dict[str, str]], conversation_id: Optional[int]) -> ChatSession:
+    """Get the chat session positioned before the last message in messages"""
+    model = get_chat_model()
+
+    # Reuse the live chat session for this conversation (rebuilt from
+    # stored history in a single step if missing or out of sync)
+    if conversation_id is not None:
+        return session_store.get_session(conversation_id, model, messages[:-1])
+    return model.start_chat(history=build_history(messages[:-1]))
+
+
+def _location_request(function_call, conversation_id: Optional[int]) -> str:
+    """Build the request_location payload the frontend recognizes"""
+    reason = function_call.args.get("reason", "to assist you better")
+
+    # The function call is answered by the next user turn,
+    # so rebuild the session from stored messages then
+    if conversation_id is not None:
+        session_store.drop(conversation_id)
+
+    return json.dumps({
+        "type": "request_location",
+        "reason": reason,
+        "message": f"I'd like to help you find nearby resources. May I access your location {reason}?"
+    })
 
-        # Replay conversation history
-        for msg in messages[:-1]:  # All messages except the last one
-            if msg['role'] == 'user':
-                # Send user message and get response (we'll discard it since we're replaying)
-                chat.send_message(msg['content'])
-            # Note: assistant messages are automatically tracked by the chat session
+
+async def _run_search_tool(function_call, conversation: Optional[object]) -> Tuple[Content, List[Dict]]:
+    """
+    Execute the search_web function call
+
+    Returns:
+        Tuple of (function response content for the model, structured resources found)
+    """
+    query = function_call.args.get("query", "")
+    max_results = function_call.args.get("max_results", 5)
+    print(f"Performing web search: {query}")
+
+    # Get location from conversation if available
+    latitude = None
+    longitude = None
+    if conversation and hasattr(conversation, 'latitude') and hasattr(conversation, 'longitude'):
+        latitude = conversation.latitude
+        longitude = conversation.longitude
+        print(f"Using conversation location: {latitude}, {longitude}")
+
+    search_results = await perform_web_search_async(query, max_results, latitude, longitude)
+
+    # Structured resources go to message_resources, not to the model
+    resources = [resource for result in search_results for resource in result.get('resources', [])]
+
+    # Compact, budgeted encoding for the model
+    results_text, tokens = encode_search_results(query, search_results, fields=function_call.args.get("fields"))
+    verbose_tokens = verbose_search_tokens(query, search_results)
+    tool_token_stats.record("search_web", tokens, verbose_tokens)
+    print(f"[Tool Encoding] search_web: ~{tokens} tokens (verbose format ~{verbose_tokens})")
+
+    # Send search results back to the model to continue the conversation
+    function_response = Part.from_function_response(
+        name="search_web",
+        response={"results": results_text}
+    )
+
+    return Content(parts=[function_response]), resources
+
+
+def _response_parts(response) -> list:
+    """Get the content parts of a (possibly partial) model response"""
+    if response.candidates and response.candidates[0].content.parts:
+        return list(response.candidates[0].content.parts)
+    return []
+
+
+async def _stream_turn(chat: ChatSession, content, text_parts: List[str], function_calls: list):
+    """
+    Send content with streaming and yield chunk events for reply text
+
+    Text is also collected into text_parts and any function calls the
+    model makes are collected into function_calls.
+    """
+    responses = await chat.send_message_async(
+        content,
+        generation_config=CHAT_GENERATION_CONFIG,
+        stream=True
+    )
+    async for chunk in responses:
+        for part in _response_parts(chunk):
+            if hasattr(part, 'function_call') and part.function_call:
+                function_calls.append(part.function_call)
+            else:
+                text = getattr(part, 'text', None)
+                if text:
+                    text_parts.append(text)
+                    yield {"type": "chunk", "text": text}
+
+
+async def get_chatbot_response(messages: List[Dict[str, str]], conversation: Optional[object] = None) -> Tuple[str, List[Dict]]:
+    """
+    Get response from Vertex AI chatbot using Gemini with Function Calling
+
+    Each call costs a single model round trip: the conversation's live chat
+    session is reused, or rebuilt once from the earlier messages.
+
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        conversation: Optional Conversation object containing id and user's location (latitude, longitude)
+
+    Returns:
+        Tuple of (assistant's response as a string or JSON for function
+        calls, resources found by the search tool)
+    """
+    conversation_id = getattr(conversation, 'id', None)
+
+    try:
+        if not messages:
+            return GREETING, []
+
+        chat = _get_chat(messages, conversation_id)
 
         # Send the actual last message and get response
-        if messages:
-            last_message = messages[-1]['content']
-            response = chat.send_message(
-                last_message,
-                generation_config={
-                    'temperature': 0.7,
-                    'max_output_tokens': 20000,
-                }
-            )
-
-            # Debug: Print response structure
-            print(f"Response candidates: {len(response.candidates)}")
-            if response.candidates:
-                print(f"Response parts: {len(response.candidates[0].content.parts)}")
-                for idx, part in enumerate(response.candidates[0].content.parts):
-                    print(f"Part {idx}: {part}")
-
-            # Check if the model wants to call a function
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if hasattr(part, 'function_call') and part.function_call:
-                        function_call = part.function_call
-                        print(f"Function call detected: {function_call.name}")
-
-                        if function_call.name == "request_user_location":
-                            reason = function_call.args.get("reason", "to assist you better")
-                            # Return a special JSON response that frontend will recognize
-                            return json.dumps({
-                                "type": "request_location",
-                                "reason": reason,
-                                "message": f"I'd like to help you find nearby resources. May I access your location {reason}?"
-                            })
-
-                        elif function_call.name == "search_web":
-                            # Execute the web search
-                            query = function_call.args.get("query", "")
-                            max_results = function_call.args.get("max_results", 5)
-                            print(f"Performing web search: {query}")
-
-                            # Get location from conversation if available
-                            latitude = None
-                            longitude = None
-                            if conversation and hasattr(conversation, 'latitude') and hasattr(conversation, 'longitude'):
-                                latitude = conversation.latitude
-                                longitude = conversation.longitude
-                                print(f"Using conversation location: {latitude}, {longitude}")
-
-                            search_results = perform_web_search(query, max_results, latitude, longitude)
-
-                            # Extract resource data marker if present (before formatting for LLM)
-                            resource_data_marker = ""
-                            for result in search_results:
-                                if 'snippet' in result and '<!-- RESOURCE_DATA:' in result['snippet']:
-                                    import re
-                                    match = re.search(r'<!-- RESOURCE_DATA:.+? -->', result['snippet'], re.DOTALL)
-                                    if match:
-                                        resource_data_marker = match.group(0)
-                                        print(f"[Resource Data] Extracted marker from search results")
-                                        break
-
-                            # Format search results for the LLM
-                            results_text = f"Search results for '{query}':\n\n"
-                            for idx, result in enumerate(search_results, 1):
-                                results_text += f"{idx}. {result['title']}\n"
-                                results_text += f"   {result['snippet']}\n"
-                                if result['url']:
-                                    results_text += f"   URL: {result['url']}\n"
-                                results_text += "\n"
-
-                            # Send search results back to the model to continue the conversation
-                            function_response = Part.from_function_response(
-                                name="search_web",
-                                response={"results": results_text}
-                            )
-
-                            # Continue the conversation with the search results
-                            response = chat.send_message(
-                                Content(parts=[function_response]),
-                                generation_config={
-                                    'temperature': 0.7,
-                                    'max_output_tokens': 20000,
-                                }
-                            )
-
-                            # Append resource data marker to the response
-                            final_response = response.text
-                            if resource_data_marker:
-                                final_response += "\n\n" + resource_data_marker
-                                print(f"[Resource Data] Appended marker to LLM response")
-
-                            return final_response
-
-            return response.text
-        else:
-            return "Hello! I'm here to help. How can I assist you today?"
+        response = await chat.send_message_async(
+            messages[-1]['content'],
+            generation_config=CHAT_GENERATION_CONFIG
+        )
+
+        # Debug: Print response structure
+        print(f"Response candidates: {len(response.candidates)}")
+        for idx, part in enumerate(_response_parts(response)):
+            print(f"Part {idx}: {part}")
+
+        # Check if the model wants to call a function
+        for part in _response_parts(response):
+            if hasattr(part, 'function_call') and part.function_call:
+                function_call = part.function_call
+                print(f"Function call detected: {function_call.name}")
+
+                if function_call.name == "request_user_location":
+                    # Return a special JSON response that frontend will recognize
+                    return _location_request(function_call, conversation_id), []
+
+                elif function_call.name == "search_web":
+                    function_response, resources = await _run_search_tool(function_call, conversation)
+
+                    # Continue the conversation with the search results
+                    response = await chat.send_message_async(
+                        function_response,
+                        generation_config=CHAT_GENERATION_CONFIG
+                    )
+
+                    if conversation_id is not None:
+                        session_store.complete_turn(conversation_id)
+                    return response.text, resources
+
+        if conversation_id is not None:
+            session_store.complete_turn(conversation_id)
+        return response.text, []
 
     except Exception as e:
+        # The session may hold a half-finished turn; rebuild it next time
+        if conversation_id is not None:
+            session_store.drop(conversation_id)
         print(f"Error in get_chatbot_response: {str(e)}")
         import traceback
         traceback.print_exc()
-        return f"I apologize, but I'm having trouble connecting right now. Error: {str(e)}"
+        return f"{CONNECTION_ERROR_REPLY} Error: {str(e)}", []
 
 
-async def generate_conversation_report(messages: List[Dict[str, str]], conversation_id: Optional[int] = None, db = None) -> str:
+async def stream_chatbot_response(
+    messages: List[Dict[str, str]],
+    conversation: Optional[object] = None
+) -> AsyncIterator[Dict[str, str]]:
     """
-    Generate a detailed report from the conversation using Vertex AI
-    Includes health tracking data if available (medications, symptoms, vitals)
+    Stream the chatbot response as the model emits it
 
-    Args:
-        messages: List of all messages in the conversation
-        conversation_id: Optional conversation ID to fetch health data
-        db: Optional database session to query health data
+    Yields {"type": "chunk", "text": ...} events for each piece of reply
+    text, then exactly one {"type": "final", "content": ..., "resources": [...]}
+    event with the complete reply (or the JSON location request) and the
+    search tool's resources, matching what get_chatbot_response would have
+    returned.
 
-    Returns:
-        Formatted report as a string in Markdown format
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        conversation: Optional Conversation object containing id and user's location (latitude, longitude)
     """
+    conversation_id = getattr(conversation, 'id', None)
+
+    if not messages:
+        yield {"type": "final", "content": GREETING, "resources": []}
+        return
+
+    text_parts: List[str] = []
+    function_calls = []
+
     try:
-        # Fetch health data if conversation_id and db provided
-        health_data_text = ""
-        if conversation_id and db:
-            health_data_text = await get_health_summary(conversation_id, db)
+        chat = _get_chat(messages, conversation_id)
+
+        async for event in _stream_turn(chat, messages[-1]['content'], text_parts, function_calls):
+            yield event
+
+        resources: List[Dict] = []
+        for function_call in function_calls:
+            print(f"Function call detected: {function_call.name}")
 
-        report_prompt = """Based on the following conversation, generate a comprehensive assistance report in **Markdown format**.
+            if function_call.name == "request_user_location":
+                yield {"type": "final", "content": _location_request(function_call, conversation_id), "resources": []}
+                return
+
+            elif function_call.name == "search_web":
+                function_response, resources = await _run_search_tool(function_call, conversation)
+
+                # Stream the model's answer to the search results
+                async for event in _stream_turn(chat, function_response, text_parts, []):
+                    yield event
+                break
+
+        if conversation_id is not None:
+            session_store.complete_turn(conversation_id)
+        yield {"type": "final", "content": "".join(text_parts), "resources": resources}
+
+    except Exception as e:
+        if conversation_id is not None:
+            session_store.drop(conversation_id)
+        print(f"Error in stream_chatbot_response: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        yield {
+            "type": "final",
+            "content": f"{CONNECTION_ERROR_REPLY} Error: {str(e)}",
+            "resources": []
+        }
+
+
+# Report prompt; the health tracking section is appended to the model's
+# report verbatim, so the model call doesn't wait for the health queries
+REPORT_PROMPT = """Based on the following conversation, generate a comprehensive assistance report in **Markdown format**.
 
 Focus primarily on:
 - **User Requirements**: What specific help the person asked for and their expressed needs
@@ -256,74 +374,153 @@ Clear, numbered list of next steps the person should take.
 - Contact information for continued assistance
 - Any additional notes
 
-{health_section}
-
 Please format the report professionally using proper Markdown syntax (headings, lists, bold text, etc.) suitable for sharing with social workers or service providers.
 
 Conversation:
 """
 
-        # Add health tracking section if data exists
-        health_section = ""
-        if health_data_text:
-            health_section = """
-## 🏥 Health Tracking Summary (Guest Mode)
-**Important**: The following health data was tracked during this conversation session. This information should be highlighted for healthcare providers.
+REPORT_GENERATION_CONFIG = {
+    'temperature': 0.5,
+    'max_output_tokens': 2000,
+}
 
-""" + health_data_text
+_report_model: Optional[GenerativeModel] = None
 
-        # Format the prompt with health section
-        formatted_prompt = report_prompt.format(health_section=health_section)
 
-        # Add conversation to prompt
-        conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+def get_report_model() -> GenerativeModel:
+    """Get the shared report model (created once)"""
+    global _report_model
 
-        # Initialize the model for report generation
-        model = GenerativeModel(
+    if _report_model is None:
+        _report_model = GenerativeModel(
             model_name="gemini-2.5-pro",
             system_instruction="You are a professional social service assistant that generates well-structured, markdown-formatted reports focusing on user needs and available resources. Use proper markdown syntax with headers, lists, bold text, and clear organization."
         )
 
-        response = model.generate_content(
-            formatted_prompt + conversation_text,
-            generation_config={
-                'temperature': 0.5,
-                'max_output_tokens': 2000,
-            }
+    return _report_model
+
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a person seeking help and an assistant for people experiencing homelessness.
+
+Keep what is needed to continue helping: the person's situation, needs and constraints, location details they shared, resources already suggested (names, phone numbers, addresses), decisions made and open follow-ups. Leave out greetings and small talk. Write plain text, at most 200 words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+SUMMARY_GENERATION_CONFIG = {
+    'temperature': 0.2,
+    'max_output_tokens': 2000,
+}
+
+_summary_model: Optional[GenerativeModel] = None
+
+
+def get_summary_model() -> GenerativeModel:
+    """Get the shared conversation summary model (created once)"""
+    global _summary_model
+
+    if _summary_model is None:
+        _summary_model = GenerativeModel(
+            model_name="gemini-2.5-pro",
+            system_instruction="You maintain concise running summaries of support conversations so an assistant can continue them without the full transcript."
         )
 
-        # Extract all resource data from conversation messages
-        all_resources = []
-        import re
-        for msg in messages:
-            if msg['role'] == 'assistant' and 'content' in msg:
-                match = re.search(r'<!-- RESOURCE_DATA:(.+?) -->', msg['content'], re.DOTALL)
-                if match:
-                    try:
-                        import json
-                        resource_data = json.loads(match.group(1))
-                        if resource_data.get('type') == 'resource_list' and resource_data.get('resources'):
-                            all_resources.extend(resource_data['resources'])
-                            print(f"[Report] Found {len(resource_data['resources'])} resources in message")
-                    except Exception as e:
-                        print(f"[Report] Failed to parse resource data: {e}")
-
-        # Append resource data marker to the report if resources found
-        final_report = response.text
-        if all_resources:
-            # Remove duplicates based on resource ID
-            unique_resources = {r['id']: r for r in all_resources}.values()
-            resource_marker = f"\n\n<!-- RESOURCE_DATA:{json.dumps({'type': 'resource_list', 'resources': list(unique_resources)})} -->"
-            final_report += resource_marker
-            print(f"[Report] Appended {len(unique_resources)} unique resources to report")
-
-        return final_report
+    return _summary_model
+
 
+async def summarize_conversation(summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+    """
+    Fold messages into a conversation's running summary, raising on failure
+
+    Args:
+        summary: Current summary (None if nothing was summarized yet)
+        messages: Messages to add, oldest first
+
+    Returns:
+        Updated summary text
+    """
+    conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+    response = await get_summary_model().generate_content_async(
+        SUMMARY_PROMPT.format(summary=summary or "(none yet)", messages=conversation_text),
+        generation_config=SUMMARY_GENERATION_CONFIG
+    )
+    return response.text.strip()
+
+
+async def build_conversation_report(messages: List[Dict[str, str]], conversation_id: Optional[int] = None) -> str:
+    """
+    Generate a conversation report, raising on failure
+
+    The model call and the health summary queries run concurrently; the
+    health section is appended to the model's report. Resources shared in
+    the conversation are read from message_resources by the caller.
+
+    Args:
+        messages: List of all messages in the conversation
+        conversation_id: Optional conversation ID to fetch health data
+
+    Returns:
+        Formatted report as a string in Markdown format
+    """
+    conversation_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+
+    response, health_data_text = await asyncio.gather(
+        get_report_model().generate_content_async(
+            REPORT_PROMPT + conversation_text,
+            generation_config=REPORT_GENERATION_CONFIG
+        ),
+        asyncio.to_thread(load_health_summary, conversation_id) if conversation_id else asyncio.sleep(0, result="")
+    )
+
+    final_report = response.text
+
+    # Add health tracking section if data exists
+    if health_data_text:
+        final_report += """
+
+## 🏥 Health Tracking Summary (Guest Mode)
+**Important**: The following health data was tracked during this conversation session. This information should be highlighted for healthcare providers.
+
+""" + health_data_text
+
+    return final_report
+
+
+async def generate_conversation_report(messages: List[Dict[str, str]], conversation_id: Optional[int] = None) -> str:
+    """
+    Generate a detailed report from the conversation using Vertex AI
+    Includes health tracking data if available (medications, symptoms, vitals)
+
+    Args:
+        messages: List of all messages in the conversation
+        conversation_id: Optional conversation ID to fetch health data
+
+    Returns:
+        Formatted report as a string in Markdown format (an error report on failure)
+    """
+    try:
+        return await build_conversation_report(messages, conversation_id)
     except Exception as e:
         return f"# Error Generating Report\n\nAn error occurred while generating the report: {str(e)}"
 
 
-async def get_health_summary(conversation_id: int, db) -> str:
+def load_health_summary(conversation_id: int) -> str:
+    """get_health_summary on its own session (safe to run in a worker thread)"""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return get_health_summary(conversation_id, db)
+    finally:
+        db.close()
+
+
+def get_health_summary(conversation_id: int, db) -> str:
     """
     Get formatted health tracking summary for a conversation (guest mode)
 
@@ -0,0 +1,503 @@
+"""
+Bulk, resumable loading of dataset CSVs
+
+Rows are cleaned with vectorized pandas operations and written in chunks:
+PostgreSQL streams each chunk with COPY (PostGIS locations are computed in
+the same pass as EWKT), other databases use a single executemany INSERT.
+Embeddings are generated per chunk in one batched call. Each chunk commits
+together with its checkpoint row, so an interrupted import resumes at the
+first chunk that was not committed.
+
+Tables with a source key are upserted rather than reloaded. Embedded rows
+store a hash of the text they were embedded from and the embedding model,
+so a refresh only re-embeds rows whose text or model changed.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import csv
+import hashlib
+import io
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import Table, false, func, insert, inspect, literal_column, null, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from dataset_models import DatasetImportCheckpoint
+from embeddings import EMBEDDING_MODEL_NAME, generate_embeddings_batch
+
+# Rows written (and embedded) per chunk; each chunk is one transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+
+
+def read_dataset_csv(path: str) -> pd.DataFrame:
+    """Read a dataset CSV and strip BOMs and whitespace from the column names"""
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    df.columns = df.columns.str.strip().str.replace('\ufeff', '')
+    return df
+
+
+def file_signature(path: str) -> str:
+    """SHA-256 of a source file; a changed file invalidates its checkpoint"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_column(df: pd.DataFrame, column: str, max_length: Optional[int] = 255) -> pd.Series:
+    """
+    Clean a column into optional strings
+
+    Missing values become None and numeric codes read as floats because of
+    gaps (e.g. 10001.0) are written as integers.
+
+    Args:
+        df: Source frame
+        column: Column name (a missing column yields all None)
+        max_length: Truncate values to this many characters (None for no limit)
+
+    Returns:
+        Object series of str or None
+    """
+    if column not in df:
+        return pd.Series(None, index=df.index, dtype=object)
+
+    values = df[column]
+    present = values.notna()
+    if pd.api.types.is_float_dtype(values) and (values[present] % 1 == 0).all():
+        values = values.astype('Int64')
+
+    result = values.astype(str)
+    if max_length:
+        result = result.str.slice(0, max_length)
+    return result.where(present, None)
+
+
+def int_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Clean a column into nullable integers"""
+    if column not in df:
+        return pd.Series(pd.NA, index=df.index, dtype='Int64')
+    return pd.to_numeric(df[column], errors='coerce').round().astype('Int64')
+
+
+def float_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """Clean a column into floats (NaN where missing or unparseable)"""
+    if column not in df:
+        return pd.Series(float('nan'), index=df.index)
+    return pd.to_numeric(df[column], errors='coerce')
+
+
+def joined_text(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+    """Space-join several text columns, skipping missing values"""
+    parts = [df[column].fillna('').astype(str) if column in df else pd.Series('', index=df.index) for column in columns]
+    joined = parts[0]
+    for part in parts[1:]:
+        joined = joined + ' ' + part
+    return joined.str.split().str.join(' ')
+
+
+def point_ewkt(longitude: pd.Series, latitude: pd.Series) -> pd.Series:
+    """Build PostGIS EWKT points (SRID 4326) for whole columns at once"""
+    return 'SRID=4326;POINT(' + longitude.astype(str) + ' ' + latitude.astype(str) + ')'
+
+
+def _embedding_literal(embedding: Optional[List[float]]) -> Optional[str]:
+    """pgvector text format for COPY"""
+    if embedding is None:
+        return None
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def content_hash(texts: pd.Series) -> pd.Series:
+    """SHA-256 of each embedding text; a changed hash means the row must be re-embedded"""
+    return texts.fillna('').map(lambda value: hashlib.sha256(value.encode('utf-8')).hexdigest())
+
+
+class BulkLoader:
+    """
+    Load a cleaned DataFrame into a table in checkpointed chunks
+
+    With a source key (fid / objectid) rows are upserted: existing rows are
+    updated in place, rows missing from the source are deleted at the end,
+    and embeddings are only regenerated for rows whose content hash or
+    embedding model changed. Without a key the table is reloaded from scratch.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        table: Table,
+        source_file: str,
+        key: Optional[str] = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE
+    ):
+        self.session = session
+        self.table = table
+        self.source_file = source_file
+        self.key = key
+        self.chunk_size = chunk_size
+        self.is_postgres = session.get_bind().dialect.name == "postgresql"
+
+    def load(
+        self,
+        df: pd.DataFrame,
+        embedding_text: Optional[pd.Series] = None,
+        point_columns: Optional[Tuple[str, str]] = None,
+        fresh: bool = False,
+        dry_run: bool = False
+    ) -> Dict:
+        """
+        Load rows, resuming from the table's checkpoint when possible
+
+        The run starts over from the first row when there is no checkpoint,
+        the source file or embedding model changed, or fresh is set. Without
+        a source key the table is cleared first.
+
+        Args:
+            df: Cleaned rows, columns named after the table columns
+            embedding_text: Text to embed per row into the "embedding" column
+            point_columns: (longitude, latitude) columns used to fill "location"
+            fresh: Ignore the checkpoint and process every row
+            dry_run: Only report what would change (see plan); nothing is written
+
+        Returns:
+            Dictionary with loaded, skipped, embedded, reused, embedding_failures,
+            removed, seconds and rows_per_second
+        """
+        df = df.reset_index(drop=True)
+        if self.key:
+            missing_key = df[self.key].isna()
+            if missing_key.any():
+                print(f"  ⚠ Skipping {missing_key.sum()} rows without {self.key}")
+                df = df[~missing_key].reset_index(drop=True)
+                if embedding_text is not None:
+                    embedding_text = embedding_text[~missing_key.values]
+
+        hashes = content_hash(embedding_text.reset_index(drop=True)) if embedding_text is not None else None
+        texts = embedding_text.fillna('').tolist() if embedding_text is not None else None
+
+        if dry_run:
+            return self.plan(df, hashes)
+
+        total = len(df)
+        if self.key:
+            self._prepare_keyed_table()
+        checkpoint = self._prepare_checkpoint(total, fresh, embedded=embedding_text is not None)
+        start_row = checkpoint.rows_loaded
+
+        stats = {"loaded": 0, "skipped": start_row, "embedded": 0, "reused": 0,
+                 "embedding_failures": 0, "removed": 0, "seconds": 0.0, "rows_per_second": 0.0}
+
+        if checkpoint.completed:
+            print(f"  ✓ {self.table.name} already loaded from this file ({total} rows); use --fresh to reload")
+            stats["skipped"] = total
+            return stats
+        if start_row:
+            print(f"  Resuming {self.table.name} at row {start_row}/{total}")
+
+        if point_columns and self.is_postgres:
+            longitude, latitude = point_columns
+            df["location"] = point_ewkt(df[longitude], df[latitude])
+
+        if "updated_at" in self.table.c and "updated_at" not in df:
+            df["updated_at"] = datetime.utcnow()
+
+        existing = self._existing_embeddings() if texts is not None and self.key else {}
+        started = time.time()
+
+        for offset in range(start_row, total, self.chunk_size):
+            chunk = df.iloc[offset:offset + self.chunk_size].copy()
+
+            if texts is not None:
+                self._embed_chunk(chunk, texts[offset:offset + self.chunk_size],
+                                  hashes.iloc[offset:offset + self.chunk_size].tolist(), existing, stats)
+
+            try:
+                if self.is_postgres:
+                    self._copy(chunk)
+                else:
+                    self._insert(chunk)
+                checkpoint.rows_loaded = offset + len(chunk)
+                if checkpoint.rows_loaded >= total:
+                    stats["removed"] = self._remove_missing(df)
+                    checkpoint.completed = True
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+
+            stats["loaded"] += len(chunk)
+            elapsed = time.time() - started
+            print(f"  Loaded {checkpoint.rows_loaded}/{total} rows ({stats['loaded'] / elapsed if elapsed else 0:.0f} rows/s)")
+
+        if total == 0:
+            stats["removed"] = self._remove_missing(df)
+            checkpoint.completed = True
+            self.session.commit()
+
+        elapsed = time.time() - started
+        stats["seconds"] = elapsed
+        stats["rows_per_second"] = stats["loaded"] / elapsed if elapsed else 0.0
+
+        details = []
+        if texts is not None:
+            details.append(f"{stats['embedded']} embedded, {stats['reused']} unchanged")
+        if stats["embedding_failures"]:
+            details.append(f"{stats['embedding_failures']} embeddings failed")
+        if stats["removed"]:
+            details.append(f"{stats['removed']} removed")
+        print(f"  ✓ {self.table.name}: {stats['loaded']} rows in {elapsed:.1f}s ({stats['rows_per_second']:.0f} rows/s)"
+              + (f"; {', '.join(details)}" if details else ""))
+        return stats
+
+    def plan(self, df: pd.DataFrame, hashes: Optional[pd.Series] = None) -> Dict:
+        """
+        Report what a load would do without writing anything
+
+        Args:
+            df: Cleaned rows (already filtered to rows with a source key)
+            hashes: Content hashes of the embedding text, for embedded tables
+
+        Returns:
+            Dictionary with new, existing, removed and, for embedded tables,
+            reembed_content, reembed_model, reembed_missing and unchanged counts
+        """
+        existing = self._existing_embeddings() if self.key else {}
+        keys = df[self.key].tolist() if self.key else []
+        source_keys = set(keys)
+
+        report = {
+            "new": sum(1 for key in keys if key not in existing),
+            "existing": sum(1 for key in keys if key in existing),
+            "removed": sum(1 for key in existing if key not in source_keys),
+        }
+        if not self.key:
+            report["new"] = len(df)
+            report["removed"] = self._row_count()
+
+        if hashes is not None:
+            counts = {"reembed_content": 0, "reembed_model": 0, "reembed_missing": 0, "unchanged": 0}
+            for key, digest in zip(keys, hashes):
+                reason = self._reembed_reason(existing.get(key), digest)
+                counts[f"reembed_{reason}" if reason else "unchanged"] += 1
+            report.update(counts)
+
+        print(f"  [dry run] {self.table.name}: {report['new']} new, {report['existing']} existing, "
+              f"{report['removed']} to remove")
+        if hashes is not None:
+            reembed = report["reembed_content"] + report["reembed_model"] + report["reembed_missing"]
+            print(f"  [dry run] {reembed} rows would be re-embedded "
+                  f"({report['reembed_content']} new or changed text, {report['reembed_model']} model change, "
+                  f"{report['reembed_missing']} missing embedding); {report['unchanged']} unchanged")
+        return report
+
+    @staticmethod
+    def _reembed_reason(current: Optional[Tuple], digest: str) -> Optional[str]:
+        """Why a row needs a new embedding (None if its stored one is current)"""
+        if current is None:
+            return "content"
+        stored_hash, stored_model, has_embedding = current
+        if not has_embedding:
+            return "missing"
+        if stored_hash != digest:
+            return "content"
+        if stored_model != EMBEDDING_MODEL_NAME:
+            return "model"
+        return None
+
+    def _embed_chunk(self, chunk: pd.DataFrame, texts: List[str], hashes: List[str], existing: Dict, stats: Dict):
+        """
+        Embed the rows of a chunk whose text or model changed
+
+        Rows that keep their stored embedding get NULL embedding columns,
+        which the upsert leaves untouched. A failed embedding also leaves the
+        stored hash in place, so the row is retried on the next run.
+        """
+        keys = chunk[self.key].tolist() if self.key else [None] * len(chunk)
+        todo = [i for i, (key, digest) in enumerate(zip(keys, hashes))
+                if texts[i] and self._reembed_reason(existing.get(key), digest)]
+
+        embeddings: List[Optional[List[float]]] = [None] * len(chunk)
+        embedded_hashes: List[Optional[str]] = [None] * len(chunk)
+        if todo:
+            for i, embedding in zip(todo, generate_embeddings_batch([texts[i] for i in todo])):
+                if embedding is None:
+                    stats["embedding_failures"] += 1
+                    continue
+                embeddings[i] = embedding
+                embedded_hashes[i] = hashes[i]
+                stats["embedded"] += 1
+
+        stats["reused"] += sum(1 for text in texts if text) - len(todo)
+        chunk["embedding"] = embeddings
+        chunk["embedding_hash"] = embedded_hashes
+        chunk["embedding_model"] = [EMBEDDING_MODEL_NAME if digest else None for digest in embedded_hashes]
+
+    def _existing_embeddings(self) -> Dict:
+        """Map source key -> (embedding_hash, embedding_model, has_embedding) for stored rows"""
+        inspector = inspect(self.session.get_bind())
+        if not inspector.has_table(self.table.name):
+            return {}
+
+        stored = {column["name"] for column in inspector.get_columns(self.table.name)}
+        columns = [self.table.c[self.key]]
+        for name in ("embedding_hash", "embedding_model"):
+            columns.append(self.table.c[name] if name in stored else null())
+        columns.append(self.table.c.embedding.is_not(None) if "embedding" in stored else false())
+
+        return {
+            row[0]: (row[1], row[2], bool(row[3]))
+            for row in self.session.execute(select(*columns)).all()
+        }
+
+    def _row_count(self) -> int:
+        """Rows currently stored (0 if the table doesn't exist yet)"""
+        if not inspect(self.session.get_bind()).has_table(self.table.name):
+            return 0
+        return self.session.execute(select(func.count()).select_from(self.table)).scalar()
+
+    def _prepare_keyed_table(self):
+        """Add columns missing from older schemas and the unique index on the source key"""
+        inspector = inspect(self.session.get_bind())
+        stored = {column["name"] for column in inspector.get_columns(self.table.name)}
+        dialect = self.session.get_bind().dialect
+        for column in self.table.columns:
+            if column.name not in stored:
+                print(f"  Adding column {self.table.name}.{column.name}")
+                self.session.execute(text(
+                    f"ALTER TABLE {self.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+                ))
+
+        # Earlier imports appended duplicates on every run; keep the first copy
+        key = self.key
+        duplicates = self.session.execute(text(f"""
+            DELETE FROM {self.table.name}
+            WHERE {key} IS NULL
+            OR id NOT IN (SELECT MIN(id) FROM {self.table.name} WHERE {key} IS NOT NULL GROUP BY {key})
+        """)).rowcount
+        if duplicates:
+            print(f"  Removed {duplicates} duplicate rows from earlier imports")
+
+        self.session.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{self.table.name}_{key}_key ON {self.table.name} ({key})"
+        ))
+        self.session.commit()
+
+    def _prepare_checkpoint(self, total: int, fresh: bool, embedded: bool) -> DatasetImportCheckpoint:
+        """Return the checkpoint to resume from, clearing unkeyed tables when starting over"""
+        signature = file_signature(self.source_file)
+        if embedded:
+            # A new embedding model invalidates the checkpoint even if the file is unchanged
+            signature = f"{signature}:{EMBEDDING_MODEL_NAME}"
+        checkpoint = self.session.get(DatasetImportCheckpoint, self.table.name)
+
+        resumable = (
+            not fresh
+            and checkpoint is not None
+            and checkpoint.source_signature == signature
+            and checkpoint.total_rows == total
+        )
+        if resumable:
+            return checkpoint
+
+        if checkpoint is not None and not fresh and checkpoint.source_signature != signature:
+            print(f"  Source file or embedding model changed since the last load; updating {self.table.name}")
+
+        if not self.key:
+            self.session.execute(self.table.delete())
+        if checkpoint is None:
+            checkpoint = DatasetImportCheckpoint(table_name=self.table.name)
+            self.session.add(checkpoint)
+        checkpoint.source_file = self.source_file
+        checkpoint.source_signature = signature
+        checkpoint.total_rows = total
+        checkpoint.rows_loaded = 0
+        checkpoint.completed = False
+        self.session.commit()
+        return checkpoint
+
+    def _remove_missing(self, df: pd.DataFrame) -> int:
+        """Delete rows whose source key is no longer in the source file"""
+        if not self.key:
+            return 0
+        keys = df[self.key].tolist()
+        column = self.table.c[self.key]
+        return self.session.execute(self.table.delete().where(column.not_in(keys))).rowcount
+
+    def _upsert_assignments(self, excluded, names: List[str]) -> Dict:
+        """
+        SET clause for the upsert: source columns are overwritten, embedding
+        columns only when a new embedding was generated for the row
+        """
+        assignments = {}
+        for name in names:
+            if name in (self.key, "id"):
+                continue
+            if name in ("embedding", "embedding_hash", "embedding_model"):
+                assignments[name] = func.coalesce(excluded[name], self.table.c[name])
+            else:
+                assignments[name] = excluded[name]
+        return assignments
+
+    def _copy(self, chunk: pd.DataFrame):
+        """
+        Stream a chunk into PostgreSQL with COPY on the session's connection
+
+        Keyed tables are copied into a transaction-scoped staging table and
+        merged with INSERT ... ON CONFLICT.
+        """
+        if "embedding" in chunk:
+            chunk["embedding"] = chunk["embedding"].map(_embedding_literal)
+
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+        buffer.seek(0)
+
+        columns = ", ".join(chunk.columns)
+        target = self.table.name
+        if self.key:
+            target = f"{self.table.name}_staging"
+            self.session.execute(text(
+                f"CREATE TEMP TABLE IF NOT EXISTS {target} ON COMMIT DELETE ROWS "
+                f"AS SELECT {columns} FROM {self.table.name} WITH NO DATA"
+            ))
+
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+        if self.key:
+            staged = select(*(literal_column(name) for name in chunk.columns)).select_from(text(target))
+            stmt = pg_insert(self.table).from_select(list(chunk.columns), staged)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[self.key],
+                set_=self._upsert_assignments(stmt.excluded, list(chunk.columns))
+            )
+            self.session.execute(stmt)
+
+    def _insert(self, chunk: pd.DataFrame):
+        """Insert (or upsert, for keyed tables) a chunk with one executemany statement"""
+        embeddings = chunk.pop("embedding").tolist() if "embedding" in chunk else None
+        records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+        if embeddings is not None:
+            for record, embedding in zip(records, embeddings):
+                record["embedding"] = embedding
+
+        if not self.key:
+            self.session.execute(insert(self.table), records)
+            return
+
+        stmt = sqlite_insert(self.table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.key],
+            set_=self._upsert_assignments(stmt.excluded, list(records[0]) if records else [])
+        )
+        self.session.execute(stmt, records)
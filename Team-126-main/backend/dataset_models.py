@@ -2,8 +2,9 @@
 Database models for San Diego County datasets
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
+from datetime import datetime
 from geoalchemy2 import Geometry
 from pgvector.sqlalchemy import Vector
 from database import Base
@@ -34,6 +35,19 @@ class HealthService(Base):
     # Vector embedding for semantic search
     embedding = Column(Vector(768), nullable=True)
 
+    # SHA-256 of the text the embedding was generated from, and the model used;
+    # import_datasets.py only re-embeds rows where either changed
+    embedding_hash = Column(String(64), nullable=True)
+    embedding_model = Column(String, nullable=True)
+
+    # Set by every import that writes the row, so in-memory copies
+    # (hybrid_search.ServiceMatrix) notice rows updated in place
+    updated_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_health_services_fid_key", "fid", unique=True),
+    )
+
 
 class TransitStop(Base):
     """Public Transit Stops in San Diego County"""
@@ -57,6 +71,25 @@ class TransitStop(Base):
     # Geospatial column for PostGIS queries
     location = Column(Geometry('POINT', srid=4326), nullable=True)
 
+    __table_args__ = (
+        Index("idx_transit_stops_objectid_key", "objectid", unique=True),
+    )
+
+
+class HealthServiceNearbyTransit(Base):
+    """Precomputed nearest transit stops for each health service (refreshed by import_datasets.py)"""
+    __tablename__ = "health_service_nearby_transit"
+
+    id = Column(Integer, primary_key=True, index=True)
+    health_service_id = Column(Integer, ForeignKey("health_services.id", ondelete="CASCADE"), nullable=False)
+    transit_stop_id = Column(Integer, ForeignKey("transit_stops.id", ondelete="CASCADE"), nullable=False)
+    stop_rank = Column(Integer, nullable=False)  # 1 = nearest stop
+    distance_km = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("idx_nearby_transit_service_rank", "health_service_id", "stop_rank"),
+    )
+
 
 class TransitRoute(Base):
     """Public Transit Routes in San Diego County"""
@@ -80,6 +113,10 @@ class TransitRoute(Base):
     route_text_color_rgb = Column(String)
     shape_length = Column(Float)
 
+    __table_args__ = (
+        Index("idx_transit_routes_objectid_key", "objectid", unique=True),
+    )
+
 
 class HousingElement(Base):
     """Housing Elements in San Diego County"""
@@ -98,3 +135,20 @@ class HousingElement(Base):
     links = Column(String)
     shape_area = Column(Float)
     shape_length = Column(Float)
+
+    __table_args__ = (
+        Index("idx_housing_elements_objectid_key", "objectid", unique=True),
+    )
+
+
+class DatasetImportCheckpoint(Base):
+    """Progress of a bulk dataset load, so an interrupted import_datasets.py run can resume"""
+    __tablename__ = "dataset_import_checkpoints"
+
+    table_name = Column(String, primary_key=True)
+    source_file = Column(String, nullable=False)
+    source_signature = Column(String, nullable=False)  # sha256 of the source file
+    rows_loaded = Column(Integer, nullable=False, default=0)
+    total_rows = Column(Integer, nullable=False)
+    completed = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,385 @@
+"""
+Rolling-horizon medication dose scheduler
+
+Keeps DOSE_HORIZON_DAYS of future MedicationDose rows for every active
+medication with reminders. Doses are written with multi-row
+INSERT ... ON CONFLICT (medication_id, scheduled_time) DO NOTHING, so
+scheduling is idempotent and safe to run from several workers. A background
+task extends the horizon and marks past unrecorded doses as missed with one
+set-based UPDATE; both keep medication_adherence_daily in step through
+RETURNING.
+"""
+
+from collections import Counter
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import os
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from health_models import Medication, MedicationDose
+from adherence_rollup import adjust_adherence_rollup
+
+# Days of doses kept scheduled ahead, counting today
+DOSE_HORIZON_DAYS = int(os.getenv("DOSE_HORIZON_DAYS", "7"))
+
+# How often the background task runs (seconds)
+DOSE_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("DOSE_SCHEDULER_INTERVAL_SECONDS", "900"))
+
+# How long after its scheduled time an unrecorded dose counts as missed (minutes)
+DOSE_MISSED_AFTER_MINUTES = int(os.getenv("DOSE_MISSED_AFTER_MINUTES", "60"))
+
+# Dose rows per INSERT statement
+DOSE_INSERT_BATCH_SIZE = int(os.getenv("DOSE_INSERT_BATCH_SIZE", "1000"))
+
+
+def parse_reminder_time(time_str: str) -> dt_time:
+    """Parse an "HH:MM" reminder time"""
+    hour, minute = map(int, time_str.split(':'))
+    return dt_time(hour=hour, minute=minute)
+
+
+def dose_times(
+    reminder_times: Iterable[str],
+    start: datetime,
+    end: datetime,
+    after: Optional[datetime] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> List[datetime]:
+    """
+    Scheduled times for a medication's reminders within [start, end)
+
+    Args:
+        reminder_times: Times of day like ["08:00", "20:00"]
+        start: Window start
+        end: Window end (exclusive)
+        after: Only times later than this (the latest dose already scheduled)
+        start_date: Medication start date; earlier days are skipped
+        end_date: Medication end date; later times are skipped
+
+    Returns:
+        Sorted scheduled times
+    """
+    times = sorted({parse_reminder_time(t) for t in reminder_times})
+    first_day = start.date()
+    if start_date is not None and start_date.date() > first_day:
+        first_day = start_date.date()
+
+    scheduled = []
+    day = first_day
+    while datetime.combine(day, dt_time.min) < end:
+        for t in times:
+            scheduled_time = datetime.combine(day, t)
+            if scheduled_time < start or scheduled_time >= end:
+                continue
+            if after is not None and scheduled_time <= after:
+                continue
+            if end_date is not None and scheduled_time > end_date:
+                continue
+            scheduled.append(scheduled_time)
+        day += timedelta(days=1)
+    return scheduled
+
+
+def horizon_window(now: Optional[datetime] = None, days: int = DOSE_HORIZON_DAYS):
+    """Today's midnight through the end of the horizon"""
+    now = now or datetime.utcnow()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=days)
+
+
+def insert_doses(db: Session, doses: Dict[int, List[datetime]], user_ids: Dict[int, int]) -> int:
+    """
+    Bulk insert scheduled doses, skipping ones that already exist
+
+    Rows that were actually inserted are counted into the adherence rollup.
+
+    Args:
+        db: Database session (the caller commits)
+        doses: medication_id -> scheduled times
+        user_ids: medication_id -> user_id
+
+    Returns:
+        Number of doses inserted
+    """
+    rows = [
+        {"medication_id": medication_id, "scheduled_time": scheduled_time, "status": "scheduled"}
+        for medication_id, times in doses.items()
+        for scheduled_time in times
+    ]
+    if not rows:
+        return 0
+
+    upsert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    table = MedicationDose.__table__
+    created_at = datetime.utcnow()
+    per_day = Counter()
+    for i in range(0, len(rows), DOSE_INSERT_BATCH_SIZE):
+        batch = rows[i:i + DOSE_INSERT_BATCH_SIZE]
+        for row in batch:
+            row["created_at"] = created_at
+        stmt = upsert(table).values(batch).on_conflict_do_nothing(
+            index_elements=["medication_id", "scheduled_time"]
+        ).returning(table.c.medication_id, table.c.scheduled_time)
+        for medication_id, scheduled_time in db.execute(stmt):
+            per_day[(user_ids[medication_id], scheduled_time.date())] += 1
+
+    adjust_adherence_rollup(db, {key: {"scheduled": count} for key, count in per_day.items()})
+    return sum(per_day.values())
+
+
+def schedule_medication_doses(
+    db: Session,
+    medications: Iterable[Medication],
+    now: Optional[datetime] = None,
+    days: int = DOSE_HORIZON_DAYS
+) -> int:
+    """
+    Fill the dose horizon for specific medications (e.g. one just created)
+
+    Args:
+        db: Database session (the caller commits)
+        medications: Medications to schedule
+        now: Current time (defaults to utcnow)
+        days: Horizon length in days
+
+    Returns:
+        Number of doses inserted
+    """
+    start, end = horizon_window(now, days)
+    doses, user_ids = {}, {}
+    for medication in medications:
+        if not (medication.is_active and medication.reminder_enabled and medication.reminder_times):
+            continue
+        doses[medication.id] = dose_times(
+            medication.reminder_times, start, end,
+            start_date=medication.start_date, end_date=medication.end_date
+        )
+        user_ids[medication.id] = medication.user_id
+    return insert_doses(db, doses, user_ids)
+
+
+def reschedule_medication_doses(
+    db: Session,
+    medication: Medication,
+    now: Optional[datetime] = None,
+    days: int = DOSE_HORIZON_DAYS
+) -> Dict[str, int]:
+    """
+    Replace a medication's upcoming doses after its reminders changed
+
+    extend_dose_horizon only appends after the latest scheduled dose, so
+    future doses still "scheduled" are deleted (and taken out of the rollup)
+    and the horizon is filled again from the current reminder times.
+    Inactive medications and ones without reminders get no new doses.
+
+    Args:
+        db: Database session (the caller commits)
+        medication: Medication with its updated fields
+        now: Current time (defaults to utcnow)
+        days: Horizon length in days
+
+    Returns:
+        Dictionary with removed and scheduled counts
+    """
+    now = now or datetime.utcnow()
+    stmt = delete(MedicationDose).where(
+        MedicationDose.medication_id == medication.id,
+        MedicationDose.status == "scheduled",
+        MedicationDose.scheduled_time >= now
+    ).returning(MedicationDose.scheduled_time)
+    removed = db.execute(stmt, execution_options={"synchronize_session": False}).scalars().all()
+
+    per_day = Counter(scheduled_time.date() for scheduled_time in removed)
+    adjust_adherence_rollup(db, {(medication.user_id, day): {"scheduled": -count} for day, count in per_day.items()})
+
+    scheduled = schedule_medication_doses(db, [medication], now, days)
+    return {"removed": len(removed), "scheduled": scheduled}
+
+
+def extend_dose_horizon(db: Session, now: Optional[datetime] = None, days: int = DOSE_HORIZON_DAYS) -> int:
+    """
+    Schedule doses up to the horizon for every active medication with reminders
+
+    Each medication only gets times after its latest scheduled dose, so a
+    run where the horizon has not moved inserts nothing.
+
+    Args:
+        db: Database session (the caller commits)
+        now: Current time (defaults to utcnow)
+        days: Horizon length in days
+
+    Returns:
+        Number of doses inserted
+    """
+    start, end = horizon_window(now, days)
+
+    # Latest dose inside the window per medication (earlier doses don't
+    # affect what's missing, and the unique index covers this range scan)
+    latest = select(
+        MedicationDose.medication_id,
+        func.max(MedicationDose.scheduled_time).label("latest")
+    ).where(MedicationDose.scheduled_time >= start).group_by(MedicationDose.medication_id).subquery()
+
+    medications = db.execute(
+        select(
+            Medication.id, Medication.user_id, Medication.reminder_times,
+            Medication.start_date, Medication.end_date, latest.c.latest
+        ).outerjoin(latest, latest.c.medication_id == Medication.id).where(
+            Medication.is_active == True,
+            Medication.reminder_enabled == True,
+            Medication.reminder_times.isnot(None)
+        )
+    ).all()
+
+    doses, user_ids = {}, {}
+    for medication_id, user_id, reminder_times, start_date, end_date, latest_time in medications:
+        if not reminder_times or (latest_time is not None and latest_time >= end):
+            continue
+        times = dose_times(
+            reminder_times, start, end, after=latest_time,
+            start_date=start_date, end_date=end_date
+        )
+        if times:
+            doses[medication_id] = times
+            user_ids[medication_id] = user_id
+
+    return insert_doses(db, doses, user_ids)
+
+
+def mark_missed_doses(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Mark past unrecorded doses of active medications as missed with one UPDATE
+
+    Args:
+        db: Database session (the caller commits)
+        now: Current time (defaults to utcnow)
+
+    Returns:
+        Number of doses marked missed
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(minutes=DOSE_MISSED_AFTER_MINUTES)
+    active = select(Medication.id).where(Medication.is_active == True)
+
+    stmt = update(MedicationDose).where(
+        MedicationDose.status == "scheduled",
+        MedicationDose.scheduled_time < cutoff,
+        MedicationDose.medication_id.in_(active)
+    ).values(status="missed").returning(MedicationDose.medication_id, MedicationDose.scheduled_time)
+    changed = db.execute(stmt, execution_options={"synchronize_session": False}).all()
+    if not changed:
+        return 0
+
+    user_ids = dict(db.execute(
+        select(Medication.id, Medication.user_id).where(
+            Medication.id.in_({medication_id for medication_id, _ in changed})
+        )
+    ).all())
+    per_day = Counter((user_ids[medication_id], scheduled_time.date()) for medication_id, scheduled_time in changed)
+    adjust_adherence_rollup(db, {key: {"missed": count} for key, count in per_day.items()})
+    return len(changed)
+
+
+def run_dose_schedule(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    One scheduler pass: extend the horizon and mark missed doses
+
+    Returns:
+        Dictionary with scheduled and missed counts
+    """
+    now = now or datetime.utcnow()
+    scheduled = extend_dose_horizon(db, now)
+    missed = mark_missed_doses(db, now)
+    db.commit()
+    return {"scheduled": scheduled, "missed": missed}
+
+
+class DoseScheduler:
+    """Background task that runs run_dose_schedule periodically"""
+
+    def __init__(self, interval: float = DOSE_SCHEDULER_INTERVAL_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.scheduled = 0
+        self.missed = 0
+        self.failures = 0
+
+    def start(self):
+        """Start the task on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            print(f"[Dose Scheduler] Started (horizon {DOSE_HORIZON_DAYS} days, every {self.interval:.0f}s)")
+
+    async def stop(self):
+        """Cancel the task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        print("[Dose Scheduler] Stopped")
+
+    async def _run(self):
+        """Task loop"""
+        while True:
+            try:
+                result = await asyncio.to_thread(self._run_once)
+                self.runs += 1
+                self.scheduled += result["scheduled"]
+                self.missed += result["missed"]
+                if result["scheduled"] or result["missed"]:
+                    print(f"[Dose Scheduler] Scheduled {result['scheduled']} doses, marked {result['missed']} missed")
+            except Exception as e:
+                self.failures += 1
+                print(f"[Dose Scheduler] Run failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _run_once() -> Dict[str, int]:
+        """One pass in a worker thread with its own session"""
+        db = SessionLocal()
+        try:
+            return run_dose_schedule(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """
+        Get scheduler counters
+
+        Returns:
+            Dictionary with run, scheduled, missed and failure counts
+        """
+        return {
+            "runs": self.runs,
+            "scheduled": self.scheduled,
+            "missed": self.missed,
+            "failures": self.failures,
+        }
+
+
+# Process-wide scheduler, started with the API server
+dose_scheduler = DoseScheduler()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        result = run_dose_schedule(db)
+        print(f"✓ Scheduled {result['scheduled']} doses, marked {result['missed']} missed")
+    finally:
+        db.close()
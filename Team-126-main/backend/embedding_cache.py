@@ -0,0 +1,280 @@
+"""
+Two-tier cache for text embeddings
+
+Entries are keyed by a hash of the embedding model name and the normalized
+text, so a model change never returns stale vectors. A bounded in-memory
+LRU sits in front of an optional SQLite file that stores vectors as
+float32 blobs and is evicted by total size.
+"""
+
+from typing import Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+
+# Number of embeddings kept in memory
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+
+# SQLite file for the on-disk tier (empty string disables it)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+
+# Maximum size of stored vectors in the on-disk tier (megabytes)
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+
+# Write batches between exact recounts of the on-disk tier size; in between
+# a running total is kept (other processes sharing the file also change it)
+DISK_RECOUNT_WRITES = 100
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for cache lookups
+
+    Applies Unicode NFKC normalization, case folding and whitespace collapsing.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Content hash of the model name and normalized text"""
+    payload = f"{model_name}\0{normalize_text(text)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class EmbeddingCache:
+    """In-memory LRU tier backed by an optional size-bounded SQLite tier"""
+
+    def __init__(
+        self,
+        model_name: str,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        max_bytes: int = int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+    ):
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._disk_bytes = 0
+        self._writes_since_recount = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self._open_disk(path)
+            except Exception as e:
+                print(f"[Embedding Cache] Disk tier disabled: {e}")
+                self._db = None
+
+    def _open_disk(self, path: str):
+        """Open the SQLite tier and drop entries from other models"""
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used)"
+        )
+        deleted = self._db.execute(
+            "DELETE FROM embedding_cache WHERE model != ?", (self.model_name,)
+        ).rowcount
+        self._db.commit()
+        if deleted:
+            print(f"[Embedding Cache] Invalidated {deleted} entries from other embedding models")
+        self._recount_disk()
+
+    def get_memory(self, text: str) -> Optional[List[float]]:
+        """Look up the in-memory tier only (no I/O)"""
+        key = cache_key(self.model_name, text)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            return embedding
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up texts in both tiers
+
+        Disk hits are promoted to the memory tier.
+
+        Returns:
+            List of cached embeddings aligned with texts (None for misses)
+        """
+        keys = [cache_key(self.model_name, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        disk_lookups: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                embedding = self._memory.get(key)
+                if embedding is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    results[i] = embedding
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+            if disk_lookups and self._db is not None:
+                found = self._read_disk(list(disk_lookups))
+                for key, embedding in found.items():
+                    for i in disk_lookups.pop(key):
+                        results[i] = embedding
+                        self.disk_hits += 1
+                    self._remember(key, embedding)
+
+            self.misses += sum(len(indexes) for indexes in disk_lookups.values())
+
+        return results
+
+    def put_many(self, texts: List[str], embeddings: List[Optional[List[float]]]):
+        """Store embeddings in both tiers (None values are skipped)"""
+        rows = []
+        now = time.time()
+
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                if embedding is None:
+                    continue
+                key = cache_key(self.model_name, text)
+                embedding = list(embedding)
+                self._remember(key, embedding)
+                rows.append((key, self.model_name, np.asarray(embedding, dtype=np.float32).tobytes(), now))
+
+            if rows and self._db is not None:
+                try:
+                    replaced = self._stored_bytes([row[0] for row in rows])
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embedding_cache (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    self._disk_bytes += sum(len(row[2]) for row in rows) - replaced
+                    self._writes_since_recount += 1
+                    if self._writes_since_recount >= DISK_RECOUNT_WRITES:
+                        self._recount_disk()
+                    self._evict_disk()
+                    self._db.commit()
+                except Exception as e:
+                    print(f"[Embedding Cache] Failed to write disk tier: {e}")
+
+    def _remember(self, key: str, embedding: List[float]):
+        """Insert into the memory tier, evicting least recently used entries"""
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Fetch keys from the SQLite tier and refresh their last_used time"""
+        found = {}
+        try:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._db.commit()
+        except Exception as e:
+            print(f"[Embedding Cache] Failed to read disk tier: {e}")
+        return found
+
+    def _recount_disk(self):
+        """Set the running size of the SQLite tier from a full scan"""
+        self._disk_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding_cache"
+        ).fetchone()[0]
+        self._writes_since_recount = 0
+
+    def _stored_bytes(self, keys: List[str]) -> int:
+        """Size of the vectors already stored under keys (primary key lookups)"""
+        total = 0
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            total += self._db.execute(
+                f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embedding_cache WHERE key IN ({placeholders})",
+                chunk
+            ).fetchone()[0]
+        return total
+
+    def _evict_disk(self):
+        """Delete least recently used rows until the tier fits in max_bytes"""
+        if self._disk_bytes <= self.max_bytes:
+            return
+
+        excess = self._disk_bytes - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._db.execute(
+            "SELECT key, LENGTH(vector) FROM embedding_cache ORDER BY last_used"
+        ):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        self._db.executemany("DELETE FROM embedding_cache WHERE key = ?", stale_keys)
+        self._disk_bytes -= freed
+        self.evictions += len(stale_keys)
+
+    def clear(self):
+        """Remove all entries from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embedding_cache")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hit/miss counts per tier and current sizes
+        """
+        with self._lock:
+            disk_entries = 0
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_evictions": self.evictions,
+            }
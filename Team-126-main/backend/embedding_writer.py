@@ -0,0 +1,245 @@
+"""
+Write-behind embedding pipeline for chat messages
+
+Messages are stored immediately with a NULL embedding and their ids are
+queued here. A background worker embeds queued messages in batches and
+writes each batch back with a single bulk UPDATE, retrying failed messages
+with backoff. Messages that still have no embedding (e.g. after a restart or
+repeated failures) can be filled with backfill_embeddings.py.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import time
+from sqlalchemy import text, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from embeddings import generate_embeddings_batch_async
+from models import Message
+
+# Maximum messages embedded and written per batch
+EMBEDDING_WRITE_BATCH_SIZE = int(os.getenv("EMBEDDING_WRITE_BATCH_SIZE", "64"))
+
+# How long the worker waits to fill a batch after the first message arrives (seconds)
+EMBEDDING_WRITE_WINDOW_SECONDS = float(os.getenv("EMBEDDING_WRITE_WINDOW_SECONDS", "0.5"))
+
+# Attempts per message before it is left for the backfill command
+EMBEDDING_WRITE_MAX_ATTEMPTS = int(os.getenv("EMBEDDING_WRITE_MAX_ATTEMPTS", "5"))
+
+# Base delay before retrying a failed message (doubles per attempt, seconds)
+EMBEDDING_WRITE_RETRY_SECONDS = float(os.getenv("EMBEDDING_WRITE_RETRY_SECONDS", "2"))
+
+
+def write_message_embeddings(db: Session, embeddings: Dict[int, List[float]]) -> int:
+    """
+    Store embeddings for several messages with one bulk UPDATE
+
+    Args:
+        db: Database session
+        embeddings: Mapping of message id to embedding
+
+    Returns:
+        Number of messages updated
+    """
+    if not embeddings:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(
+            text("""
+                UPDATE messages AS m
+                SET embedding = CAST(v.embedding AS vector)
+                FROM unnest(
+                    CAST(:ids AS integer[]),
+                    CAST(:embeddings AS text[])
+                ) AS v(id, embedding)
+                WHERE m.id = v.id
+            """),
+            {
+                "ids": list(embeddings),
+                "embeddings": ["[" + ",".join(map(str, e)) + "]" for e in embeddings.values()]
+            }
+        )
+    else:
+        db.execute(
+            update(Message),
+            [{"id": message_id, "embedding": embedding} for message_id, embedding in embeddings.items()]
+        )
+
+    db.commit()
+    return len(embeddings)
+
+
+class EmbeddingWriter:
+    """Background worker that fills message embeddings in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = EMBEDDING_WRITE_BATCH_SIZE,
+        window: float = EMBEDDING_WRITE_WINDOW_SECONDS,
+        max_attempts: int = EMBEDDING_WRITE_MAX_ATTEMPTS,
+        retry_seconds: float = EMBEDDING_WRITE_RETRY_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.window = window
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._retry_handles = set()
+
+        self.written = 0
+        self.retried = 0
+        self.abandoned = 0
+
+    def start(self):
+        """Start the worker on the running event loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            print("[Embedding Writer] Started")
+
+    async def stop(self):
+        """Write everything still queued, then stop the worker"""
+        if self._worker is None:
+            return
+
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        print("[Embedding Writer] Stopped")
+
+    def enqueue(self, message_id: int, content: Optional[str], attempt: int = 0):
+        """
+        Queue a stored message for embedding
+
+        Blank messages are skipped. If the worker is not running, the message
+        keeps its NULL embedding until the next backfill.
+
+        Args:
+            message_id: ID of the stored message
+            content: Message text
+            attempt: Number of failed attempts so far
+        """
+        if not content or not content.strip():
+            return
+        if self._queue is None:
+            print(f"[Embedding Writer] Not running; message {message_id} left for backfill")
+            return
+        self._queue.put_nowait((message_id, content, attempt))
+
+    async def _next_batch(self) -> List[Tuple[int, str, int]]:
+        """Wait for one message, then gather more until the batch or window fills"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        """Worker loop"""
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._process(batch)
+            except Exception as e:
+                print(f"[Embedding Writer] Batch of {len(batch)} failed: {str(e)}")
+                for message_id, content, attempt in batch:
+                    self._retry(message_id, content, attempt)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _process(self, batch: List[Tuple[int, str, int]]):
+        """Embed a batch and write the successful embeddings back"""
+        results = await generate_embeddings_batch_async([content for _, content, _ in batch])
+
+        embeddings = {}
+        embedded = []
+        for item, embedding in zip(batch, results):
+            if embedding is None:
+                self._retry(*item)
+            else:
+                embeddings[item[0]] = embedding
+                embedded.append(item)
+
+        if not embeddings:
+            return
+        try:
+            await asyncio.to_thread(self._write, embeddings)
+        except Exception as e:
+            # Failed embeddings are already requeued; retry only the unwritten ones
+            print(f"[Embedding Writer] Writing {len(embeddings)} embeddings failed: {str(e)}")
+            for item in embedded:
+                self._retry(*item)
+            return
+        self.written += len(embeddings)
+
+    @staticmethod
+    def _write(embeddings: Dict[int, List[float]]):
+        """Bulk UPDATE in a worker thread with its own session"""
+        db = SessionLocal()
+        try:
+            write_message_embeddings(db, embeddings)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _retry(self, message_id: int, content: str, attempt: int):
+        """Requeue a failed message after exponential backoff"""
+        attempt += 1
+        if attempt >= self.max_attempts:
+            self.abandoned += 1
+            print(f"[Embedding Writer] Giving up on message {message_id} after {attempt} attempts; left for backfill")
+            return
+
+        self.retried += 1
+        delay = self.retry_seconds * (2 ** (attempt - 1))
+        loop = asyncio.get_running_loop()
+
+        def requeue():
+            self._retry_handles.discard(handle)
+            self.enqueue(message_id, content, attempt)
+
+        handle = loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def stats(self) -> Dict:
+        """
+        Get writer counters
+
+        Returns:
+            Dictionary with queue depth and written/retried/abandoned counts
+        """
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "pending_retries": len(self._retry_handles),
+            "written": self.written,
+            "retried": self.retried,
+            "abandoned": self.abandoned,
+        }
+
+
+# Process-wide writer, started with the API server
+embedding_writer = EmbeddingWriter()
@@ -2,12 +2,15 @@
 Embedding generation utilities using Vertex AI text embeddings
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from vertexai.language_models import TextEmbeddingModel
 import vertexai
+import asyncio
 import os
+import threading
 from dotenv import load_dotenv
 from google.oauth2 import service_account
+from embedding_cache import EmbeddingCache, normalize_text
 
 load_dotenv()
 
@@ -43,70 +46,315 @@ else:
 # Text embedding model (768 dimensions)
 EMBEDDING_MODEL_NAME = "text-embedding-004"
 
+# Provider limits for a single get_embeddings request
+# (text-embedding-004 accepts up to 250 texts / ~20k tokens per request)
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "250"))
+EMBEDDING_MAX_BATCH_CHARS = int(os.getenv("EMBEDDING_MAX_BATCH_CHARS", "60000"))
+
+# How long concurrent requests are gathered before a batch is sent (seconds)
+EMBEDDING_BATCH_WINDOW = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10")) / 1000.0
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class EmbeddingService:
+    """
+    Process-wide embedding client
+
+    Loads the embedding model once and gathers concurrent async requests
+    into get_embeddings batches (up to the provider limit) within a short
+    time window. Provider calls run in a worker thread so they never block
+    the event loop. Texts found in the embedding cache skip the provider.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_batch_chars: int = EMBEDDING_MAX_BATCH_CHARS,
+        batch_window: float = EMBEDDING_BATCH_WINDOW,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.model_name = model_name
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_batch_chars = max_batch_chars
+        self.batch_window = batch_window
+
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        # Requests waiting for the next async batch: (text, future)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()  # Running batches (kept so they aren't garbage-collected)
+
+        # Metrics
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._batch_size_counts["+Inf"] = 0
+        self._provider_calls = 0
+        self._texts_embedded = 0
+        self._failures = 0
+
+    def get_model(self) -> TextEmbeddingModel:
+        """Load the embedding model on first use and reuse it afterwards"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = TextEmbeddingModel.from_pretrained(self.model_name)
+        return self._model
+
+    def _split_batches(self, texts: List[str]) -> List[List[str]]:
+        """Split texts into provider-sized batches (by count and total length)"""
+        batches = []
+        current: List[str] = []
+        current_chars = 0
+
+        for text in texts:
+            if current and (
+                len(current) >= self.max_batch_size
+                or current_chars + len(text) > self.max_batch_chars
+            ):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(text)
+            current_chars += len(text)
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _record_batch(self, size: int, failed: bool = False):
+        """Update the batch-size histogram and counters"""
+        with self._stats_lock:
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._batch_size_counts[bucket] += 1
+                    break
+            else:
+                self._batch_size_counts["+Inf"] += 1
+            self._provider_calls += 1
+            if failed:
+                self._failures += 1
+            else:
+                self._texts_embedded += size
+
+    def embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed texts synchronously in provider-sized batches
+
+        Cached texts are served from the embedding cache and repeated texts
+        are embedded once. Empty texts and texts in a failed batch get None.
+
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            List of embeddings aligned with texts
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        indexed = [(i, text) for i, text in enumerate(texts) if text and text.strip()]
+
+        if indexed and self.cache is not None:
+            cached = self.cache.get_many([text for _, text in indexed])
+            for (i, _), embedding in zip(indexed, cached):
+                results[i] = embedding
+            indexed = [(i, text) for (i, text), embedding in zip(indexed, cached) if embedding is None]
+
+        # Embed each distinct (normalized) text once
+        positions: Dict[str, List[int]] = {}
+        for i, text in indexed:
+            positions.setdefault(normalize_text(text), []).append(i)
+        indexed = [(indexes[0], texts[indexes[0]]) for indexes in positions.values()]
+
+        if not indexed:
+            return results
+
+        try:
+            model = self.get_model()
+        except Exception as e:
+            print(f"Error loading embedding model: {str(e)}")
+            return results
+
+        position = 0
+        for batch in self._split_batches([text for _, text in indexed]):
+            batch_indexes = [i for i, _ in indexed[position:position + len(batch)]]
+            position += len(batch)
+
+            try:
+                embeddings = model.get_embeddings(batch)
+                values = [emb.values if emb else None for emb in embeddings]
+                for i, value in zip(batch_indexes, values):
+                    results[i] = value
+                self._record_batch(len(batch))
+                if self.cache is not None:
+                    self.cache.put_many(batch, values)
+            except Exception as e:
+                print(f"Error processing embedding batch of {len(batch)}: {str(e)}")
+                self._record_batch(len(batch), failed=True)
+
+        # Fill in repeated texts
+        for indexes in positions.values():
+            for i in indexes[1:]:
+                results[i] = results[indexes[0]]
+
+        return results
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """
+        Embed one text, batched together with other concurrent requests
+
+        Args:
+            text: Text string to embed
+
+        Returns:
+            List of 768 floats, or None if embedding failed
+        """
+        if not text or not text.strip():
+            return None
+
+        # Memory-tier cache hits never touch the queue
+        if self.cache is not None:
+            cached = self.cache.get_memory(text)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed several texts through the shared batching queue"""
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        """Send all pending requests to the provider in a worker thread"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._run_batch(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        """Forget a finished batch and report an unexpected failure"""
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in batched embedding task: {str(task.exception())}")
+
+    async def _run_batch(self, pending: List[Tuple[str, asyncio.Future]]):
+        """Embed a gathered batch and resolve its futures"""
+        with self._stats_lock:
+            self._in_flight += len(pending)
+        try:
+            embeddings = await asyncio.to_thread(self.embed_texts, [text for text, _ in pending])
+        except Exception as e:
+            print(f"Error in batched embedding: {str(e)}")
+            embeddings = [None] * len(pending)
+        finally:
+            with self._stats_lock:
+                self._in_flight -= len(pending)
+
+        for (_, future), embedding in zip(pending, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+
+    def stats(self) -> Dict:
+        """
+        Get embedding metrics
+
+        Returns:
+            Dictionary with queue depth, in-flight count, batch-size histogram and counters
+        """
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "queue_depth": len(self._pending),
+                "in_flight": self._in_flight,
+                "batch_size_histogram": {str(k): v for k, v in self._batch_size_counts.items()},
+                "provider_calls": self._provider_calls,
+                "texts_embedded": self._texts_embedded,
+                "failed_batches": self._failures,
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
+
+
+# Process-wide embedding client
+embedding_service = EmbeddingService(cache=EmbeddingCache(EMBEDDING_MODEL_NAME))
+
 
 def generate_embedding(text: str) -> Optional[List[float]]:
     """
     Generate text embedding using Vertex AI
 
+    Blocking; async code should use generate_embedding_async instead.
+
     Args:
         text: Text string to embed
 
     Returns:
         List of 768 floats representing the embedding, or None if failed
     """
-    try:
-        # Initialize the embedding model
-        model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
-
-        # Generate embedding
-        embeddings = model.get_embeddings([text])
-
-        if embeddings and len(embeddings) > 0:
-            # Return the embedding values as a list
-            return embeddings[0].values
-        else:
-            print(f"Warning: No embedding generated for text: {text[:50]}...")
-            return None
+    embedding = embedding_service.embed_texts([text])[0]
+    if embedding is None:
+        print(f"Warning: No embedding generated for text: {(text or '')[:50]}...")
+    return embedding
+
 
-    except Exception as e:
-        print(f"Error generating embedding: {str(e)}")
-        return None
+async def generate_embedding_async(text: str) -> Optional[List[float]]:
+    """
+    Generate text embedding without blocking the event loop
+
+    Concurrent calls are combined into a single provider request.
+
+    Args:
+        text: Text string to embed
+
+    Returns:
+        List of 768 floats representing the embedding, or None if failed
+    """
+    return await embedding_service.embed(text)
 
 
-def generate_embeddings_batch(texts: List[str], batch_size: int = 5) -> List[Optional[List[float]]]:
+def generate_embeddings_batch(texts: List[str], batch_size: Optional[int] = None) -> List[Optional[List[float]]]:
     """
     Generate embeddings for multiple texts in batches
 
     Args:
         texts: List of text strings to embed
-        batch_size: Number of texts to process in each batch (max 5 for Vertex AI)
+        batch_size: Deprecated; batches are sized to the provider limit
 
     Returns:
-        List of embeddings (each embedding is a list of 768 floats)
+        List of embeddings (each embedding is a list of 768 floats, or None if failed)
     """
-    try:
-        model = TextEmbeddingModel.from_pretrained(EMBEDDING_MODEL_NAME)
+    return embedding_service.embed_texts(texts)
 
-        all_embeddings = []
 
-        # Process in batches
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-
-            try:
-                embeddings = model.get_embeddings(batch)
-                batch_embeddings = [emb.values if emb else None for emb in embeddings]
-                all_embeddings.extend(batch_embeddings)
-            except Exception as e:
-                print(f"Error processing batch {i // batch_size + 1}: {str(e)}")
-                # Add None for failed embeddings
-                all_embeddings.extend([None] * len(batch))
+async def generate_embeddings_batch_async(texts: List[str]) -> List[Optional[List[float]]]:
+    """
+    Generate embeddings for multiple texts without blocking the event loop
 
-        return all_embeddings
+    Args:
+        texts: List of text strings to embed
 
-    except Exception as e:
-        print(f"Error in batch embedding generation: {str(e)}")
-        return [None] * len(texts)
+    Returns:
+        List of embeddings aligned with texts
+    """
+    return await embedding_service.embed_many(texts)
 
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
@@ -136,58 +384,41 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
 
 
 def get_similar_messages(
-    query_embedding: List[float],
+    query_embedding: Optional[List[float]],
     conversation_id: int,
     db,
     limit: int = 5,
-    similarity_threshold: float = 0.7
-):
+    similarity_threshold: float = 0.7,
+    query_text: Optional[str] = None,
+    before_message_id: Optional[int] = None
+) -> List[Dict]:
     """
     Find similar messages in a conversation using vector similarity search
 
+    Runs as a single query that returns scores; pass query_text to also rank
+    by full-text match (see message_search.search_conversation_messages).
+
     Args:
-        query_embedding: Embedding vector of the query text
+        query_embedding: Embedding vector of the query text (None for a
+            lexical-only search with query_text)
         conversation_id: ID of the conversation to search within
         db: SQLAlchemy database session
         limit: Maximum number of results to return
         similarity_threshold: Minimum similarity score (0-1) to include
+        query_text: Optional query text for hybrid lexical + vector ranking
+        before_message_id: Only search messages older than this id
 
     Returns:
-        List of Message objects ordered by similarity
+        List of message dicts with similarity and fused scores, best first
     """
-    from sqlalchemy import text
-    from models import Message
-
-    # Convert embedding to PostgreSQL vector format
-    embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
-
-    # Use pgvector's cosine similarity operator
-    query = text(f"""
-        SELECT id, content, role, embedding <=> :embedding as distance
-        FROM messages
-        WHERE conversation_id = :conversation_id
-        AND embedding IS NOT NULL
-        AND (1 - (embedding <=> :embedding)) >= :threshold
-        ORDER BY embedding <=> :embedding
-        LIMIT :limit
-    """)
-
-    result = db.execute(
-        query,
-        {
-            "embedding": embedding_str,
-            "conversation_id": conversation_id,
-            "threshold": similarity_threshold,
-            "limit": limit
-        }
+    from message_search import search_conversation_messages
+
+    return search_conversation_messages(
+        db,
+        conversation_id,
+        query_text=query_text,
+        query_embedding=query_embedding,
+        limit=limit,
+        similarity_threshold=similarity_threshold,
+        before_message_id=before_message_id
     )
-
-    # Fetch message IDs and retrieve full Message objects
-    message_ids = [row[0] for row in result]
-
-    if not message_ids:
-        return []
-
-    messages = db.query(Message).filter(Message.id.in_(message_ids)).all()
-
-    return messages
@@ -2,16 +2,27 @@
 Health and Chronic Care Management API Endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from typing import List, Optional
+from sqlalchemy import and_, func, insert, literal_column, select, true
+from typing import Any, List, Optional
 from datetime import datetime, timedelta
+import json
+import os
+import numpy as np
 
-from database import get_db
+from database import get_db, get_async_db
 from health_models import (
     Medication, MedicationDose, SymptomLog, VitalSign,
-    CarePlan, HealthGoal, HealthNote
+    CarePlan, HealthGoal, HealthNote, MedicationAdherenceDaily
+)
+from adherence_rollup import record_dose_status_change, rebuild_adherence_rollup
+from dose_scheduler import reschedule_medication_doses, schedule_medication_doses
+from health_series import (
+    keyset_page, bucket_expression, bucket_start, lttb,
+    DEFAULT_MAX_POINTS, MAX_POINTS_LIMIT
 )
 from health_schemas import (
     MedicationCreate, MedicationUpdate, MedicationResponse,
@@ -20,11 +31,21 @@ from health_schemas import (
     VitalSignCreate, VitalSignResponse,
     CarePlanCreate, CarePlanUpdate, CarePlanResponse,
     HealthGoalCreate, HealthGoalUpdate, HealthGoalResponse,
-    HealthDashboardSummary, MedicationAdherenceStats
+    HealthDashboardSummary, MedicationAdherenceStats,
+    VitalSignBulkRow, VitalSignBulkError, VitalSignBulkResponse
 )
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
+# Response header carrying the cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Largest batch accepted by /vitals/bulk
+VITALS_BULK_MAX_ROWS = int(os.getenv("VITALS_BULK_MAX_ROWS", "10000"))
+
+# Full days of dose history behind the adherence percentage (plus today so far)
+ADHERENCE_WINDOW_DAYS = 30
+
 
 # ============================================================================
 # MEDICATION ENDPOINTS
@@ -80,9 +101,15 @@ async def update_medication(
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
 
-    for field, value in medication_update.dict(exclude_unset=True).items():
+    changes = medication_update.dict(exclude_unset=True)
+    for field, value in changes.items():
         setattr(medication, field, value)
 
+    # Upcoming doses follow the new reminder times or active state
+    if changes.keys() & {"reminder_times", "reminder_enabled", "is_active"}:
+        db.flush()
+        reschedule_medication_doses(db, medication)
+
     db.commit()
     db.refresh(medication)
     return medication
@@ -95,7 +122,10 @@ async def delete_medication(medication_id: int, db: Session = Depends(get_db)):
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found")
 
+    user_id = medication.user_id
     db.delete(medication)
+    db.flush()
+    rebuild_adherence_rollup(db, user_id)
     db.commit()
     return {"message": "Medication deleted successfully"}
 
@@ -111,10 +141,14 @@ async def record_medication_dose(
     db: Session = Depends(get_db)
 ):
     """Record that a medication dose was taken"""
-    dose = db.query(MedicationDose).filter(MedicationDose.id == dose_id).first()
+    # Lock the dose so the status change can't race the missed-dose sweep
+    dose = db.query(MedicationDose).filter(MedicationDose.id == dose_id).with_for_update().first()
     if not dose:
         raise HTTPException(status_code=404, detail="Dose not found")
 
+    record_dose_status_change(
+        db, dose.medication.user_id, dose.scheduled_time, dose.status, dose_update.status
+    )
     dose.taken_time = dose_update.taken_time or datetime.utcnow()
     dose.status = dose_update.status
     dose.notes = dose_update.notes
@@ -187,13 +221,21 @@ async def log_symptom(symptom: SymptomLogCreate, db: Session = Depends(get_db)):
 
 @router.get("/symptoms", response_model=List[SymptomLogResponse])
 async def get_symptoms(
+    response: Response,
     user_id: int,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     symptom_type: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get symptom logs for a user"""
+    """
+    Get symptom logs for a user, newest first
+
+    Pages by keyset: pass the X-Next-Cursor response header back as cursor
+    to get the next page (the header is absent on the last page).
+    """
     query = db.query(SymptomLog).filter(SymptomLog.user_id == user_id)
 
     if start_date:
@@ -203,7 +245,10 @@ async def get_symptoms(
     if symptom_type:
         query = query.filter(SymptomLog.symptom.ilike(f"%{symptom_type}%"))
 
-    return query.order_by(SymptomLog.logged_at.desc()).all()
+    symptoms, next_cursor = keyset_page(query, SymptomLog.logged_at, SymptomLog.id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return symptoms
 
 
 @router.get("/symptoms/trends")
@@ -236,6 +281,45 @@ async def get_symptom_trends(
     } for trend in trends]
 
 
+@router.get("/symptoms/series")
+async def get_symptom_series(
+    user_id: int,
+    bucket: str = "day",
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    symptom_type: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Symptom counts and severity per hour/day/week bucket and symptom, for charts"""
+    start_date = start_date or datetime.utcnow() - timedelta(days=30)
+    period = bucket_expression(db.get_bind().dialect.name, SymptomLog.logged_at, bucket).label("bucket")
+
+    query = db.query(
+        period,
+        SymptomLog.symptom,
+        func.count(SymptomLog.id),
+        func.avg(SymptomLog.severity),
+        func.max(SymptomLog.severity)
+    ).filter(
+        SymptomLog.user_id == user_id,
+        SymptomLog.logged_at >= start_date
+    )
+    if end_date:
+        query = query.filter(SymptomLog.logged_at <= end_date)
+    if symptom_type:
+        query = query.filter(SymptomLog.symptom.ilike(f"%{symptom_type}%"))
+
+    rows = query.group_by(period, SymptomLog.symptom).order_by(period, SymptomLog.symptom).all()
+
+    return [{
+        "bucket_start": bucket_start(row[0]),
+        "symptom": row[1],
+        "count": row[2],
+        "avg_severity": round(row[3], 1) if row[3] is not None else None,
+        "max_severity": row[4]
+    } for row in rows]
+
+
 # ============================================================================
 # VITAL SIGNS TRACKING
 # ============================================================================
@@ -260,16 +344,86 @@ async def record_vital_sign(vital: VitalSignCreate, db: Session = Depends(get_db
     return db_vital
 
 
+@router.post("/vitals/bulk", response_model=VitalSignBulkResponse)
+async def record_vital_signs_bulk(request: Request, db: Session = Depends(get_db)):
+    """
+    Record a batch of vital sign measurements
+
+    The body is a JSON array of VitalSignCreate objects, or NDJSON (one
+    object per line, Content-Type application/x-ndjson). Invalid rows are
+    reported in errors by batch index and the rest are stored: abnormal
+    ranges are flagged in one vectorized pass per measurement type and rows
+    go in with multi-row INSERTs.
+    """
+    items = await read_vital_batch(request)
+
+    vitals: List[VitalSignCreate] = []
+    indexes: List[int] = []
+    errors: List[VitalSignBulkError] = []
+    for index, item in enumerate(items):
+        if isinstance(item, ValueError):
+            errors.append(VitalSignBulkError(index=index, error=str(item)))
+            continue
+        try:
+            vital = VitalSignCreate.model_validate(item)
+        except ValidationError as e:
+            errors.append(VitalSignBulkError(index=index, error=validation_message(e)))
+            continue
+        reason = vital_validation_error(vital)
+        if reason:
+            errors.append(VitalSignBulkError(index=index, error=reason))
+            continue
+        vitals.append(vital)
+        indexes.append(index)
+
+    abnormal = flag_abnormal_vitals(vitals)
+    now = datetime.utcnow()
+    rows = [{
+        **vital.dict(),
+        "measured_at": vital.measured_at or now,
+        "is_abnormal": bool(is_abnormal),
+        "alert_sent": False,
+        "created_at": now
+    } for vital, is_abnormal in zip(vitals, abnormal)]
+
+    ids = []
+    if rows:
+        # executemany with RETURNING is sent as multi-row INSERT ... VALUES
+        # statements (1000 rows each), ids in parameter order
+        table = VitalSign.__table__
+        ids = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        db.commit()
+
+    return VitalSignBulkResponse(
+        inserted=len(ids),
+        failed=len(errors),
+        abnormal_count=int(abnormal.sum()),
+        results=[
+            VitalSignBulkRow(index=index, id=vital_id, is_abnormal=bool(is_abnormal))
+            for index, vital_id, is_abnormal in zip(indexes, ids, abnormal)
+        ],
+        errors=errors
+    )
+
+
 @router.get("/vitals", response_model=List[VitalSignResponse])
 async def get_vital_signs(
+    response: Response,
     user_id: int,
     measurement_type: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get vital sign measurements"""
+    """
+    Get vital sign measurements, newest first
+
+    Pages by keyset like get_symptoms (cursor / X-Next-Cursor).
+    """
     query = db.query(VitalSign).filter(VitalSign.user_id == user_id)
 
     if measurement_type:
@@ -279,7 +433,95 @@ async def get_vital_signs(
     if end_date:
         query = query.filter(VitalSign.measured_at <= end_date)
 
-    return query.order_by(VitalSign.measured_at.desc()).limit(limit).all()
+    vitals, next_cursor = keyset_page(query, VitalSign.measured_at, VitalSign.id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return vitals
+
+
+@router.get("/vitals/series")
+async def get_vital_series(
+    user_id: int,
+    measurement_type: str,
+    bucket: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=3, le=MAX_POINTS_LIMIT),
+    db: Session = Depends(get_db)
+):
+    """
+    Chart series for one vital sign type, oldest first
+
+    With bucket (hour/day/week) readings are aggregated per bucket in SQL.
+    Without it, raw readings are returned, downsampled with LTTB to at most
+    max_points (blood pressure is shaped by systolic; the kept readings
+    carry both values).
+    """
+    filters = [VitalSign.user_id == user_id, VitalSign.measurement_type == measurement_type]
+    if start_date:
+        filters.append(VitalSign.measured_at >= start_date)
+    if end_date:
+        filters.append(VitalSign.measured_at <= end_date)
+
+    if bucket:
+        period = bucket_expression(db.get_bind().dialect.name, VitalSign.measured_at, bucket).label("bucket")
+        rows = db.query(
+            period,
+            func.count(VitalSign.id),
+            func.avg(VitalSign.value),
+            func.min(VitalSign.value),
+            func.max(VitalSign.value),
+            func.avg(VitalSign.systolic),
+            func.avg(VitalSign.diastolic),
+            func.count(VitalSign.id).filter(VitalSign.is_abnormal == True)
+        ).filter(*filters).group_by(period).order_by(period).all()
+
+        def rounded(value):
+            return round(float(value), 1) if value is not None else None
+
+        return {
+            "measurement_type": measurement_type,
+            "bucket": bucket,
+            "points": [{
+                "bucket_start": bucket_start(row[0]),
+                "count": row[1],
+                "avg_value": rounded(row[2]),
+                "min_value": rounded(row[3]),
+                "max_value": rounded(row[4]),
+                "avg_systolic": rounded(row[5]),
+                "avg_diastolic": rounded(row[6]),
+                "abnormal_count": row[7]
+            } for row in rows]
+        }
+
+    rows = db.query(
+        VitalSign.measured_at, VitalSign.value, VitalSign.systolic,
+        VitalSign.diastolic, VitalSign.is_abnormal
+    ).filter(*filters).filter(VitalSign.measured_at.isnot(None)).order_by(
+        VitalSign.measured_at, VitalSign.id
+    ).all()
+
+    total = len(rows)
+    if total > max_points:
+        x = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=total)
+        y = np.fromiter(
+            (row[1] if row[1] is not None else (row[2] or 0) for row in rows),
+            dtype=np.float64, count=total
+        )
+        rows = [rows[i] for i in lttb(x, y, max_points)]
+
+    return {
+        "measurement_type": measurement_type,
+        "total_readings": total,
+        "downsampled": total > max_points,
+        "points": [{
+            "measured_at": row[0],
+            "value": row[1],
+            "systolic": row[2],
+            "diastolic": row[3],
+            "is_abnormal": row[4]
+        } for row in rows]
+    }
 
 
 @router.get("/vitals/latest")
@@ -419,55 +661,31 @@ async def update_health_goal(
 # ============================================================================
 
 @router.get("/dashboard/{user_id}", response_model=HealthDashboardSummary)
-async def get_health_dashboard(user_id: int, db: Session = Depends(get_db)):
+async def get_health_dashboard(user_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get comprehensive health dashboard summary"""
+    return await db.run_sync(build_health_dashboard, user_id)
 
-    # Active medications count
-    active_meds = db.query(func.count(Medication.id)).filter(
-        and_(Medication.user_id == user_id, Medication.is_active == True)
-    ).scalar()
-
-    # Recent symptoms (last 7 days)
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_symptoms = db.query(func.count(SymptomLog.id)).filter(
-        and_(SymptomLog.user_id == user_id, SymptomLog.logged_at >= week_ago)
-    ).scalar()
-
-    # Active care plans
-    active_plans = db.query(func.count(CarePlan.id)).filter(
-        and_(CarePlan.user_id == user_id, CarePlan.status == "active")
-    ).scalar()
-
-    # Medication adherence
-    adherence = calculate_medication_adherence(user_id, db)
-
-    # Recent vitals (last 5 of each type)
-    recent_vitals = db.query(VitalSign).filter(
-        VitalSign.user_id == user_id
-    ).order_by(VitalSign.measured_at.desc()).limit(10).all()
-
-    # Health goals progress
-    goals = db.query(HealthGoal).filter(
-        and_(HealthGoal.user_id == user_id, HealthGoal.status == "in_progress")
-    ).all()
 
-    # Upcoming appointments
-    upcoming = db.query(CarePlan.next_appointment).filter(
-        and_(
-            CarePlan.user_id == user_id,
-            CarePlan.next_appointment >= datetime.utcnow()
-        )
-    ).order_by(CarePlan.next_appointment).limit(5).all()
+def build_health_dashboard(db: Session, user_id: int) -> HealthDashboardSummary:
+    """Assemble the dashboard summary (sync ORM code, run on the async session via run_sync)"""
+
+    # Counts, adherence and the dashboard lists in one round trip
+    counts, lists = dashboard_counts(db, user_id, with_lists=True)
+    adherence = adherence_stats(counts)
+
+    # JSON aggregates don't keep the subquery order on every database
+    recent_vitals = sorted(lists["recent_vitals"], key=lambda vital: vital["measured_at"], reverse=True)
+    upcoming = sorted(appointment["next_appointment"] for appointment in lists["upcoming_appointments"])
 
     return HealthDashboardSummary(
         user_id=user_id,
-        active_medications_count=active_meds,
-        recent_symptoms_count=recent_symptoms,
-        active_care_plans_count=active_plans,
+        active_medications_count=counts["active_medications"],
+        recent_symptoms_count=counts["recent_symptoms"],
+        active_care_plans_count=counts["active_care_plans"],
         medication_adherence=adherence,
         recent_vitals=recent_vitals,
-        upcoming_appointments=[apt[0] for apt in upcoming],
-        health_goals_progress=goals
+        upcoming_appointments=upcoming,
+        health_goals_progress=lists["health_goals"]
     )
 
 
@@ -476,74 +694,252 @@ async def get_health_dashboard(user_id: int, db: Session = Depends(get_db)):
 # ============================================================================
 
 def generate_medication_reminders(db: Session, medication: Medication):
-    """Generate scheduled medication doses for reminders"""
+    """Schedule doses for a medication through the rolling horizon (see dose_scheduler)"""
     if not medication.reminder_times:
         return
 
-    # Generate doses for the next 7 days
-    for day in range(7):
-        date = datetime.utcnow().date() + timedelta(days=day)
-        for time_str in medication.reminder_times:
-            hour, minute = map(int, time_str.split(':'))
-            scheduled_time = datetime.combine(date, datetime.min.time().replace(hour=hour, minute=minute))
-
-            dose = MedicationDose(
-                medication_id=medication.id,
-                scheduled_time=scheduled_time,
-                status="scheduled"
-            )
-            db.add(dose)
-
+    schedule_medication_doses(db, [medication])
     db.commit()
 
 
+# Normal range per measured field: readings outside [low, high] are abnormal
+ABNORMAL_VITAL_RANGES = {
+    "blood_pressure": [("systolic", 90, 140), ("diastolic", 60, 90)],
+    "glucose": [("value", 70, 180)],
+    "temperature": [("value", 96.8, 100.4)],
+    "heart_rate": [("value", 60, 100)],
+    "oxygen_saturation": [("value", 95, float("inf"))],
+}
+
+
 def check_vital_abnormality(vital: VitalSignCreate) -> bool:
     """Check if a vital sign measurement is abnormal"""
-    abnormal_ranges = {
-        "blood_pressure": lambda v: v.systolic > 140 or v.systolic < 90 or v.diastolic > 90 or v.diastolic < 60,
-        "glucose": lambda v: v.value > 180 or v.value < 70,
-        "temperature": lambda v: v.value > 100.4 or v.value < 96.8,
-        "heart_rate": lambda v: v.value > 100 or v.value < 60,
-        "oxygen_saturation": lambda v: v.value < 95,
-    }
-
-    check = abnormal_ranges.get(vital.measurement_type)
-    if check:
-        return check(vital)
+    for field, low, high in ABNORMAL_VITAL_RANGES.get(vital.measurement_type, []):
+        reading = getattr(vital, field)
+        if reading is not None and (reading < low or reading > high):
+            return True
 
     return False
 
 
-def calculate_medication_adherence(user_id: int, db: Session) -> MedicationAdherenceStats:
-    """Calculate medication adherence statistics"""
-    # Get doses from last 30 days
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-
-    doses = db.query(MedicationDose).join(Medication).filter(
-        and_(
-            Medication.user_id == user_id,
-            MedicationDose.scheduled_time >= thirty_days_ago,
-            MedicationDose.scheduled_time <= datetime.utcnow()
+async def read_vital_batch(request: Request) -> List[Any]:
+    """
+    Items of a bulk vitals body (JSON array or NDJSON)
+
+    NDJSON is parsed line by line as it streams in; a line that isn't valid
+    JSON becomes a ValueError entry so it is reported as that row's error.
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items: List[Any] = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            items.extend(parse_ndjson_line(line) for line in lines if line.strip())
+            if len(items) > VITALS_BULK_MAX_ROWS:
+                break
+        if buffer.strip():
+            items.append(parse_ndjson_line(buffer))
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+
+    if len(items) > VITALS_BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {VITALS_BULK_MAX_ROWS} measurements per batch"
         )
-    ).all()
+    return items
 
-    total = len(doses)
-    taken = len([d for d in doses if d.status == "taken"])
-    missed = len([d for d in doses if d.status == "missed"])
 
-    # Upcoming doses today
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
+def parse_ndjson_line(line: bytes) -> Any:
+    """One NDJSON record, or a ValueError describing why it isn't one"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
 
-    upcoming_today = db.query(func.count(MedicationDose.id)).join(Medication).filter(
-        and_(
-            Medication.user_id == user_id,
-            MedicationDose.scheduled_time >= datetime.utcnow(),
-            MedicationDose.scheduled_time < today_end,
-            MedicationDose.status == "scheduled"
-        )
-    ).scalar()
 
+def validation_message(error: ValidationError) -> str:
+    """Compact one-line summary of a pydantic validation error"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def vital_validation_error(vital: VitalSignCreate) -> Optional[str]:
+    """Reason a measurement can't be stored, or None"""
+    missing = [
+        field for field, _, _ in ABNORMAL_VITAL_RANGES.get(vital.measurement_type, [])
+        if getattr(vital, field) is None
+    ]
+    if missing:
+        return f"{vital.measurement_type} requires {' and '.join(missing)}"
+    if vital.value is None and vital.systolic is None:
+        return "value is required"
+    return None
+
+
+def flag_abnormal_vitals(vitals: List[VitalSignCreate]) -> np.ndarray:
+    """
+    check_vital_abnormality for a batch, one vectorized pass per measurement type
+
+    Returns:
+        Boolean array aligned with vitals
+    """
+    abnormal = np.zeros(len(vitals), dtype=bool)
+    types = np.array([v.measurement_type for v in vitals], dtype=object)
+
+    for measurement_type, ranges in ABNORMAL_VITAL_RANGES.items():
+        rows = np.flatnonzero(types == measurement_type)
+        if not len(rows):
+            continue
+        for field, low, high in ranges:
+            readings = np.array(
+                [getattr(vitals[i], field) for i in rows], dtype=np.float64
+            )
+            # NaN (missing) compares False, so it never flags
+            abnormal[rows] |= (readings < low) | (readings > high)
+
+    return abnormal
+
+
+def json_rows(db: Session, rows, columns: List[str]):
+    """
+    Scalar subquery aggregating the rows of a query into a JSON array of objects
+
+    Args:
+        db: Database session (picks json_agg on PostgreSQL, json_group_array on SQLite)
+        rows: Select of the rows to aggregate (its ORDER BY / LIMIT pick the rows)
+        columns: Columns of rows to put in each object
+
+    Returns:
+        Scalar subquery yielding the JSON array ("[]" when there are no rows)
+    """
+    sub = rows.subquery()
+    pairs = [item for column in columns for item in (literal_column(f"'{column}'"), sub.c[column])]
+    if db.get_bind().dialect.name == "postgresql":
+        aggregate = func.coalesce(func.json_agg(func.json_build_object(*pairs)), literal_column("'[]'::json"))
+    else:
+        aggregate = func.json_group_array(func.json_object(*pairs))
+    return select(aggregate).select_from(sub).scalar_subquery()
+
+
+def _decode_json_rows(value) -> List[dict]:
+    """JSON array from json_rows (drivers return it decoded or as text)"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else json.loads(value)
+
+
+# Columns of the dashboard lists (the fields of their response models)
+DASHBOARD_VITAL_COLUMNS = [
+    "id", "user_id", "measurement_type", "systolic", "diastolic", "value",
+    "unit", "measured_at", "notes", "is_abnormal", "created_at"
+]
+DASHBOARD_GOAL_COLUMNS = [
+    "id", "user_id", "care_plan_id", "title", "description", "category", "target_value",
+    "target_unit", "target_date", "current_value", "progress_percentage", "status",
+    "created_at", "updated_at", "completed_at"
+]
+
+
+def dashboard_counts(db: Session, user_id: int, with_lists: bool = False):
+    """
+    Dashboard counts and adherence inputs in a single query
+
+    Each count is a one-row aggregate subquery (COUNT ... FILTER over the
+    user's rows, served by the (user_id, ...) indexes); the subqueries are
+    joined ON true so they come back as one row. Adherence over the past
+    ADHERENCE_WINDOW_DAYS full days comes from the daily rollup; only today's
+    doses are read from medication_doses.
+
+    With with_lists, the recent vitals, in-progress goals and upcoming
+    appointments are added to the same row as JSON arrays (json_rows).
+
+    Returns:
+        Dictionary of counts, or (counts, lists) with with_lists
+    """
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    today = today_start.date()
+
+    medications = select(
+        func.count().filter(Medication.is_active == True).label("active_medications")
+    ).where(Medication.user_id == user_id).subquery()
+
+    symptoms = select(
+        func.count().label("recent_symptoms")
+    ).where(
+        SymptomLog.user_id == user_id,
+        SymptomLog.logged_at >= now - timedelta(days=7)
+    ).subquery()
+
+    care_plans = select(
+        func.count().filter(CarePlan.status == "active").label("active_care_plans")
+    ).where(CarePlan.user_id == user_id).subquery()
+
+    rollup = select(
+        func.coalesce(func.sum(MedicationAdherenceDaily.scheduled), 0).label("past_scheduled"),
+        func.coalesce(func.sum(MedicationAdherenceDaily.taken), 0).label("past_taken"),
+        func.coalesce(func.sum(MedicationAdherenceDaily.missed), 0).label("past_missed")
+    ).where(
+        MedicationAdherenceDaily.user_id == user_id,
+        MedicationAdherenceDaily.day >= today - timedelta(days=ADHERENCE_WINDOW_DAYS),
+        MedicationAdherenceDaily.day < today
+    ).subquery()
+
+    due = MedicationDose.scheduled_time <= now
+    today_doses = select(
+        func.count().filter(due).label("today_scheduled"),
+        func.count().filter(and_(due, MedicationDose.status == "taken")).label("today_taken"),
+        func.count().filter(and_(due, MedicationDose.status == "missed")).label("today_missed"),
+        func.count().filter(
+            and_(MedicationDose.scheduled_time >= now, MedicationDose.status == "scheduled")
+        ).label("upcoming_today")
+    ).select_from(MedicationDose).join(Medication).where(
+        Medication.user_id == user_id,
+        MedicationDose.scheduled_time >= today_start,
+        MedicationDose.scheduled_time < today_start + timedelta(days=1)
+    ).subquery()
+
+    joined = medications.join(symptoms, true()).join(care_plans, true()) \
+        .join(rollup, true()).join(today_doses, true())
+    if not with_lists:
+        row = db.execute(select(joined)).one()
+        return {key: int(value or 0) for key, value in row._mapping.items()}
+
+    list_columns = {
+        "recent_vitals": json_rows(db, select(VitalSign).where(
+            VitalSign.user_id == user_id
+        ).order_by(VitalSign.measured_at.desc()).limit(10), DASHBOARD_VITAL_COLUMNS),
+        "health_goals": json_rows(db, select(HealthGoal).where(
+            HealthGoal.user_id == user_id,
+            HealthGoal.status == "in_progress"
+        ), DASHBOARD_GOAL_COLUMNS),
+        "upcoming_appointments": json_rows(db, select(CarePlan.next_appointment).where(
+            CarePlan.user_id == user_id,
+            CarePlan.next_appointment >= now
+        ).order_by(CarePlan.next_appointment).limit(5), ["next_appointment"]),
+    }
+    row = db.execute(select(joined, *(column.label(name) for name, column in list_columns.items()))).one()
+    values = row._mapping
+    counts = {key: int(values[key] or 0) for key in values.keys() if key not in list_columns}
+    lists = {name: _decode_json_rows(values[name]) for name in list_columns}
+    return counts, lists
+
+
+def adherence_stats(counts: dict) -> MedicationAdherenceStats:
+    """Adherence statistics from dashboard_counts"""
+    total = counts["past_scheduled"] + counts["today_scheduled"]
+    taken = counts["past_taken"] + counts["today_taken"]
+    missed = counts["past_missed"] + counts["today_missed"]
     adherence_pct = (taken / total * 100) if total > 0 else 0
 
     return MedicationAdherenceStats(
@@ -551,5 +947,10 @@ def calculate_medication_adherence(user_id: int, db: Session) -> MedicationAdher
         doses_taken=taken,
         doses_missed=missed,
         adherence_percentage=round(adherence_pct, 1),
-        upcoming_doses_today=upcoming_today
+        upcoming_doses_today=counts["upcoming_today"]
     )
+
+
+def calculate_medication_adherence(user_id: int, db: Session) -> MedicationAdherenceStats:
+    """Calculate medication adherence statistics"""
+    return adherence_stats(dashboard_counts(db, user_id))
@@ -3,7 +3,7 @@ Health and Chronic Care Management Models
 For tracking medications, symptoms, vital signs, and care plans
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime, timedelta
@@ -68,6 +68,31 @@ class MedicationDose(Base):
     # Relationships
     medication = relationship("Medication", back_populates="doses")
 
+    __table_args__ = (
+        # Dose history, upcoming doses and adherence counts for a medication
+        Index("idx_medication_doses_med_time_status", "medication_id", "scheduled_time", "status"),
+        # One dose per medication and time, so scheduling is idempotent
+        Index("uq_medication_doses_med_time", "medication_id", "scheduled_time", unique=True),
+    )
+
+
+class MedicationAdherenceDaily(Base):
+    """
+    Per-user daily dose counts, maintained as doses are scheduled and recorded
+
+    Lets the dashboard compute 30-day adherence from at most 30 rows instead
+    of every dose in the window. Days are the date of scheduled_time.
+    """
+    __tablename__ = "medication_adherence_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+    scheduled = Column(Integer, nullable=False, default=0)  # All doses due that day
+    taken = Column(Integer, nullable=False, default=0)
+    missed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+
 
 class SymptomLog(Base):
     """Track symptoms over time"""
@@ -94,6 +119,11 @@ class SymptomLog(Base):
     logged_at = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Recent-symptom counts and keyset pages on (logged_at, id)
+        Index("idx_symptom_logs_user_logged_at", "user_id", "logged_at", "id"),
+    )
+
 
 class VitalSign(Base):
     """Track vital signs and health metrics"""
@@ -125,6 +155,12 @@ class VitalSign(Base):
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Keyset pages on (measured_at, id), with and without a type filter
+        Index("idx_vital_signs_user_measured_at", "user_id", "measured_at", "id"),
+        Index("idx_vital_signs_user_type_measured_at", "user_id", "measurement_type", "measured_at", "id"),
+    )
+
 
 class CarePlan(Base):
     """Comprehensive care plan for managing health conditions"""
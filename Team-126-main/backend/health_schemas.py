@@ -153,6 +153,25 @@ class VitalSignResponse(BaseModel):
         from_attributes = True
 
 
+class VitalSignBulkRow(BaseModel):
+    index: int  # Position in the uploaded batch
+    id: int
+    is_abnormal: bool
+
+
+class VitalSignBulkError(BaseModel):
+    index: int
+    error: str
+
+
+class VitalSignBulkResponse(BaseModel):
+    inserted: int
+    failed: int
+    abnormal_count: int
+    results: List[VitalSignBulkRow]
+    errors: List[VitalSignBulkError]
+
+
 # ============================================================================
 # Care Plan Schemas
 # ============================================================================
@@ -0,0 +1,163 @@
+"""
+Pagination and chart series helpers for health time series
+
+Symptom logs and vital signs are paged with keyset cursors on
+(timestamp, id), newest first, so a page costs the same however deep the
+client scrolls. Charts get either server-side time buckets (hour/day/week)
+or, for raw vital readings, a largest-triangle-three-buckets (LTTB)
+downsample that keeps the visual shape of long histories in a few hundred
+points.
+
+Run this module directly to benchmark the downsampler.
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import func, literal_column, tuple_
+from sqlalchemy.orm import Query
+
+# Supported chart bucket sizes
+BUCKETS = ("hour", "day", "week")
+
+# Default and maximum points returned by a downsampled vitals series
+DEFAULT_MAX_POINTS = 300
+MAX_POINTS_LIMIT = 2000
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    payload = json.dumps([timestamp.isoformat(), row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor (400 on a malformed cursor)"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(query: Query, time_column, id_column, cursor: Optional[str], limit: int):
+    """
+    One page of rows ordered newest first by (time_column, id_column)
+
+    Args:
+        query: Filtered ORM query
+        time_column: Timestamp column (logged_at / measured_at)
+        id_column: Primary key column, breaks timestamp ties
+        cursor: Cursor from the previous page (None for the first page)
+        limit: Page size
+
+    Returns:
+        (rows, next cursor or None on the last page)
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(time_column, id_column) < tuple_(timestamp, row_id))
+
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_column.key), getattr(last, id_column.key))
+
+
+def bucket_expression(dialect_name: str, column, bucket: str):
+    """
+    SQL expression truncating a timestamp to the start of its bucket
+
+    Weeks start on Monday on both backends.
+    """
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(BUCKETS)}")
+
+    if dialect_name == "postgresql":
+        # Inlined (bucket is validated) so SELECT and GROUP BY match
+        return func.date_trunc(literal_column(f"'{bucket}'"), column)
+    if bucket == "hour":
+        return func.strftime('%Y-%m-%d %H:00:00', column)
+    if bucket == "day":
+        return func.strftime('%Y-%m-%d 00:00:00', column)
+    return func.datetime(column, 'weekday 0', '-6 days', 'start of day')
+
+
+def bucket_start(value) -> datetime:
+    """Bucket value as a datetime (SQLite returns text)"""
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets downsampling
+
+    Keeps the first and last points and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket.
+
+    Args:
+        x: Sorted x values (e.g. epoch seconds)
+        y: y values
+        threshold: Number of points to keep
+
+    Returns:
+        Indices of the kept points, ascending
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        px, py = x[previous], y[previous]
+        area = np.abs(
+            (px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py)
+        )
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+
+    return kept
+
+
+def benchmark():
+    """Time LTTB on a year of readings at several sampling rates"""
+    print("=" * 60)
+    print("LTTB downsampling benchmark")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    for readings_per_day in (4, 24, 288):
+        n = 365 * readings_per_day
+        x = np.arange(n, dtype=np.float64) * (86400 / readings_per_day)
+        y = 120 + 10 * np.sin(x / 86400 / 7) + rng.normal(0, 5, n)
+        started = time.perf_counter()
+        kept = lttb(x, y, DEFAULT_MAX_POINTS)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{n:>8} readings -> {len(kept)} points in {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,374 @@
+"""
+In-memory query engine over the housing elements dataset
+
+Records from datasets/housing_elements.json are loaded once into NumPy
+columns. Equality filters (jurisdiction, vacancy status, simplified zoning)
+and query tokens have inverted indexes (sorted arrays of row numbers), and
+each posting list gets a units-sorted copy for range queries. Totals come
+from list lengths and binary search and only the requested page is
+materialized, so filter queries don't slow down as the dataset grows; text
+queries cost in proportion to the rows matching their rarest word.
+
+Run this module directly to benchmark it against a linear scan as the
+dataset grows.
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+HOUSING_DATA_FILE = os.path.join(os.path.dirname(__file__), 'datasets', 'housing_elements.json')
+
+# Units ranges sort their matching rows when there are at most this many;
+# broader ranges scan the posting list in row order until a page fills
+RANGE_SORT_THRESHOLD = 8192
+
+# Rows compared per step of that scan
+RANGE_SCAN_BLOCK = 4096
+
+# Distinct query tokens whose posting lists are kept
+TOKEN_CACHE_SIZE = 1024
+
+# Categorical filters, in key order
+FIELDS = ("jurisdiction", "vacancy_status", "zoning_type")
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def _factorize(values: List[str]):
+    """Per-row integer codes and value -> code mapping for a categorical column"""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), sort=False)
+    return codes.astype(np.int64), {value: code for code, value in enumerate(uniques)}
+
+
+def _group_rows(keys: np.ndarray) -> Dict[int, np.ndarray]:
+    """Inverted index: key -> sorted row numbers"""
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(keys)]))
+    return {int(sorted_keys[a]): order[a:b] for a, b in zip(starts, ends) if b > a}
+
+
+class Posting:
+    """Sorted row numbers matching one filter, with a lazily built units order for range queries"""
+
+    def __init__(self, rows: np.ndarray, units: np.ndarray):
+        self.rows = rows
+        self._units = units
+        self._units_sorted: Optional[np.ndarray] = None
+        self._rows_by_units: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def units_range(self, low: int, high: int, needed: int):
+        """
+        Rows with low <= units <= high, in row order
+
+        The total comes from binary search on the units-sorted rows. Narrow
+        ranges sort their few matching rows; broad ranges scan the posting in
+        row order until enough rows are found (matches are dense there).
+
+        Args:
+            low: Minimum units
+            high: Maximum units
+            needed: Number of leading matches required (offset + limit)
+
+        Returns:
+            (first matching rows, total matches)
+        """
+        if self._units_sorted is None:
+            order = np.argsort(self._units[self.rows], kind="stable")
+            self._rows_by_units = self.rows[order]
+            self._units_sorted = self._units[self._rows_by_units]
+
+        start = np.searchsorted(self._units_sorted, low, side="left")
+        end = np.searchsorted(self._units_sorted, high, side="right")
+        total = max(int(end - start), 0)
+
+        if total <= RANGE_SORT_THRESHOLD:
+            return np.sort(self._rows_by_units[start:end])[:needed], total
+
+        found = []
+        count = 0
+        for block_start in range(0, len(self.rows), RANGE_SCAN_BLOCK):
+            if count >= needed:
+                break
+            block = self.rows[block_start:block_start + RANGE_SCAN_BLOCK]
+            units = self._units[block]
+            matches = block[(units >= low) & (units <= high)]
+            found.append(matches)
+            count += len(matches)
+
+        rows = np.concatenate(found) if found else _EMPTY
+        return rows[:needed], total
+
+
+class HousingIndex:
+    """Columnar housing records with inverted indexes and sorted units arrays"""
+
+    def __init__(self, records: List[Dict], summary: Optional[Dict] = None):
+        """
+        Build the index
+
+        Every combination of the categorical filters gets its own posting
+        list, so any mix of them resolves to one exact list without
+        intersecting large lists at query time.
+
+        Args:
+            records: Records in housing_elements.json format
+            summary: Optional dataset summary from the same file
+        """
+        self.records = records
+        self.summary = summary or {}
+        n = len(records)
+
+        self.units = np.fromiter((r.get('units') or 0 for r in records), dtype=np.int64, count=n)
+        self.all_rows = Posting(np.arange(n, dtype=np.int64), self.units)
+
+        columns = {
+            "jurisdiction": [(r.get('jurisdiction') or '').lower() for r in records],
+            "vacancy_status": [r.get('vacancy_status') or '' for r in records],
+            "zoning_type": [((r.get('zoning') or {}).get('simplified') or '').lower() for r in records],
+        }
+        self.codes: Dict[str, np.ndarray] = {}
+        self.values: Dict[str, Dict[str, int]] = {}
+        for field in FIELDS:
+            self.codes[field], self.values[field] = _factorize(columns[field])
+
+        # One inverted index per non-empty subset of the categorical fields,
+        # keyed by the mixed-radix combination of the field codes
+        self._radix: Dict[str, int] = {}
+        stride = 1
+        for field in FIELDS:
+            self._radix[field] = stride
+            stride *= max(len(self.values[field]), 1)
+
+        self.combinations: Dict[tuple, Dict[int, Posting]] = {}
+        for mask in range(1, 2 ** len(FIELDS)):
+            fields = tuple(f for i, f in enumerate(FIELDS) if mask & (1 << i))
+            keys = sum(self.codes[f] * self._radix[f] for f in fields)
+            self.combinations[fields] = {
+                key: Posting(rows, self.units) for key, rows in _group_rows(keys).items()
+            }
+
+        # Token index: tokenize each distinct searchable_text once, then map
+        # tokens to the rows of every text containing them
+        text_codes, texts = _factorize([r.get('searchable_text') or '' for r in records])
+        rows_by_text = _group_rows(text_codes)
+        rows_by_token: Dict[str, List[np.ndarray]] = {}
+        for text, code in texts.items():
+            for token in set(text.split()):
+                rows_by_token.setdefault(token, []).append(rows_by_text[code])
+        self.tokens = {
+            token: np.sort(np.concatenate(parts)) for token, parts in rows_by_token.items()
+        }
+        self._token_cache: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _token_rows(self, term: str) -> np.ndarray:
+        """Rows with a token containing the query term (substring match, like the original scan)"""
+        rows = self._token_cache.get(term)
+        if rows is None:
+            matches = [postings for token, postings in self.tokens.items() if term in token]
+            rows = np.unique(np.concatenate(matches)) if matches else _EMPTY
+            if len(self._token_cache) >= TOKEN_CACHE_SIZE:
+                self._token_cache.pop(next(iter(self._token_cache)))
+            self._token_cache[term] = rows
+        return rows
+
+    def search(
+        self,
+        query: str = "",
+        jurisdiction: Optional[str] = None,
+        vacancy_status: Optional[str] = None,
+        zoning_type: Optional[str] = None,
+        min_units: Optional[int] = None,
+        max_units: Optional[int] = None,
+        offset: int = 0,
+        limit: int = 10
+    ) -> Dict:
+        """
+        Find matching records in dataset order
+
+        Args:
+            query: Text search; every word must appear in searchable_text
+            jurisdiction: Jurisdiction (case-insensitive)
+            vacancy_status: Vacancy status (exact, e.g. "Vacant")
+            zoning_type: Simplified zoning type (case-insensitive)
+            min_units: Minimum number of units
+            max_units: Maximum number of units
+            offset: Number of matching records to skip
+            limit: Maximum records to return
+
+        Returns:
+            Dictionary with results, total, offset, limit and next_offset
+            (None on the last page)
+        """
+        offset = max(offset, 0)
+        limit = max(limit, 0)
+
+        requested = {
+            "jurisdiction": jurisdiction and jurisdiction.lower(),
+            "vacancy_status": vacancy_status,
+            "zoning_type": zoning_type and zoning_type.lower(),
+        }
+        fields = tuple(f for f in FIELDS if requested[f])
+        if any(requested[f] not in self.values[f] for f in fields):
+            return self._page(_EMPTY, offset, limit)
+
+        posting = self.all_rows
+        if fields:
+            key = sum(self.values[f][requested[f]] * self._radix[f] for f in fields)
+            posting = self.combinations[fields].get(key)
+            if posting is None:
+                return self._page(_EMPTY, offset, limit)
+
+        has_range = min_units is not None or max_units is not None
+        low = min_units if min_units is not None else np.iinfo(np.int64).min
+        high = max_units if max_units is not None else np.iinfo(np.int64).max
+
+        terms = list(dict.fromkeys((query or "").lower().split()))
+        if not terms:
+            if has_range:
+                rows, total = posting.units_range(low, high, offset + limit)
+                return self._page(rows, offset, limit, total=total)
+            return self._page(posting.rows[:offset + limit], offset, limit, total=len(posting))
+
+        # Text search: start from the rarest word's rows and check the rest
+        token_rows = sorted((self._token_rows(term) for term in terms), key=len)
+        candidates = token_rows[0]
+        for rows in token_rows[1:]:
+            candidates = candidates[_contains(rows, candidates)]
+        for field in fields:
+            candidates = candidates[self.codes[field][candidates] == self.values[field][requested[field]]]
+        if has_range:
+            units = self.units[candidates]
+            candidates = candidates[(units >= low) & (units <= high)]
+
+        return self._page(candidates, offset, limit)
+
+    def _page(self, rows: np.ndarray, offset: int, limit: int, total: Optional[int] = None) -> Dict:
+        """Materialize one page of matching rows"""
+        total = len(rows) if total is None else total
+        page = rows[offset:offset + limit]
+        next_offset = offset + len(page)
+        return {
+            "results": [self.records[i] for i in page],
+            "total": int(total),
+            "offset": offset,
+            "limit": limit,
+            "next_offset": next_offset if next_offset < total else None
+        }
+
+
+def _contains(sorted_rows: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Membership of candidates in a sorted posting list (binary search)"""
+    if not len(sorted_rows):
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_rows, candidates), len(sorted_rows) - 1)
+    return sorted_rows[positions] == candidates
+
+
+def load_housing_data(path: str = HOUSING_DATA_FILE) -> Dict:
+    """Load the housing JSON data (created by convert_housing_to_json.py)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+_housing_index: Optional[HousingIndex] = None
+
+
+def get_housing_index() -> HousingIndex:
+    """
+    Get the process-wide housing index, building it on first use
+
+    Raises:
+        FileNotFoundError: If housing_elements.json has not been created yet
+    """
+    global _housing_index
+
+    if _housing_index is None:
+        data = load_housing_data()
+        _housing_index = HousingIndex(data['data'], data.get('summary'))
+        print(f"[Housing Index] Indexed {len(_housing_index)} housing records")
+
+    return _housing_index
+
+
+def _linear_search(records: List[Dict], query: str = "", jurisdiction: Optional[str] = None,
+                   vacancy_status: Optional[str] = None, zoning_type: Optional[str] = None,
+                   min_units: Optional[int] = None, max_units: Optional[int] = None) -> int:
+    """Count matches with a record-by-record scan (benchmark baseline)"""
+    terms = (query or "").lower().split()
+    count = 0
+    for record in records:
+        if terms and not all(any(t in w for w in record['searchable_text'].split()) for t in terms):
+            continue
+        if jurisdiction and record['jurisdiction'].lower() != jurisdiction.lower():
+            continue
+        if vacancy_status and record['vacancy_status'] != vacancy_status:
+            continue
+        if zoning_type and record['zoning']['simplified'].lower() != zoning_type.lower():
+            continue
+        if min_units is not None and record['units'] < min_units:
+            continue
+        if max_units is not None and record['units'] > max_units:
+            continue
+        count += 1
+    return count
+
+
+def benchmark(scales=(1, 10, 100), repeats: int = 200):
+    """Benchmark build and query time as the dataset is replicated to millions of parcels"""
+    records = load_housing_data()['data']
+
+    queries = {
+        "vacant + high density": dict(vacancy_status="Vacant", zoning_type="High Density Residential"),
+        "jurisdiction + 50+ units": dict(jurisdiction="City of San Diego", min_units=50),
+        "jurisdiction + vacant": dict(jurisdiction="City of San Diego", vacancy_status="Vacant"),
+        "text 'transit'": dict(query="transit"),
+        "text + vacant": dict(query="mixed", vacancy_status="Vacant"),
+        "units 100-500": dict(min_units=100, max_units=500),
+        "units >= 1": dict(min_units=1),
+    }
+
+    print("=" * 72)
+    print("Housing Index Benchmark")
+    print("=" * 72)
+
+    for scale in scales:
+        dataset = records * scale
+        start = time.perf_counter()
+        index = HousingIndex(dataset)
+        build_s = time.perf_counter() - start
+
+        print(f"\n{len(index):,} parcels (build {build_s:.2f} s)")
+        for label, params in queries.items():
+            page = index.search(**params)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                index.search(**params)
+            query_us = (time.perf_counter() - start) / repeats * 1e6
+
+            line = f"  {label:<26} {query_us:9.1f} µs/query   total={page['total']:,}"
+            if scale == 1:
+                start = time.perf_counter()
+                expected = _linear_search(dataset, **params)
+                scan_us = (time.perf_counter() - start) * 1e6
+                assert expected == page['total'], f"{label}: {expected} != {page['total']}"
+                line += f"   (linear scan {scan_us:,.0f} µs)"
+            print(line)
+
+    print("\n" + "=" * 72)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -7,7 +7,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text, func
 from dataset_models import HealthService, TransitStop
 from embeddings import generate_embedding
+from message_search import prepare_filtered_vector_scan
+from tools.transit_index import find_nearby_transit
 import math
+import os
+import numpy as np
 
 
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -33,6 +37,47 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+# Columns returned for every health service result (embeddings stay in the database)
+SERVICE_COLUMNS = [
+    "id", "longitude", "latitude", "region", "program", "address", "phone",
+    "website", "description", "taking_new_referrals", "population", "services",
+    "language"
+]
+
+# Candidates taken from each index (HNSW by similarity, GIST by distance)
+# before the combined score is computed in SQL
+HYBRID_CANDIDATE_POOL = int(os.getenv("HYBRID_CANDIDATE_POOL", "200"))
+
+
+def _is_postgres(db: Session) -> bool:
+    """Check whether the session is bound to PostgreSQL"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _embedding_literal(embedding: List[float]) -> str:
+    """Format an embedding as a pgvector literal"""
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
+def _service_row_to_dict(row) -> Dict:
+    """Convert a scored service row into the API result format"""
+    mapping = row._mapping
+    result = {column: mapping[column] for column in SERVICE_COLUMNS}
+    distance_km = float(mapping["distance_km"])
+    result["distance_km"] = distance_km
+    result["distance_miles"] = distance_km * 0.621371
+
+    if "similarity_score" in mapping:
+        result["similarity_score"] = float(mapping["similarity_score"])
+        result["distance_score"] = float(mapping["distance_score"])
+        result["combined_score"] = float(mapping["combined_score"])
+    else:
+        result["similarity_score"] = None
+        result["combined_score"] = None
+
+    return result
+
+
 def search_health_services_hybrid(
     db: Session,
     user_lat: float,
@@ -40,11 +85,16 @@ def search_health_services_hybrid(
     query: Optional[str] = None,
     max_distance_km: float = 50.0,
     limit: int = 10,
-    semantic_weight: float = 0.5
+    semantic_weight: float = 0.5,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict]:
     """
     Hybrid search for health services combining distance and semantic similarity
 
+    On PostgreSQL the combined score is computed in a single query over
+    candidates from the HNSW embedding index and the PostGIS location index.
+    Other databases (SQLite) use an in-memory NumPy matrix of services.
+
     Args:
         db: Database session
         user_lat: User's latitude
@@ -53,28 +103,41 @@ def search_health_services_hybrid(
         max_distance_km: Maximum distance to search (km)
         limit: Maximum number of results
         semantic_weight: Weight for semantic score (0-1), distance weight is (1 - semantic_weight)
+        query_embedding: Precomputed embedding of query (skips generating it here)
 
     Returns:
         List of health services with distance, similarity scores, and ranking
     """
+    if query and query_embedding is None:
+        query_embedding = generate_embedding(query)
+        if not query_embedding:
+            # Fallback to distance-only if embedding fails
+            print("Warning: Failed to generate query embedding, using distance-only search")
+
+    if not _is_postgres(db):
+        return service_matrix.search(
+            db, user_lat, user_lon, query_embedding, max_distance_km, limit, semantic_weight
+        )
+
+    if query_embedding is None:
+        return _distance_search_postgres(db, user_lat, user_lon, max_distance_km, limit)
+
+    return _hybrid_search_postgres(
+        db, user_lat, user_lon, query_embedding, max_distance_km, limit, semantic_weight
+    )
 
-    # Step 1: Find services within max distance using PostGIS
-    distance_query = text("""
+
+def _distance_search_postgres(
+    db: Session,
+    user_lat: float,
+    user_lon: float,
+    max_distance_km: float,
+    limit: int
+) -> List[Dict]:
+    """Nearest health services within max_distance_km, closest first"""
+    distance_query = text(f"""
         SELECT
-            id,
-            longitude,
-            latitude,
-            region,
-            program,
-            address,
-            phone,
-            website,
-            description,
-            taking_new_referrals,
-            population,
-            services,
-            language,
-            embedding,
+            {", ".join(SERVICE_COLUMNS)},
             ST_Distance(
                 location::geography,
                 ST_SetSRID(ST_MakePoint(:user_lon, :user_lat), 4326)::geography
@@ -87,114 +150,229 @@ def search_health_services_hybrid(
             :max_distance_meters
         )
         ORDER BY distance_km
-        LIMIT :query_limit
+        LIMIT :limit
     """)
 
-    # Execute distance query
     results = db.execute(
         distance_query,
         {
             "user_lat": user_lat,
             "user_lon": user_lon,
             "max_distance_meters": max_distance_km * 1000,  # Convert km to meters
-            "query_limit": limit * 3 if query else limit  # Get more results for semantic filtering
+            "limit": limit
         }
     ).fetchall()
 
-    # If no query provided, return results sorted by distance only
-    if not query:
+    return [_service_row_to_dict(row) for row in results]
+
+
+def _hybrid_search_postgres(
+    db: Session,
+    user_lat: float,
+    user_lon: float,
+    query_embedding: List[float],
+    max_distance_km: float,
+    limit: int,
+    semantic_weight: float
+) -> List[Dict]:
+    """
+    Rank health services by combined score entirely in PostgreSQL
+
+    Candidates are the union of the closest semantic matches (HNSW index on
+    embedding) and the closest services (GIST index on location); both are
+    restricted to the search radius and scored in the same query.
+    """
+    pool = max(HYBRID_CANDIDATE_POOL, limit * 10)
+
+    # Let the radius-filtered HNSW scan return enough rows to fill the pool
+    prepare_filtered_vector_scan(db, pool)
+
+    hybrid_query = text(f"""
+        WITH user_point AS (
+            SELECT ST_SetSRID(ST_MakePoint(:user_lon, :user_lat), 4326) AS geom
+        ),
+        semantic AS (
+            SELECT id
+            FROM health_services
+            WHERE embedding IS NOT NULL
+            ORDER BY embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :pool
+        ),
+        nearby AS (
+            SELECT hs.id
+            FROM health_services hs, user_point up
+            WHERE hs.location IS NOT NULL
+            ORDER BY hs.location <-> up.geom
+            LIMIT :pool
+        ),
+        scored AS (
+            SELECT
+                {", ".join("hs." + column for column in SERVICE_COLUMNS)},
+                ST_Distance(hs.location::geography, up.geom::geography) / 1000.0 AS distance_km,
+                COALESCE(1 - (hs.embedding <=> CAST(:query_embedding AS vector)), 0) AS similarity_score
+            FROM health_services hs
+            CROSS JOIN user_point up
+            WHERE hs.id IN (SELECT id FROM semantic UNION SELECT id FROM nearby)
+            AND hs.location IS NOT NULL
+            AND ST_DWithin(hs.location::geography, up.geom::geography, :max_distance_meters)
+        )
+        SELECT
+            *,
+            GREATEST(1.0 - distance_km / :max_distance_km, 0) AS distance_score,
+            :semantic_weight * similarity_score
+                + (1 - :semantic_weight) * GREATEST(1.0 - distance_km / :max_distance_km, 0) AS combined_score
+        FROM scored
+        ORDER BY combined_score DESC
+        LIMIT :limit
+    """)
+
+    results = db.execute(
+        hybrid_query,
+        {
+            "user_lat": user_lat,
+            "user_lon": user_lon,
+            "query_embedding": _embedding_literal(query_embedding),
+            "max_distance_meters": max_distance_km * 1000,
+            "max_distance_km": max_distance_km if max_distance_km > 0 else 1e-9,
+            "semantic_weight": semantic_weight,
+            "pool": pool,
+            "limit": limit
+        }
+    ).fetchall()
+
+    return [_service_row_to_dict(row) for row in results]
+
+
+class ServiceMatrix:
+    """
+    In-memory matrix of health services for databases without pgvector/PostGIS
+
+    Embeddings are held as a row-normalized float32 matrix and coordinates
+    as contiguous arrays, so a search is one matrix-vector product plus a
+    vectorized haversine pass. The matrix reloads when the table changes.
+    """
+
+    def __init__(self):
+        self._signature = None
+        self._rows: List[Dict] = []
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._embeddings = np.empty((0, 0), dtype=np.float32)
+        self._has_embedding = np.empty(0, dtype=bool)
+
+    def _load(self, db: Session):
+        """Load services from the database if the table changed since the last load"""
+        # updated_at catches rows re-imported in place (same count and ids)
+        signature = db.query(
+            func.count(HealthService.id), func.max(HealthService.id), func.max(HealthService.updated_at)
+        ).one()
+        if signature == self._signature:
+            return
+
+        # Select plain columns only; the PostGIS location column is not readable here
+        services = db.query(
+            *[getattr(HealthService, column) for column in SERVICE_COLUMNS],
+            HealthService.embedding
+        ).all()
+        self._rows = [{column: getattr(s, column) for column in SERVICE_COLUMNS} for s in services]
+        self._lat = np.array([s.latitude for s in services], dtype=np.float64)
+        self._lon = np.array([s.longitude for s in services], dtype=np.float64)
+
+        dim = next((len(s.embedding) for s in services if s.embedding is not None), 0)
+        matrix = np.zeros((len(services), dim), dtype=np.float32)
+        has_embedding = np.zeros(len(services), dtype=bool)
+        for i, s in enumerate(services):
+            if s.embedding is not None and len(s.embedding) == dim:
+                matrix[i] = s.embedding
+                has_embedding[i] = True
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._embeddings = matrix / norms
+        self._has_embedding = has_embedding
+        self._signature = signature
+        print(f"[Hybrid Search] Loaded {len(services)} health services into memory")
+
+    def search(
+        self,
+        db: Session,
+        user_lat: float,
+        user_lon: float,
+        query_embedding: Optional[List[float]],
+        max_distance_km: float,
+        limit: int,
+        semantic_weight: float
+    ) -> List[Dict]:
+        """Distance-only or hybrid search over the in-memory matrix"""
+        self._load(db)
+        if not self._rows:
+            return []
+
+        distances = haversine_distances(user_lat, user_lon, self._lat, self._lon)
+        candidates = np.flatnonzero(distances <= max_distance_km)
+        if candidates.size == 0:
+            return []
+
+        if query_embedding is None or self._embeddings.shape[1] != len(query_embedding):
+            order = candidates[np.argsort(distances[candidates], kind="stable")][:limit]
+            return [self._result(i, distances[i]) for i in order]
+
+        query_vec = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vec)
+        if query_norm > 0:
+            query_vec = query_vec / query_norm
+
+        similarity = self._embeddings[candidates] @ query_vec
+        similarity[~self._has_embedding[candidates]] = 0.0
+        distance_score = 1.0 - distances[candidates] / max_distance_km if max_distance_km > 0 else np.ones(candidates.size)
+        combined = semantic_weight * similarity + (1 - semantic_weight) * distance_score
+
+        k = min(limit, candidates.size)
+        top = np.argpartition(-combined, k - 1)[:k]
+        top = top[np.argsort(-combined[top], kind="stable")]
+
         return [
-            {
-                "id": row[0],
-                "longitude": row[1],
-                "latitude": row[2],
-                "region": row[3],
-                "program": row[4],
-                "address": row[5],
-                "phone": row[6],
-                "website": row[7],
-                "description": row[8],
-                "taking_new_referrals": row[9],
-                "population": row[10],
-                "services": row[11],
-                "language": row[12],
-                "distance_km": float(row[14]),
-                "distance_miles": float(row[14]) * 0.621371,
-                "similarity_score": None,
-                "combined_score": None
-            }
-            for row in results
+            self._result(
+                candidates[i], distances[candidates[i]],
+                float(similarity[i]), float(distance_score[i]), float(combined[i])
+            )
+            for i in top
         ]
 
-    # Step 2: Generate embedding for search query
-    query_embedding = generate_embedding(query)
+    def _result(self, index, distance_km, similarity=None, distance_score=None, combined=None) -> Dict:
+        """Build an API result dict for the service at index"""
+        result = dict(self._rows[index])
+        result["distance_km"] = float(distance_km)
+        result["distance_miles"] = float(distance_km) * 0.621371
+        result["similarity_score"] = similarity
+        if similarity is not None:
+            result["distance_score"] = distance_score
+        result["combined_score"] = combined
+        return result
 
-    if not query_embedding:
-        # Fallback to distance-only if embedding fails
-        print("Warning: Failed to generate query embedding, using distance-only search")
-        return search_health_services_hybrid(db, user_lat, user_lon, None, max_distance_km, limit)
 
-    # Step 3: Calculate semantic similarity and combined scores
-    scored_results = []
+def haversine_distances(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Haversine distance from one point to many points
 
-    for row in results:
-        service_embedding = row[13]  # embedding column
+    Args:
+        lat, lon: Origin coordinates
+        lats, lons: Arrays of destination coordinates
 
-        # Calculate cosine similarity if embedding exists
-        if service_embedding:
-            # Convert pgvector to list if needed
-            if hasattr(service_embedding, '__iter__'):
-                service_emb_list = list(service_embedding)
-            else:
-                service_emb_list = service_embedding
+    Returns:
+        Array of distances in kilometers
+    """
+    R = 6371  # Earth's radius in kilometers
 
-            # Calculate cosine similarity
-            import numpy as np
-            query_vec = np.array(query_embedding)
-            service_vec = np.array(service_emb_list)
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
 
-            similarity = np.dot(query_vec, service_vec) / (
-                np.linalg.norm(query_vec) * np.linalg.norm(service_vec)
-            )
-            similarity_score = float(similarity)
-        else:
-            similarity_score = 0.0
-
-        # Normalize distance score (inverse - closer is better)
-        # Max distance gets score of 0, min distance gets score of 1
-        distance_km = float(row[14])
-        max_dist = max_distance_km
-        distance_score = 1.0 - (distance_km / max_dist) if max_dist > 0 else 1.0
-
-        # Combined score (weighted average)
-        combined_score = (semantic_weight * similarity_score) + ((1 - semantic_weight) * distance_score)
-
-        scored_results.append({
-            "id": row[0],
-            "longitude": row[1],
-            "latitude": row[2],
-            "region": row[3],
-            "program": row[4],
-            "address": row[5],
-            "phone": row[6],
-            "website": row[7],
-            "description": row[8],
-            "taking_new_referrals": row[9],
-            "population": row[10],
-            "services": row[11],
-            "language": row[12],
-            "distance_km": distance_km,
-            "distance_miles": distance_km * 0.621371,
-            "similarity_score": similarity_score,
-            "distance_score": distance_score,
-            "combined_score": combined_score
-        })
-
-    # Sort by combined score (highest first)
-    scored_results.sort(key=lambda x: x['combined_score'], reverse=True)
-
-    # Return top N results
-    return scored_results[:limit]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# Process-wide matrix used when PostgreSQL is not available
+service_matrix = ServiceMatrix()
 
 
 def find_nearest_transit_stops(
@@ -252,17 +430,177 @@ def find_nearest_transit_stops(
         }
     ).fetchall()
 
-    return [
-        {
-            "id": row[0],
-            "name": row[1],
-            "latitude": row[2],
-            "longitude": row[3],
-            "agency": row[4],
-            "code": row[5],
-            "wheelchair_accessible": row[6] == '1',
-            "distance_km": float(row[7]),
-            "distance_miles": float(row[7]) * 0.621371
-        }
-        for row in results
-    ]
+    return [_transit_row_to_dict(row) for row in results]
+
+
+def _transit_row_to_dict(row) -> Dict:
+    """Convert a transit stop row into the API result format"""
+    mapping = row._mapping
+    distance_km = float(mapping["distance_km"])
+    return {
+        "id": mapping["id"],
+        "name": mapping["stop_name"],
+        "latitude": mapping["stop_lat"],
+        "longitude": mapping["stop_lon"],
+        "agency": mapping["stop_agency"],
+        "code": mapping["stop_code"],
+        "wheelchair_accessible": mapping["wheelchair_boarding"] == '1',
+        "distance_km": distance_km,
+        "distance_miles": distance_km * 0.621371
+    }
+
+
+# Nearest stops stored per service in health_service_nearby_transit
+# (refreshed by import_datasets.py)
+PRECOMPUTED_TRANSIT_LIMIT = 5
+PRECOMPUTED_TRANSIT_RADIUS_KM = 2.0
+
+# Nearest transit stops for every row of a set of points, in one query
+NEARBY_TRANSIT_LATERAL_SQL = """
+    SELECT
+        p.point_id,
+        t.id,
+        t.stop_name,
+        t.stop_lat,
+        t.stop_lon,
+        t.stop_agency,
+        t.stop_code,
+        t.wheelchair_boarding,
+        t.distance_km,
+        t.stop_rank
+    FROM {points} AS p
+    CROSS JOIN LATERAL (
+        SELECT
+            ts.id,
+            ts.stop_name,
+            ts.stop_lat,
+            ts.stop_lon,
+            ts.stop_agency,
+            ts.stop_code,
+            ts.wheelchair_boarding,
+            ST_Distance(ts.location::geography, p.geog) / 1000.0 AS distance_km,
+            ROW_NUMBER() OVER (
+                ORDER BY ST_Distance(ts.location::geography, p.geog)
+            ) AS stop_rank
+        FROM transit_stops ts
+        WHERE ts.location IS NOT NULL
+        AND ST_DWithin(ts.location::geography, p.geog, :max_distance_meters)
+        ORDER BY distance_km
+        LIMIT :limit
+    ) AS t
+"""
+
+
+def attach_nearby_transit(
+    db: Session,
+    services: List[Dict],
+    limit: int = 3,
+    max_distance_km: float = 1.0
+) -> List[Dict]:
+    """
+    Add a 'nearby_transit' list to each service using a single query
+
+    Uses the precomputed health_service_nearby_transit table when it covers
+    the requested limit and radius, otherwise a LATERAL join over the
+    transit_stops spatial index. Without PostGIS the in-process grid index
+    over transit_stops.json is used instead.
+
+    Args:
+        db: Database session
+        services: Health service result dicts with id, latitude and longitude
+        limit: Maximum number of stops per service
+        max_distance_km: Maximum distance from the service in km
+
+    Returns:
+        The same list of services, each with 'nearby_transit'
+    """
+    for service in services:
+        service['nearby_transit'] = []
+
+    if not services:
+        return services
+
+    if not _is_postgres(db):
+        for service in services:
+            if service.get('latitude') is not None and service.get('longitude') is not None:
+                service['nearby_transit'] = find_nearby_transit(
+                    service['latitude'], service['longitude'], limit=limit, max_distance_km=max_distance_km
+                )
+        return services
+
+    by_id = {service['id']: service for service in services}
+
+    rows = []
+    if (
+        limit <= PRECOMPUTED_TRANSIT_LIMIT
+        and max_distance_km <= PRECOMPUTED_TRANSIT_RADIUS_KM
+        and _has_precomputed_transit(db)
+    ):
+        rows = db.execute(
+            text("""
+                SELECT
+                    n.health_service_id AS point_id,
+                    ts.id,
+                    ts.stop_name,
+                    ts.stop_lat,
+                    ts.stop_lon,
+                    ts.stop_agency,
+                    ts.stop_code,
+                    ts.wheelchair_boarding,
+                    n.distance_km
+                FROM health_service_nearby_transit n
+                JOIN transit_stops ts ON ts.id = n.transit_stop_id
+                WHERE n.health_service_id = ANY(:service_ids)
+                AND n.stop_rank <= :limit
+                AND n.distance_km <= :max_distance_km
+                ORDER BY n.health_service_id, n.stop_rank
+            """),
+            {
+                "service_ids": list(by_id),
+                "limit": limit,
+                "max_distance_km": max_distance_km
+            }
+        ).fetchall()
+    else:
+        points = """(
+            SELECT
+                point_id,
+                ST_SetSRID(ST_MakePoint(lon, lat), 4326)::geography AS geog
+            FROM unnest(
+                CAST(:service_ids AS integer[]),
+                CAST(:latitudes AS double precision[]),
+                CAST(:longitudes AS double precision[])
+            ) AS u(point_id, lat, lon)
+        )"""
+        rows = db.execute(
+            text(NEARBY_TRANSIT_LATERAL_SQL.format(points=points) + " ORDER BY p.point_id, t.distance_km"),
+            {
+                "service_ids": [service['id'] for service in services],
+                "latitudes": [service['latitude'] for service in services],
+                "longitudes": [service['longitude'] for service in services],
+                "max_distance_meters": max_distance_km * 1000,
+                "limit": limit
+            }
+        ).fetchall()
+
+    for row in rows:
+        by_id[row._mapping["point_id"]]['nearby_transit'].append(_transit_row_to_dict(row))
+
+    return services
+
+
+_precomputed_transit_available = False
+
+
+def _has_precomputed_transit(db: Session) -> bool:
+    """Check whether health_service_nearby_transit is populated (remembered once true)"""
+    global _precomputed_transit_available
+
+    if not _precomputed_transit_available:
+        try:
+            _precomputed_transit_available = bool(db.execute(
+                text("SELECT EXISTS (SELECT 1 FROM health_service_nearby_transit)")
+            ).scalar())
+        except Exception:
+            db.rollback()
+    return _precomputed_transit_available
@@ -3,94 +3,106 @@ Import San Diego County datasets into PostgreSQL
 This script loads health services, transit stops, transit routes, and housing data
 """
 
+import argparse
 import pandas as pd
 import sys
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, delete, text
 from sqlalchemy.orm import sessionmaker
-from geoalchemy2.functions import ST_SetSRID, ST_MakePoint
 from database import DATABASE_URL, Base
-from dataset_models import HealthService, TransitStop, TransitRoute, HousingElement
-from embeddings import generate_embedding
+from dataset_models import HealthService, TransitStop, TransitRoute, HousingElement, HealthServiceNearbyTransit
+from dataset_loader import (
+    BulkLoader,
+    IMPORT_CHUNK_SIZE,
+    read_dataset_csv,
+    text_column,
+    int_column,
+    float_column,
+    joined_text
+)
+from models import ResponseCacheEntry
+from hybrid_search import NEARBY_TRANSIT_LATERAL_SQL, PRECOMPUTED_TRANSIT_LIMIT, PRECOMPUTED_TRANSIT_RADIUS_KM
+import os
 import urllib.parse
 
-def import_health_services(session):
+
+def _dataset_path(filename: str) -> str:
+    """Dataset path, accepting both the decoded and the URL-encoded download name"""
+    decoded = urllib.parse.unquote(filename)
+    return decoded if os.path.exists(decoded) else filename
+
+
+HEALTH_SERVICES_FILE = 'datasets/Behavioral_Health_Services_San_Diego_County_1657686067853346365.csv'
+TRANSIT_STOPS_FILE = _dataset_path('datasets/Public_Transit_Stops%2C_San_Diego_County.csv')
+TRANSIT_ROUTES_FILE = _dataset_path('datasets/Public_Transit_Routes%2C_San_Diego_County.csv')
+HOUSING_ELEMENTS_FILE = 'datasets/HousingElements_SDCounty_2021_2029_3908156892941684000.csv'
+
+
+def _is_postgres(session) -> bool:
+    """COPY, PostGIS and index steps only apply to PostgreSQL"""
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def import_health_services(session, fresh=False, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
     """Import Behavioral Health Services data"""
     print("\n" + "="*60)
     print("Importing Health Services...")
     print("="*60)
 
     try:
-        # Read CSV - handle potential encoding issues
-        df = pd.read_csv(
-            'datasets/Behavioral_Health_Services_San_Diego_County_1657686067853346365.csv',
-            encoding='utf-8-sig'  # Handle BOM
-        )
-
+        df = read_dataset_csv(HEALTH_SERVICES_FILE)
         print(f"Found {len(df)} health service records")
 
-        # Clean column names (remove BOM and whitespace)
-        df.columns = df.columns.str.strip().str.replace('\ufeff', '')
-
-        total = len(df)
-        for idx, row in df.iterrows():
-            try:
-                # Create text for embedding
-                embedding_text = f"{row.get('Program', '')} {row.get('Description', '')} {row.get('Services', '')} {row.get('Population', '')}"
-                embedding_text = embedding_text.strip()
-
-                # Generate embedding (with progress indicator)
-                if (idx + 1) % 100 == 0:
-                    print(f"  Processing {idx + 1}/{total}...")
-
-                embedding = generate_embedding(embedding_text) if embedding_text else None
-
-                # Create health service record
-                service = HealthService(
-                    longitude=float(row['LONG']),
-                    latitude=float(row['LAT']),
-                    region=str(row.get('Region', ''))[:255] if pd.notna(row.get('Region')) else None,
-                    program=str(row.get('Program', ''))[:255] if pd.notna(row.get('Program')) else None,
-                    address=str(row.get('Address', '')) if pd.notna(row.get('Address')) else None,
-                    phone=str(row.get('Phone', ''))[:255] if pd.notna(row.get('Phone')) else None,
-                    website=str(row.get('Website', ''))[:255] if pd.notna(row.get('Website')) else None,
-                    description=str(row.get('Description', '')) if pd.notna(row.get('Description')) else None,
-                    taking_new_referrals=str(row.get('Taking New Referrals', ''))[:255] if pd.notna(row.get('Taking New Referrals')) else None,
-                    population=str(row.get('Population', '')) if pd.notna(row.get('Population')) else None,
-                    services=str(row.get('Services', '')) if pd.notna(row.get('Services')) else None,
-                    language=str(row.get('Language', ''))[:255] if pd.notna(row.get('Language')) else None,
-                    fid=str(row.get('FID', ''))[:255] if pd.notna(row.get('FID')) else None,
-                    embedding=embedding
-                )
-
-                session.add(service)
-
-                # Commit in batches
-                if (idx + 1) % 100 == 0:
-                    session.commit()
-
-            except Exception as e:
-                print(f"  ⚠ Error processing row {idx}: {str(e)}")
-                continue
-
-        # Final commit
-        session.commit()
-
-        # Update PostGIS location column
-        print("  Updating PostGIS location geometries...")
-        session.execute(text("""
-            UPDATE health_services
-            SET location = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
-            WHERE location IS NULL;
-        """))
-        session.commit()
-
-        # Create spatial index
-        print("  Creating spatial index...")
-        session.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_health_services_location
-            ON health_services USING GIST (location);
-        """))
-        session.commit()
+        services = pd.DataFrame({
+            'longitude': float_column(df, 'LONG'),
+            'latitude': float_column(df, 'LAT'),
+            'region': text_column(df, 'Region'),
+            'program': text_column(df, 'Program'),
+            'address': text_column(df, 'Address', max_length=None),
+            'phone': text_column(df, 'Phone'),
+            'website': text_column(df, 'Website'),
+            'description': text_column(df, 'Description', max_length=None),
+            'taking_new_referrals': text_column(df, 'Taking New Referrals'),
+            'population': text_column(df, 'Population', max_length=None),
+            'services': text_column(df, 'Services', max_length=None),
+            'language': text_column(df, 'Language'),
+            'fid': text_column(df, 'FID'),
+        })
+
+        # Rows without coordinates can't be placed on the map or searched by distance
+        valid = services['longitude'].notna() & services['latitude'].notna()
+        if not valid.all():
+            print(f"  ⚠ Skipping {(~valid).sum()} rows without coordinates")
+
+        # Text used for the embedding
+        embedding_text = joined_text(df[valid], ['Program', 'Description', 'Services', 'Population'])
+
+        loader = BulkLoader(session, HealthService.__table__, HEALTH_SERVICES_FILE, key='fid', chunk_size=chunk_size)
+        loader.load(
+            services[valid],
+            embedding_text=embedding_text,
+            point_columns=('longitude', 'latitude'),
+            fresh=fresh,
+            dry_run=dry_run
+        )
+        if dry_run:
+            return
+
+        if _is_postgres(session):
+            # Create spatial index
+            print("  Creating spatial index...")
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_health_services_location
+                ON health_services USING GIST (location);
+            """))
+            session.commit()
+
+            # Create vector index for hybrid search
+            print("  Creating HNSW embedding index...")
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_health_services_embedding
+                ON health_services USING hnsw (embedding vector_cosine_ops);
+            """))
+            session.commit()
 
         count = session.query(HealthService).count()
         print(f"✓ Successfully imported {count} health services")
@@ -102,121 +114,141 @@ def import_health_services(session):
         traceback.print_exc()
 
 
-def import_transit_stops(session):
+def import_transit_stops(session, fresh=False, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
     """Import Public Transit Stops data"""
     print("\n" + "="*60)
     print("Importing Transit Stops...")
     print("="*60)
 
     try:
-        # Decode URL-encoded filename
-        filename = urllib.parse.unquote('datasets/Public_Transit_Stops%2C_San_Diego_County.csv')
-        df = pd.read_csv(filename, encoding='utf-8-sig')
-
+        df = read_dataset_csv(TRANSIT_STOPS_FILE)
         print(f"Found {len(df)} transit stop records")
 
-        # Clean column names
-        df.columns = df.columns.str.strip().str.replace('\ufeff', '')
-
-        for idx, row in df.iterrows():
-            try:
-                stop = TransitStop(
-                    objectid=int(row['OBJECTID']) if pd.notna(row.get('OBJECTID')) else None,
-                    stop_uid=str(row.get('stop_UID', ''))[:255] if pd.notna(row.get('stop_UID')) else None,
-                    stop_agency=str(row.get('stop_agency', ''))[:255] if pd.notna(row.get('stop_agency')) else None,
-                    stop_id=str(row.get('stop_id', ''))[:255] if pd.notna(row.get('stop_id')) else None,
-                    stop_name=str(row.get('stop_name', ''))[:255] if pd.notna(row.get('stop_name')) else None,
-                    stop_lat=float(row['stop_lat']),
-                    stop_lon=float(row['stop_lon']),
-                    stop_code=str(row.get('stop_code', ''))[:255] if pd.notna(row.get('stop_code')) else None,
-                    location_type=str(row.get('location_type', ''))[:255] if pd.notna(row.get('location_type')) else None,
-                    parent_station=str(row.get('parent_station', ''))[:255] if pd.notna(row.get('parent_station')) else None,
-                    wheelchair_boarding=str(row.get('wheelchair_boarding', ''))[:255] if pd.notna(row.get('wheelchair_boarding')) else None,
-                    intersection_code=str(row.get('intersection_code', ''))[:255] if pd.notna(row.get('intersection_code')) else None,
-                    stop_place=str(row.get('stop_place', ''))[:255] if pd.notna(row.get('stop_place')) else None
-                )
-
-                session.add(stop)
-
-                if (idx + 1) % 500 == 0:
-                    print(f"  Processing {idx + 1}/{len(df)}...")
-                    session.commit()
-
-            except Exception as e:
-                print(f"  ⚠ Error processing row {idx}: {str(e)}")
-                continue
+        stops = pd.DataFrame({
+            'objectid': int_column(df, 'OBJECTID'),
+            'stop_uid': text_column(df, 'stop_UID'),
+            'stop_agency': text_column(df, 'stop_agency'),
+            'stop_id': text_column(df, 'stop_id'),
+            'stop_name': text_column(df, 'stop_name'),
+            'stop_lat': float_column(df, 'stop_lat'),
+            'stop_lon': float_column(df, 'stop_lon'),
+            'stop_code': text_column(df, 'stop_code'),
+            'location_type': text_column(df, 'location_type'),
+            'parent_station': text_column(df, 'parent_station'),
+            'wheelchair_boarding': text_column(df, 'wheelchair_boarding'),
+            'intersection_code': text_column(df, 'intersection_code'),
+            'stop_place': text_column(df, 'stop_place'),
+        })
+
+        valid = stops['stop_lat'].notna() & stops['stop_lon'].notna()
+        if not valid.all():
+            print(f"  ⚠ Skipping {(~valid).sum()} rows without coordinates")
+
+        loader = BulkLoader(session, TransitStop.__table__, TRANSIT_STOPS_FILE, key='objectid', chunk_size=chunk_size)
+        loader.load(stops[valid], point_columns=('stop_lon', 'stop_lat'), fresh=fresh, dry_run=dry_run)
+        if dry_run:
+            return
+
+        if _is_postgres(session):
+            # Create spatial index
+            print("  Creating spatial index...")
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_transit_stops_location
+                ON transit_stops USING GIST (location);
+            """))
+            # Geography index so ST_DWithin(location::geography, ...) can use an index
+            session.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_transit_stops_location_geog
+                ON transit_stops USING GIST ((location::geography));
+            """))
+            session.commit()
 
-        session.commit()
+        count = session.query(TransitStop).count()
+        print(f"✓ Successfully imported {count} transit stops")
 
-        # Update PostGIS location column
-        print("  Updating PostGIS location geometries...")
-        session.execute(text("""
-            UPDATE transit_stops
-            SET location = ST_SetSRID(ST_MakePoint(stop_lon, stop_lat), 4326)
-            WHERE location IS NULL;
-        """))
-        session.commit()
+    except Exception as e:
+        print(f"✗ Error importing transit stops: {str(e)}")
+        session.rollback()
+        import traceback
+        traceback.print_exc()
+
+
+def refresh_nearby_transit(session):
+    """Precompute the nearest transit stops for every health service"""
+    print("\n" + "="*60)
+    print("Refreshing Health Service Nearby Transit...")
+    print("="*60)
+
+    if not _is_postgres(session):
+        print("  Skipped: requires PostgreSQL with PostGIS")
+        return
 
-        # Create spatial index
-        print("  Creating spatial index...")
-        session.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_transit_stops_location
-            ON transit_stops USING GIST (location);
-        """))
+    try:
+        points = """(
+            SELECT id AS point_id, location::geography AS geog
+            FROM health_services
+            WHERE location IS NOT NULL
+        )"""
+
+        session.execute(text("DELETE FROM health_service_nearby_transit"))
+        session.execute(
+            text(f"""
+                INSERT INTO health_service_nearby_transit
+                    (health_service_id, transit_stop_id, stop_rank, distance_km)
+                SELECT point_id, id, stop_rank, distance_km
+                FROM ({NEARBY_TRANSIT_LATERAL_SQL.format(points=points)}) AS nearest
+            """),
+            {
+                "max_distance_meters": PRECOMPUTED_TRANSIT_RADIUS_KM * 1000,
+                "limit": PRECOMPUTED_TRANSIT_LIMIT
+            }
+        )
         session.commit()
 
-        count = session.query(TransitStop).count()
-        print(f"✓ Successfully imported {count} transit stops")
+        count = session.query(HealthServiceNearbyTransit).count()
+        print(f"✓ Stored {count} service-to-stop links "
+              f"(up to {PRECOMPUTED_TRANSIT_LIMIT} stops within {PRECOMPUTED_TRANSIT_RADIUS_KM} km)")
 
     except Exception as e:
-        print(f"✗ Error importing transit stops: {str(e)}")
+        print(f"✗ Error refreshing nearby transit: {str(e)}")
         session.rollback()
         import traceback
         traceback.print_exc()
 
 
-def import_transit_routes(session):
+def import_transit_routes(session, fresh=False, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
     """Import Public Transit Routes data"""
     print("\n" + "="*60)
     print("Importing Transit Routes...")
     print("="*60)
 
     try:
-        filename = urllib.parse.unquote('datasets/Public_Transit_Routes%2C_San_Diego_County.csv')
-        df = pd.read_csv(filename, encoding='utf-8-sig')
-
+        df = read_dataset_csv(TRANSIT_ROUTES_FILE)
         print(f"Found {len(df)} transit route records")
 
-        df.columns = df.columns.str.strip().str.replace('\ufeff', '')
-
-        for idx, row in df.iterrows():
-            try:
-                route = TransitRoute(
-                    objectid=int(row['objectid']) if pd.notna(row.get('objectid')) else None,
-                    shape_id=str(row.get('shape_id', ''))[:255] if pd.notna(row.get('shape_id')) else None,
-                    route_id=str(row.get('route_id', ''))[:255] if pd.notna(row.get('route_id')) else None,
-                    route_short_name=str(row.get('route_short_name', ''))[:255] if pd.notna(row.get('route_short_name')) else None,
-                    route_long_name=str(row.get('route_long_name', ''))[:255] if pd.notna(row.get('route_long_name')) else None,
-                    route_type=str(row.get('route_type', ''))[:255] if pd.notna(row.get('route_type')) else None,
-                    agency_id=str(row.get('agency_id', ''))[:255] if pd.notna(row.get('agency_id')) else None,
-                    route_desc=str(row.get('route_desc', '')) if pd.notna(row.get('route_desc')) else None,
-                    route_url=str(row.get('route_url', ''))[:255] if pd.notna(row.get('route_url')) else None,
-                    route_color=str(row.get('route_color', ''))[:255] if pd.notna(row.get('route_color')) else None,
-                    route_text_color=str(row.get('route_text_color', ''))[:255] if pd.notna(row.get('route_text_color')) else None,
-                    route_type_text=str(row.get('route_type_text', ''))[:255] if pd.notna(row.get('route_type_text')) else None,
-                    routeshapename=str(row.get('routeshapename', ''))[:255] if pd.notna(row.get('routeshapename')) else None,
-                    route_color_rgb=str(row.get('route_color_rgb', ''))[:255] if pd.notna(row.get('route_color_rgb')) else None,
-                    route_text_color_rgb=str(row.get('route_text_color_rgb', ''))[:255] if pd.notna(row.get('route_text_color_rgb')) else None,
-                    shape_length=float(row['shape_Length']) if pd.notna(row.get('shape_Length')) else None
-                )
-
-                session.add(route)
-
-            except Exception as e:
-                print(f"  ⚠ Error processing row {idx}: {str(e)}")
-                continue
-
-        session.commit()
+        routes = pd.DataFrame({
+            'objectid': int_column(df, 'objectid'),
+            'shape_id': text_column(df, 'shape_id'),
+            'route_id': text_column(df, 'route_id'),
+            'route_short_name': text_column(df, 'route_short_name'),
+            'route_long_name': text_column(df, 'route_long_name'),
+            'route_type': text_column(df, 'route_type'),
+            'agency_id': text_column(df, 'agency_id'),
+            'route_desc': text_column(df, 'route_desc', max_length=None),
+            'route_url': text_column(df, 'route_url'),
+            'route_color': text_column(df, 'route_color'),
+            'route_text_color': text_column(df, 'route_text_color'),
+            'route_type_text': text_column(df, 'route_type_text'),
+            'routeshapename': text_column(df, 'routeshapename'),
+            'route_color_rgb': text_column(df, 'route_color_rgb'),
+            'route_text_color_rgb': text_column(df, 'route_text_color_rgb'),
+            'shape_length': float_column(df, 'shape_Length'),
+        })
+
+        loader = BulkLoader(session, TransitRoute.__table__, TRANSIT_ROUTES_FILE, key='objectid', chunk_size=chunk_size)
+        loader.load(routes, fresh=fresh, dry_run=dry_run)
+        if dry_run:
+            return
 
         count = session.query(TransitRoute).count()
         print(f"✓ Successfully imported {count} transit routes")
@@ -228,10 +260,62 @@ def import_transit_routes(session):
         traceback.print_exc()
 
 
-def main():
+def import_housing_elements(session, fresh=False, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Import Housing Elements (land parcel) data"""
+    print("\n" + "="*60)
+    print("Importing Housing Elements...")
+    print("="*60)
+
+    try:
+        df = read_dataset_csv(HOUSING_ELEMENTS_FILE)
+        print(f"Found {len(df)} housing element records")
+
+        housing = pd.DataFrame({
+            'objectid': int_column(df, 'OBJECTID'),
+            'jurisdiction': text_column(df, 'Jurisdiction'),
+            'apn': text_column(df, 'APN'),
+            'vacancy': text_column(df, 'Vacancy'),
+            'units': int_column(df, 'Units'),
+            'zoning': text_column(df, 'Zoning'),
+            'zoning_simplified': text_column(df, 'ZoningSimplified'),
+            'min_density': float_column(df, 'Min_Density'),
+            'max_density': float_column(df, 'Max_Density'),
+            'links': text_column(df, 'Links'),
+            'shape_area': float_column(df, 'Shape__Area'),
+            'shape_length': float_column(df, 'Shape__Length'),
+        })
+
+        loader = BulkLoader(session, HousingElement.__table__, HOUSING_ELEMENTS_FILE, key='objectid', chunk_size=chunk_size)
+        loader.load(housing, fresh=fresh, dry_run=dry_run)
+        if dry_run:
+            return
+
+        count = session.query(HousingElement).count()
+        print(f"✓ Successfully imported {count} housing elements")
+
+    except Exception as e:
+        print(f"✗ Error importing housing elements: {str(e)}")
+        session.rollback()
+        import traceback
+        traceback.print_exc()
+
+
+def dry_run_report(session):
+    """Report what an import would change (rows to add, remove and re-embed) without writing"""
+    import_health_services(session, dry_run=True)
+    import_transit_stops(session, dry_run=True)
+    import_transit_routes(session, dry_run=True)
+    import_housing_elements(session, dry_run=True)
+
+    print("\n" + "="*60)
+    print("Dry run complete; nothing was written")
+    print("="*60)
+
+
+def main(fresh=False, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
     """Main import function"""
     print("="*60)
-    print("San Diego County Dataset Import")
+    print("San Diego County Dataset Import" + (" (dry run)" if dry_run else ""))
     print("="*60)
 
     # Create engine and session
@@ -240,15 +324,26 @@ def main():
     session = Session()
 
     try:
+        if dry_run:
+            dry_run_report(session)
+            return
+
         # Create all tables
         print("\nCreating database tables...")
         Base.metadata.create_all(engine)
         print("✓ Tables created")
 
         # Import datasets
-        import_health_services(session)
-        import_transit_stops(session)
-        import_transit_routes(session)
+        import_health_services(session, fresh, chunk_size)
+        import_transit_stops(session, fresh, chunk_size)
+        refresh_nearby_transit(session)
+        import_transit_routes(session, fresh, chunk_size)
+        import_housing_elements(session, fresh, chunk_size)
+
+        # Cached chatbot answers may cite the old data
+        cleared = session.execute(delete(ResponseCacheEntry)).rowcount
+        session.commit()
+        print(f"\n✓ Cleared {cleared} cached chatbot responses")
 
         print("\n" + "="*60)
         print("✅ Dataset import completed successfully!")
@@ -259,6 +354,7 @@ def main():
         print(f"  Health Services: {session.query(HealthService).count()}")
         print(f"  Transit Stops:   {session.query(TransitStop).count()}")
         print(f"  Transit Routes:  {session.query(TransitRoute).count()}")
+        print(f"  Housing:         {session.query(HousingElement).count()}")
 
     except Exception as e:
         print(f"\n✗ Import failed: {str(e)}")
@@ -270,4 +366,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Import San Diego County datasets")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints and process every row again")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report how many rows would be added, removed and re-embedded without writing")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help=f"Rows written and embedded per transaction (default: {IMPORT_CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    main(fresh=args.fresh, chunk_size=args.chunk_size, dry_run=args.dry_run)
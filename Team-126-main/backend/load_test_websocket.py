@@ -0,0 +1,122 @@
+"""
+Load test for concurrent chat turns over the websocket endpoint
+
+Creates guest users and conversations, then sends chat turns first one
+client at a time and then from all clients at once. If request handlers
+block the event loop, concurrent turns serialize and the concurrent wall
+time approaches the sequential one; with non-blocking handlers the
+concurrency factor (sum of turn latencies / wall time) approaches the
+number of clients.
+
+Every turn is a real model call: the default mode waits for the single
+reply frame, --stream waits for the {"type": "final"} frame after the
+chunks. Keep RESPONSE_CACHE_ENABLED off on the server, since repeated
+messages would otherwise be answered from the cache.
+
+Usage (server must be running):
+    python load_test_websocket.py [--url http://localhost:8000] [--clients 20] [--turns 3] [--stream]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List, Tuple
+
+import httpx
+import websockets
+
+
+async def create_conversation(http: httpx.AsyncClient) -> int:
+    """Register a guest user and start a conversation"""
+    response = await http.post("/register", json={"is_guest": True})
+    response.raise_for_status()
+    user_id = response.json()["user"]["id"]
+
+    response = await http.post("/conversation/start", json={"user_id": user_id})
+    response.raise_for_status()
+    return response.json()["conversation_id"]
+
+
+async def run_turns(ws_url: str, conversation_id: int, turns: int, message: str, stream: bool) -> List[float]:
+    """Send chat turns on one websocket and return per-turn latencies"""
+    latencies = []
+    async with websockets.connect(f"{ws_url}/ws/{conversation_id}") as ws:
+        for _ in range(turns):
+            start = time.perf_counter()
+            await ws.send(json.dumps({"content": message, "stream": stream}))
+            while True:
+                reply = json.loads(await ws.recv())
+                if "error" in reply:
+                    raise RuntimeError(reply["error"])
+                if reply.get("type") != "chunk":
+                    break
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_pass(
+    ws_url: str,
+    conversation_ids: List[int],
+    turns: int,
+    message: str,
+    stream: bool,
+    concurrent: bool
+) -> Tuple[float, List[float]]:
+    """Run every client's turns sequentially or concurrently"""
+    start = time.perf_counter()
+    if concurrent:
+        results = await asyncio.gather(*(
+            run_turns(ws_url, conversation_id, turns, message, stream) for conversation_id in conversation_ids
+        ))
+    else:
+        results = [
+            await run_turns(ws_url, conversation_id, turns, message, stream) for conversation_id in conversation_ids
+        ]
+    wall = time.perf_counter() - start
+    return wall, [latency for latencies in results for latency in latencies]
+
+
+def report(label: str, wall: float, latencies: List[float]):
+    """Print latency percentiles and the concurrency factor"""
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"\n{label}")
+    print(f"  Turns:              {len(latencies)}")
+    print(f"  Wall time:          {wall:.2f} s")
+    print(f"  Turn latency p50:   {statistics.median(ordered) * 1000:.0f} ms")
+    print(f"  Turn latency p95:   {p95 * 1000:.0f} ms")
+    print(f"  Concurrency factor: {sum(latencies) / wall:.1f}x")
+
+
+async def main(url: str, clients: int, turns: int, message: str, stream: bool):
+    ws_url = url.replace("http://", "ws://").replace("https://", "wss://")
+
+    async with httpx.AsyncClient(base_url=url, timeout=30) as http:
+        conversation_ids = await asyncio.gather(*(create_conversation(http) for _ in range(clients)))
+
+    print("=" * 60)
+    print(f"Websocket load test: {clients} clients x {turns} turns ({'streaming' if stream else 'single reply'})")
+    print("=" * 60)
+
+    sequential_wall, sequential = await run_pass(ws_url, conversation_ids, turns, message, stream, concurrent=False)
+    report("Sequential (one client at a time)", sequential_wall, sequential)
+
+    concurrent_wall, concurrent = await run_pass(ws_url, conversation_ids, turns, message, stream, concurrent=True)
+    report("Concurrent (all clients at once)", concurrent_wall, concurrent)
+
+    print(f"\nSpeedup: {sequential_wall / concurrent_wall:.1f}x (ideal: {clients}x; ~1x means turns serialize)")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent websocket chat load test")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--clients", type=int, default=20, help="Number of concurrent conversations")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per conversation")
+    parser.add_argument("--message", default="Where can I find a free clinic?", help="Message to send each turn")
+    parser.add_argument("--stream", action="store_true", help="Request streamed replies")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.url, args.clients, args.turns, args.message, args.stream))
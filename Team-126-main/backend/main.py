@@ -1,6 +1,9 @@
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta, datetime, timezone
 from typing import Optional, List
@@ -10,7 +13,7 @@ import re
 import numpy as np
 from pydantic import BaseModel
 
-from database import engine, get_db, Base
+from database import engine, get_db, get_async_db, Base
 from models import User, Conversation, Message
 from auth import (
     authenticate_user,
@@ -20,9 +23,18 @@ from auth import (
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from chatbot import get_chatbot_response, generate_conversation_report
-from embeddings import generate_embedding, get_similar_messages
-from hybrid_search import search_health_services_hybrid, find_nearest_transit_stops
+from chatbot import get_chatbot_response, stream_chatbot_response
+from chat_context import ConversationContext
+from response_cache import response_cache, is_context_free, is_first_question
+from embeddings import generate_embedding_async, embedding_service
+from embedding_writer import embedding_writer
+from dose_scheduler import dose_scheduler
+from report_jobs import report_jobs
+from tools.result_encoding import tool_token_stats
+from message_resources import resource_rows, load_conversation_resources
+from message_search import search_conversation_messages
+from hybrid_search import search_health_services_hybrid, attach_nearby_transit
+from tools.transit_index import get_transit_index
 from health_api import router as health_router
 import health_models  # Import health models to ensure they're created
 
@@ -34,6 +46,43 @@ app = FastAPI(title="Homeless Assistant API")
 # Include health management routes
 app.include_router(health_router)
 
+
+@app.on_event("startup")
+def build_transit_index():
+    """Build the in-process transit stop index before the first request"""
+    get_transit_index()
+
+
+@app.on_event("startup")
+async def start_embedding_writer():
+    """Start the background worker that fills message embeddings"""
+    embedding_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_embedding_writer():
+    """Write queued message embeddings before exiting"""
+    await embedding_writer.stop()
+
+
+@app.on_event("startup")
+async def start_dose_scheduler():
+    """Start the background task that keeps medication doses scheduled ahead"""
+    dose_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_dose_scheduler():
+    """Stop the dose scheduler"""
+    await dose_scheduler.stop()
+
+
+@app.on_event("shutdown")
+async def stop_report_jobs():
+    """Cancel report jobs still running"""
+    await report_jobs.stop()
+
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Pydantic models
@@ -271,15 +321,15 @@ async def login(
 @app.post("/character/select")
 async def select_character(
     character: CharacterSelect,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Select a 3D character for the user - TEMPORARY NO AUTH"""
-    user = db.query(User).filter(User.id == character.user_id).first()
+    user = await db.get(User, character.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     user.character_id = character.character_id
-    db.commit()
+    await db.commit()
     return {"message": "Character selected successfully", "character_id": character.character_id}
 
 
@@ -295,17 +345,16 @@ class ConversationStart(BaseModel):
 @app.post("/conversation/start")
 async def start_conversation(
     data: ConversationStart,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Start a new conversation - TEMPORARY NO AUTH"""
-    user = db.query(User).filter(User.id == data.user_id).first()
+    user = await db.get(User, data.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     conversation = Conversation(user_id=user.id)
     db.add(conversation)
-    db.commit()
-    db.refresh(conversation)
+    await db.commit()
     return {"conversation_id": conversation.id}
 
 
@@ -314,7 +363,14 @@ async def end_conversation(
     conversation_id: int,
     db: Session = Depends(get_db)
 ):
-    """End conversation and generate report - TEMPORARY NO AUTH"""
+    """
+    End conversation and generate report - TEMPORARY NO AUTH
+
+    If the stored report already covers the latest message it is returned
+    directly (status "done", cached true). Otherwise a background report
+    job is started and its status returned; poll /reports/{job_id} or wait
+    on /ws/reports/{job_id} for the report.
+    """
     conversation = db.query(Conversation).filter(
         Conversation.id == conversation_id
     ).first()
@@ -322,31 +378,68 @@ async def end_conversation(
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Get all messages
-    messages = db.query(Message).filter(Message.conversation_id == conversation_id).all()
-    message_list = [{"role": msg.role, "content": msg.content} for msg in messages]
-
-    # Generate report with health data (for guest mode, use conversation_id as user_id)
-    report = await generate_conversation_report(message_list, conversation_id=conversation_id, db=db)
+    last_message_id = db.query(func.max(Message.id)).filter(
+        Message.conversation_id == conversation_id
+    ).scalar()
 
     conversation.ended_at = datetime.utcnow()
-    conversation.report = report
     db.commit()
 
-    return {"report": report}
+    if conversation.report and conversation.report_message_id == last_message_id:
+        return {
+            "job_id": None,
+            "conversation_id": conversation_id,
+            "status": "done",
+            "report": conversation.report,
+            "resources": load_conversation_resources(db, conversation_id, last_message_id),
+            "error": None,
+            "cached": True
+        }
+
+    # Health data is included in the report (for guest mode, conversation_id is the user_id)
+    return await report_jobs.submit(conversation_id, last_message_id)
+
+
+@app.get("/reports/{job_id}")
+async def get_report_job(job_id: str):
+    """Get the status of a report job (with the report once done)"""
+    job = await report_jobs.status(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+
+@app.websocket("/ws/reports/{job_id}")
+async def report_job_websocket(websocket: WebSocket, job_id: str):
+    """Send the report job status once it finishes, then close"""
+    await websocket.accept()
+
+    try:
+        job = await report_jobs.wait(job_id)
+        if not job:
+            await websocket.send_json({"error": "Report job not found"})
+            await websocket.close()
+            return
+
+        await websocket.send_json(jsonable_encoder(job))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
 
 
 @app.get("/conversation/{conversation_id}/report")
 async def get_report(
     conversation_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get report for a conversation"""
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == user.id
-    ).first()
+    conversation = (await db.execute(
+        select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user.id
+        )
+    )).scalar_one_or_none()
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -354,7 +447,10 @@ async def get_report(
     if not conversation.report:
         raise HTTPException(status_code=404, detail="Report not generated yet")
 
-    return {"report": conversation.report}
+    resources = await db.run_sync(
+        load_conversation_resources, conversation_id, conversation.report_message_id
+    )
+    return {"report": conversation.report, "resources": resources}
 
 
 class SimilaritySearchRequest(BaseModel):
@@ -367,62 +463,72 @@ class SimilaritySearchRequest(BaseModel):
 async def search_similar_messages(
     conversation_id: int,
     request: SimilaritySearchRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Search for similar messages in a conversation using semantic similarity
+    Search messages in a conversation by full-text match and semantic similarity
+
+    Lexical and vector rankings are fused with reciprocal-rank fusion. If the
+    query embedding cannot be generated, the search is lexical only.
 
     Args:
         conversation_id: ID of the conversation to search
         query: Search query text
         limit: Maximum number of results (default: 5)
-        threshold: Minimum similarity score 0-1 (default: 0.7)
+        threshold: Minimum similarity score 0-1 for semantic matches (default: 0.7)
 
     Returns:
-        List of similar messages with their similarity scores
+        List of matching messages with lexical, similarity and fused scores
     """
     # Verify conversation exists
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id
-    ).first()
+    conversation = await db.get(Conversation, conversation_id)
 
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Generate embedding for search query
-    query_embedding = generate_embedding(request.query)
-
+    # Generate embedding for search query (lexical-only search if unavailable)
+    query_embedding = await generate_embedding_async(request.query)
     if not query_embedding:
-        raise HTTPException(status_code=500, detail="Failed to generate query embedding")
+        print("[Search] Query embedding unavailable, using lexical search only")
 
-    # Search for similar messages
-    similar_messages = get_similar_messages(
+    results = await db.run_sync(lambda session: search_conversation_messages(
+        session,
+        conversation_id,
+        query_text=request.query,
         query_embedding=query_embedding,
-        conversation_id=conversation_id,
-        db=db,
         limit=request.limit,
         similarity_threshold=request.threshold
-    )
-
-    # Format results
-    results = [
-        {
-            "id": msg.id,
-            "role": msg.role,
-            "content": msg.content,
-            "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
-        }
-        for msg in similar_messages
-    ]
+    ))
 
     return {
         "query": request.query,
         "conversation_id": conversation_id,
+        "mode": "hybrid" if query_embedding else "lexical",
         "results": results,
         "count": len(results)
     }
 
 
+@app.get("/embeddings/stats")
+async def get_embedding_stats():
+    """Embedding service metrics: queue depth, in-flight texts, batch-size histogram and message writer counters"""
+    stats = embedding_service.stats()
+    stats["writer"] = embedding_writer.stats()
+    return stats
+
+
+@app.get("/response-cache/stats")
+async def get_response_cache_stats():
+    """Response cache counters: hits, misses, hit rate, stores and failures"""
+    return response_cache.stats()
+
+
+@app.get("/tools/stats")
+async def get_tool_stats():
+    """Tool response size per tool: calls, estimated tokens sent and tokens the verbose format would have sent"""
+    return tool_token_stats.stats()
+
+
 class HealthServiceSearchRequest(BaseModel):
     latitude: float
     longitude: float
@@ -435,7 +541,7 @@ class HealthServiceSearchRequest(BaseModel):
 @app.post("/search/health-services")
 async def search_health_services(
     request: HealthServiceSearchRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Hybrid search for health services combining geospatial distance and semantic similarity
@@ -452,27 +558,32 @@ async def search_health_services(
         List of health services with distances, transit stops, and map data
     """
 
-    # Perform hybrid search
-    results = search_health_services_hybrid(
-        db=db,
-        user_lat=request.latitude,
-        user_lon=request.longitude,
-        query=request.query,
-        max_distance_km=request.max_distance_km,
-        limit=request.limit,
-        semantic_weight=request.semantic_weight
-    )
+    query_embedding = None
+    if request.query:
+        query_embedding = await generate_embedding_async(request.query)
+
+    def search(session: Session) -> List[dict]:
+        # Perform hybrid search
+        results = search_health_services_hybrid(
+            db=session,
+            user_lat=request.latitude,
+            user_lon=request.longitude,
+            query=request.query,
+            max_distance_km=request.max_distance_km,
+            limit=request.limit,
+            semantic_weight=request.semantic_weight,
+            query_embedding=query_embedding
+        )
 
-    # For each result, find nearest transit stops
-    for service in results:
-        transit_stops = find_nearest_transit_stops(
-            db=db,
-            latitude=service['latitude'],
-            longitude=service['longitude'],
+        # Find nearest transit stops for all results in one query
+        return attach_nearby_transit(
+            db=session,
+            services=results,
             limit=3,
             max_distance_km=1.0  # Within 1km of the service
         )
-        service['nearby_transit'] = transit_stops
+
+    results = await db.run_sync(search)
 
     return {
         "user_location": {
@@ -513,28 +624,37 @@ def parse_location_from_message(message: str) -> Optional[dict]:
 async def websocket_endpoint(
     websocket: WebSocket,
     conversation_id: int,
-    db: Session = Depends(get_db)
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """WebSocket endpoint for real-time chat"""
+    """
+    WebSocket endpoint for real-time chat
+
+    Streaming mode is enabled with ?stream=true or per message with
+    {"stream": true}. The reply is then sent as {"type": "chunk"} frames
+    while the model generates it, followed by a {"type": "final"} frame
+    with the complete text and resource list.
+    """
     await websocket.accept()
+    context = None
 
     try:
         # Get conversation
-        conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+        conversation = await db.get(Conversation, conversation_id)
         if not conversation:
             await websocket.send_json({"error": "Conversation not found"})
             await websocket.close()
             return
 
-        # Get conversation history
-        messages = db.query(Message).filter(Message.conversation_id == conversation_id).all()
-        message_history = [{"role": msg.role, "content": msg.content} for msg in messages]
+        # Running summary plus the recent messages it doesn't cover yet
+        context = await ConversationContext.load(db, conversation)
 
         while True:
             # Receive message from client
             data = await websocket.receive_json()
             user_message = data.get("content")
             is_voice = data.get("is_voice", False)
+            stream_reply = data.get("stream", stream)
 
             # Check if message contains location data
             location_data = parse_location_from_message(user_message)
@@ -549,65 +669,113 @@ async def websocket_endpoint(
                 # Update conversation with location
                 conversation.latitude = latitude
                 conversation.longitude = longitude
-                db.commit()
-
-            # Generate embedding for user message
-            user_embedding = generate_embedding(user_message)
+                await db.commit()
 
-            # Save user message
+            # Save user message (embedding is filled in by the background writer)
             db_message = Message(
                 conversation_id=conversation_id,
                 role="user",
                 content=user_message,
                 is_voice=is_voice,
                 latitude=latitude,
-                longitude=longitude,
-                embedding=user_embedding
+                longitude=longitude
             )
             db.add(db_message)
-            db.commit()
-            print(f"[Embedding] Generated embedding for user message (dim: {len(user_embedding) if user_embedding else 0})")
+            await db.commit()
+            embedding_writer.enqueue(db_message.id, user_message)
 
-            # Add to history (include location if available)
-            message_dict = {"role": "user", "content": user_message}
-            if latitude is not None and longitude is not None:
-                message_dict["latitude"] = latitude
-                message_dict["longitude"] = longitude
-            message_history.append(message_dict)
+            context.append({"id": db_message.id, "role": "user", "content": user_message})
 
-            # Get AI response (pass conversation object which now has location)
-            assistant_response = await get_chatbot_response(message_history, conversation)
+            # Questions that don't depend on earlier turns may be answered
+            # from the response cache; only first questions are stored, since
+            # later answers are generated with this conversation in the prompt
+            prior_messages = context.window()[:-1]
+            cacheable = response_cache.enabled and is_context_free(user_message, prior_messages)
+            storable = cacheable and is_first_question(prior_messages) and not context.has_older_messages()
+            cached = None
+            if cacheable:
+                cached = await response_cache.lookup(user_message, conversation.latitude, conversation.longitude)
 
-            # Generate embedding for assistant response
-            assistant_embedding = generate_embedding(assistant_response)
+            if cached is None:
+                # Bounded prompt: recent turns, summary, older messages matching this one
+                message_history = context.prompt_messages(await context.recall(user_message))
 
-            # Save assistant message
+            # Get AI response (pass conversation object which now has location)
+            if cached is not None:
+                assistant_response, resources = cached
+                if stream_reply:
+                    await websocket.send_json({
+                        "type": "final",
+                        "role": "assistant",
+                        "content": assistant_response,
+                        "resources": resources,
+                        "timestamp": datetime.now(timezone.utc).isoformat()
+                    })
+            elif stream_reply:
+                assistant_response = ""
+                resources = []
+                async for event in stream_chatbot_response(message_history, conversation):
+                    if event["type"] == "chunk":
+                        await websocket.send_json({
+                            "type": "chunk",
+                            "role": "assistant",
+                            "content": event["text"]
+                        })
+                    else:
+                        assistant_response = event["content"]
+                        resources = event["resources"]
+
+                await websocket.send_json({
+                    "type": "final",
+                    "role": "assistant",
+                    "content": assistant_response,
+                    "resources": resources,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                })
+            else:
+                assistant_response, resources = await get_chatbot_response(message_history, conversation)
+
+            # Save assistant message with its resources (embedding is filled
+            # in by the background writer)
             db_message = Message(
                 conversation_id=conversation_id,
                 role="assistant",
                 content=assistant_response,
-                is_voice=False,
-                embedding=assistant_embedding
+                is_voice=False
             )
             db.add(db_message)
-            db.commit()
-            print(f"[Embedding] Generated embedding for assistant message (dim: {len(assistant_embedding) if assistant_embedding else 0})")
-
-            # Add to history
-            message_history.append({"role": "assistant", "content": assistant_response})
-
-            # Send response to client
-            await websocket.send_json({
-                "role": "assistant",
-                "content": assistant_response,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
+            if resources:
+                await db.flush()
+                db.add_all(resource_rows(db_message.id, conversation_id, resources))
+            await db.commit()
+            embedding_writer.enqueue(db_message.id, assistant_response)
+
+            # Add to history; fold old turns into the summary in the background
+            context.append({"id": db_message.id, "role": "assistant", "content": assistant_response})
+            context.maybe_summarize()
+
+            # Send response to client (streamed replies were already delivered)
+            if not stream_reply:
+                await websocket.send_json({
+                    "role": "assistant",
+                    "content": assistant_response,
+                    "resources": resources,
+                    "timestamp": datetime.now(timezone.utc).isoformat()
+                })
+
+            if storable and cached is None:
+                await response_cache.store(
+                    user_message, conversation.latitude, conversation.longitude, assistant_response, resources
+                )
 
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for conversation {conversation_id}")
     except Exception as e:
         print(f"WebSocket error: {str(e)}")
         await websocket.send_json({"error": str(e)})
+    finally:
+        if context is not None:
+            await context.close()
 
 
 if __name__ == "__main__":
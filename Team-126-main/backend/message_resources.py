@@ -0,0 +1,74 @@
+"""
+Resources attached to assistant messages
+
+Search tools return structured resources next to the text they give the
+model. The chat handler stores them in message_resources with the reply
+(written once), and the frontend and reports read them from there instead
+of parsing markers out of message text.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import MessageResource
+
+
+def resource_rows(message_id: int, conversation_id: int, resources: Iterable[Dict]) -> List[MessageResource]:
+    """
+    Rows attaching resources to a stored message
+
+    Args:
+        message_id: ID of the assistant message
+        conversation_id: Conversation the message belongs to
+        resources: Resources in the order they were shown
+
+    Returns:
+        MessageResource objects to add to the session
+    """
+    return [
+        MessageResource(
+            message_id=message_id,
+            conversation_id=conversation_id,
+            position=position,
+            resource_id=str(resource['id']) if resource.get('id') is not None else None,
+            resource_type=resource.get('type'),
+            data=resource
+        )
+        for position, resource in enumerate(resources)
+    ]
+
+
+def unique_resources(resources: Iterable[Dict]) -> List[Dict]:
+    """Resources deduplicated by (type, id), keeping first position and latest snapshot"""
+    unique: Dict = {}
+    for resource in resources:
+        key = (resource.get('type'), resource.get('id'))
+        if key == (None, None):
+            key = id(resource)
+        unique[key] = resource
+    return list(unique.values())
+
+
+def load_conversation_resources(
+    db: Session,
+    conversation_id: int,
+    last_message_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Unique resources shared in a conversation, in the order they were shown
+
+    Args:
+        db: Database session (sync; use AsyncSession.run_sync from async code)
+        conversation_id: Conversation ID
+        last_message_id: Only resources of messages up to this id
+
+    Returns:
+        Resource snapshots
+    """
+    query = select(MessageResource.data).where(MessageResource.conversation_id == conversation_id)
+    if last_message_id is not None:
+        query = query.where(MessageResource.message_id <= last_message_id)
+    query = query.order_by(MessageResource.message_id, MessageResource.position)
+    return unique_resources(db.execute(query).scalars())
@@ -0,0 +1,251 @@
+"""
+Hybrid lexical + semantic search over a conversation's messages
+"""
+
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from models import Message
+import os
+import re
+import numpy as np
+
+# Reciprocal-rank fusion constant (higher flattens the rank curve)
+RRF_K = int(os.getenv("MESSAGE_SEARCH_RRF_K", "60"))
+
+# Candidates taken from each ranking before fusion
+MESSAGE_SEARCH_POOL = int(os.getenv("MESSAGE_SEARCH_POOL", "50"))
+
+# Largest hnsw.ef_search pgvector accepts
+MAX_EF_SEARCH = 1000
+
+# Both rankings are computed and fused in a single statement. The lexical
+# expression matches the GIN expression index created by migrate_pgvector.py.
+HYBRID_MESSAGE_SEARCH_SQL = """
+    WITH query AS (
+        SELECT websearch_to_tsquery('english', :query_text) AS tsq
+    ),
+    lexical AS (
+        SELECT
+            m.id,
+            ts_rank_cd(to_tsvector('english', coalesce(m.content, '')), q.tsq) AS lexical_score,
+            row_number() OVER (
+                ORDER BY ts_rank_cd(to_tsvector('english', coalesce(m.content, '')), q.tsq) DESC, m.id
+            ) AS lexical_rank
+        FROM messages m, query q
+        WHERE m.conversation_id = :conversation_id
+        AND (CAST(:before_id AS integer) IS NULL OR m.id < :before_id)
+        AND to_tsvector('english', coalesce(m.content, '')) @@ q.tsq
+        ORDER BY lexical_score DESC, m.id
+        LIMIT :pool
+    ),
+    semantic AS ({semantic})
+    SELECT
+        m.id,
+        m.role,
+        m.content,
+        m.timestamp,
+        l.lexical_score,
+        s.similarity,
+        COALESCE(1.0 / (:rrf_k + l.lexical_rank), 0)
+            + COALESCE(1.0 / (:rrf_k + s.semantic_rank), 0) AS score
+    FROM lexical l
+    FULL OUTER JOIN semantic s ON s.id = l.id
+    JOIN messages m ON m.id = COALESCE(l.id, s.id)
+    ORDER BY score DESC, m.id DESC
+    LIMIT :limit
+"""
+
+SEMANTIC_CANDIDATES_SQL = """
+        SELECT id, similarity, row_number() OVER (ORDER BY similarity DESC, id) AS semantic_rank
+        FROM (
+            SELECT id, 1 - (embedding <=> CAST(:query_embedding AS vector)) AS similarity
+            FROM messages
+            WHERE conversation_id = :conversation_id
+            AND (CAST(:before_id AS integer) IS NULL OR id < :before_id)
+            AND embedding IS NOT NULL
+            ORDER BY embedding <=> CAST(:query_embedding AS vector)
+            LIMIT :pool
+        ) nearest
+        WHERE similarity >= :threshold
+"""
+
+NO_SEMANTIC_CANDIDATES_SQL = """
+        SELECT NULL::integer AS id, NULL::double precision AS similarity, NULL::bigint AS semantic_rank
+        WHERE false
+"""
+
+
+def search_conversation_messages(
+    db: Session,
+    conversation_id: int,
+    query_text: Optional[str] = None,
+    query_embedding: Optional[List[float]] = None,
+    limit: int = 5,
+    similarity_threshold: float = 0.7,
+    before_message_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Search a conversation's messages by full-text match and embedding similarity
+
+    The lexical and semantic rankings are merged with reciprocal-rank fusion.
+    Either input may be missing: without an embedding (e.g. the embedding
+    service is unavailable) the search is lexical only, and without query
+    text it is semantic only.
+
+    Args:
+        db: Database session
+        conversation_id: ID of the conversation to search within
+        query_text: Search query text for full-text matching
+        query_embedding: Embedding of the query for vector similarity
+        limit: Maximum number of results to return
+        similarity_threshold: Minimum cosine similarity (0-1) for semantic matches
+        before_message_id: Only search messages with a smaller id (e.g. older
+            than the turns already in the prompt)
+
+    Returns:
+        List of message dicts (id, role, content, timestamp) with lexical_score,
+        similarity and the fused score, best first
+    """
+    if not query_text and query_embedding is None:
+        return []
+
+    if db.get_bind().dialect.name != "postgresql":
+        return _search_in_memory(
+            db, conversation_id, query_text, query_embedding, limit, similarity_threshold, before_message_id
+        )
+
+    pool = max(MESSAGE_SEARCH_POOL, limit * 4)
+    params = {
+        "conversation_id": conversation_id,
+        "before_id": before_message_id,
+        "query_text": query_text or "",
+        "threshold": similarity_threshold,
+        "pool": pool,
+        "rrf_k": RRF_K,
+        "limit": limit
+    }
+
+    semantic = NO_SEMANTIC_CANDIDATES_SQL
+    if query_embedding is not None:
+        semantic = SEMANTIC_CANDIDATES_SQL
+        params["query_embedding"] = "[" + ",".join(map(str, query_embedding)) + "]"
+        prepare_filtered_vector_scan(db, pool)
+
+    rows = db.execute(text(HYBRID_MESSAGE_SEARCH_SQL.format(semantic=semantic)), params).fetchall()
+    return [_message_row_to_dict(row._mapping) for row in rows]
+
+
+def _message_row_to_dict(mapping) -> Dict:
+    """Convert a scored message row into the API result format"""
+    return {
+        "id": mapping["id"],
+        "role": mapping["role"],
+        "content": mapping["content"],
+        "timestamp": mapping["timestamp"].isoformat() if mapping["timestamp"] else None,
+        "lexical_score": float(mapping["lexical_score"]) if mapping["lexical_score"] is not None else None,
+        "similarity": float(mapping["similarity"]) if mapping["similarity"] is not None else None,
+        "score": float(mapping["score"])
+    }
+
+
+_iterative_scan_supported: Optional[bool] = None
+
+
+def prepare_filtered_vector_scan(db: Session, pool: int):
+    """
+    Make HNSW scans return enough rows under a WHERE filter (e.g. conversation_id)
+
+    pgvector 0.8+ keeps scanning the index until the filtered LIMIT is met
+    (iterative index scans); older versions only get a larger ef_search,
+    up to pgvector's limit of 1000.
+    """
+    global _iterative_scan_supported
+
+    if _iterative_scan_supported is None:
+        version = db.execute(
+            text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        ).scalar()
+        try:
+            major, minor = (int(part) for part in (version or "0.0").split(".")[:2])
+            _iterative_scan_supported = (major, minor) >= (0, 8)
+        except ValueError:
+            _iterative_scan_supported = False
+
+    if _iterative_scan_supported:
+        db.execute(text("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)"))
+    ef_search = min(max(pool, 40), MAX_EF_SEARCH)
+    db.execute(text("SELECT set_config('hnsw.ef_search', :ef_search, true)"), {"ef_search": str(ef_search)})
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _search_in_memory(
+    db: Session,
+    conversation_id: int,
+    query_text: Optional[str],
+    query_embedding: Optional[List[float]],
+    limit: int,
+    similarity_threshold: float,
+    before_message_id: Optional[int] = None
+) -> List[Dict]:
+    """Fallback for databases without full-text and vector operators (SQLite)"""
+    columns = [Message.id, Message.role, Message.content, Message.timestamp]
+    if query_embedding is not None:
+        columns.append(Message.embedding)
+    query = db.query(*columns).filter(Message.conversation_id == conversation_id)
+    if before_message_id is not None:
+        query = query.filter(Message.id < before_message_id)
+    rows = query.all()
+    if not rows:
+        return []
+
+    ids = [row.id for row in rows]
+    fused = {message_id: 0.0 for message_id in ids}
+    lexical_scores: Dict[int, float] = {}
+    similarities: Dict[int, float] = {}
+
+    # Lexical: fraction of query terms present in the message
+    terms = set(_TOKEN_PATTERN.findall((query_text or "").casefold()))
+    if terms:
+        for row in rows:
+            words = set(_TOKEN_PATTERN.findall((row.content or "").casefold()))
+            matched = len(terms & words)
+            if matched:
+                lexical_scores[row.id] = matched / len(terms)
+        ranked = sorted(lexical_scores, key=lambda message_id: (-lexical_scores[message_id], message_id))
+        for rank, message_id in enumerate(ranked[:MESSAGE_SEARCH_POOL], 1):
+            fused[message_id] += 1.0 / (RRF_K + rank)
+
+    # Semantic: cosine similarity against stored embeddings
+    if query_embedding is not None:
+        embedded = [row for row in rows if row.embedding is not None]
+        if embedded:
+            matrix = np.asarray([row.embedding for row in embedded], dtype=np.float32)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            scores = (matrix @ query) / np.where(norms == 0, 1, norms)
+            for row, similarity in zip(embedded, scores):
+                if similarity >= similarity_threshold:
+                    similarities[row.id] = float(similarity)
+        ranked = sorted(similarities, key=lambda message_id: (-similarities[message_id], message_id))
+        for rank, message_id in enumerate(ranked[:MESSAGE_SEARCH_POOL], 1):
+            fused[message_id] += 1.0 / (RRF_K + rank)
+
+    by_id = {row.id: row for row in rows}
+    matches = [message_id for message_id in ids if message_id in lexical_scores or message_id in similarities]
+    matches.sort(key=lambda message_id: (-fused[message_id], -message_id))
+
+    return [
+        _message_row_to_dict({
+            "id": message_id,
+            "role": by_id[message_id].role,
+            "content": by_id[message_id].content,
+            "timestamp": by_id[message_id].timestamp,
+            "lexical_score": lexical_scores.get(message_id),
+            "similarity": similarities.get(message_id),
+            "score": fused[message_id]
+        })
+        for message_id in matches[:limit]
+    ]
@@ -0,0 +1,43 @@
+"""
+Database migration script to add running summary columns to the conversations table
+Long conversations are sent to the model as recent turns plus a running
+summary; run this script to update your existing database schema
+"""
+
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate_database():
+    """Add the summary and summary_message_id columns"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    with engine.connect() as conn:
+        print("Starting database migration...")
+
+        for column, column_type in (("summary", "TEXT"), ("summary_message_id", "INTEGER")):
+            try:
+                print(f"Adding {column} column to conversations table...")
+                if DATABASE_URL.startswith("sqlite"):
+                    conn.execute(text(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}"))
+                else:
+                    conn.execute(text(f"""
+                        ALTER TABLE conversations
+                        ADD COLUMN IF NOT EXISTS {column} {column_type}
+                    """))
+                conn.commit()
+                print(f"✓ {column} column added")
+
+            except Exception as e:
+                conn.rollback()
+                print(f"{column} column migration (may already exist): {e}")
+
+        print("\n✓ Database migration completed successfully!")
+        print("Existing conversations are summarized as they continue.")
+
+if __name__ == "__main__":
+    migrate_database()
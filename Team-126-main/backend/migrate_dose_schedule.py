@@ -0,0 +1,67 @@
+"""
+Database migration script for the rolling-horizon dose scheduler
+Removes duplicate doses, adds the unique (medication_id, scheduled_time)
+index the scheduler's idempotent inserts rely on, and runs a first pass
+"""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from database import DATABASE_URL
+from health_models import MedicationDose
+from adherence_rollup import rebuild_adherence_rollup
+from dose_scheduler import run_dose_schedule
+
+
+def migrate_database():
+    """Add the unique dose index and fill the dose horizon"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    print("Starting database migration...")
+
+    with engine.connect() as conn:
+        try:
+            print("Removing duplicate doses (keeping the first of each medication and time)...")
+            result = conn.execute(text("""
+                DELETE FROM medication_doses
+                WHERE id NOT IN (
+                    SELECT MIN(id) FROM medication_doses
+                    GROUP BY medication_id, scheduled_time
+                )
+            """))
+            conn.commit()
+            print(f"✓ Removed {result.rowcount} duplicate doses")
+
+            print("Creating unique index on (medication_id, scheduled_time)...")
+            for index in MedicationDose.__table__.indexes:
+                if index.unique:
+                    index.create(bind=conn, checkfirst=True)
+            conn.commit()
+            print("✓ Unique dose index ready")
+
+        except Exception as e:
+            print(f"Dose index migration failed: {e}")
+            return
+
+    session = sessionmaker(bind=engine)()
+    try:
+        print("Rebuilding adherence rollup and scheduling doses...")
+        rebuild_adherence_rollup(session)
+        result = run_dose_schedule(session)
+        print(f"✓ Scheduled {result['scheduled']} doses, marked {result['missed']} missed")
+    except Exception as e:
+        session.rollback()
+        print(f"Dose scheduling failed: {e}")
+        return
+    finally:
+        session.close()
+
+    print("\n✓ Database migration completed successfully!")
+    print("Doses are now kept scheduled ahead by the API server's dose scheduler.")
+
+if __name__ == "__main__":
+    migrate_database()
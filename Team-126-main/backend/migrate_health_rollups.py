@@ -0,0 +1,64 @@
+"""
+Database migration script for the health dashboard rollup and indexes
+Creates medication_adherence_daily, the composite indexes behind the
+dashboard query and the symptom/vital keyset pages, and backfills the rollup
+from existing doses (safe to re-run)
+"""
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import DATABASE_URL
+from health_models import MedicationDose, MedicationAdherenceDaily, SymptomLog, VitalSign
+from adherence_rollup import rebuild_adherence_rollup
+
+
+def migrate_database():
+    """Create the daily adherence rollup and backfill it"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    print("Starting database migration...")
+
+    try:
+        print("Creating medication_adherence_daily table...")
+        MedicationAdherenceDaily.__table__.create(bind=engine, checkfirst=True)
+        print("✓ medication_adherence_daily table ready")
+    except Exception as e:
+        print(f"Rollup table migration failed: {e}")
+        return
+
+    indexes = [
+        index
+        for model in (MedicationDose, SymptomLog, VitalSign)
+        for index in model.__table__.indexes
+    ]
+    for index in indexes:
+        try:
+            print(f"Creating index {index.name}...")
+            index.create(bind=engine, checkfirst=True)
+            print(f"✓ {index.name} ready")
+        except Exception as e:
+            print(f"Index {index.name} (may already exist): {e}")
+
+    session = sessionmaker(bind=engine)()
+    try:
+        print("Backfilling daily adherence counts from medication_doses...")
+        rows = rebuild_adherence_rollup(session)
+        session.commit()
+        print(f"✓ Wrote {rows} daily rollup rows")
+    except Exception as e:
+        session.rollback()
+        print(f"Rollup backfill failed: {e}")
+        return
+    finally:
+        session.close()
+
+    print("\n✓ Database migration completed successfully!")
+    print("The health dashboard now reads adherence from the daily rollup.")
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,102 @@
+"""
+Database migration script to move resource markers into message_resources
+Search results used to be embedded in assistant messages and reports as
+<!-- RESOURCE_DATA:{...} --> comments; run this script to create the
+message_resources table, copy existing markers into it and strip them from
+the stored text
+"""
+
+import json
+import re
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+from database import DATABASE_URL
+from models import Conversation, Message, MessageResource
+from message_resources import resource_rows
+
+RESOURCE_MARKER_PATTERN = re.compile(r'<!-- RESOURCE_DATA:(.+?) -->', re.DOTALL)
+
+
+def split_marker(text: str):
+    """Return (text without markers, resources from the first marker)"""
+    match = RESOURCE_MARKER_PATTERN.search(text)
+    resources = []
+    try:
+        data = json.loads(match.group(1))
+        if data.get("type") == "resource_list":
+            resources = data.get("resources") or []
+    except (ValueError, AttributeError):
+        pass
+    return RESOURCE_MARKER_PATTERN.sub('', text).rstrip(), resources
+
+
+def migrate_database():
+    """Create message_resources and move existing markers into it"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    print("Starting database migration...")
+
+    try:
+        print("Creating message_resources table...")
+        MessageResource.__table__.create(bind=engine, checkfirst=True)
+        print("✓ message_resources table ready")
+    except Exception as e:
+        print(f"message_resources table creation failed: {e}")
+        return
+
+    with Session(engine) as db:
+        try:
+            print("Moving resource markers out of assistant messages...")
+            messages = db.execute(
+                select(Message.id, Message.conversation_id, Message.content).where(
+                    Message.role == "assistant",
+                    Message.content.contains("<!-- RESOURCE_DATA:")
+                )
+            ).all()
+
+            moved = 0
+            for message_id, conversation_id, content in messages:
+                text, resources = split_marker(content)
+                already_moved = db.execute(
+                    select(MessageResource.id).where(MessageResource.message_id == message_id).limit(1)
+                ).first()
+                if resources and not already_moved:
+                    db.add_all(resource_rows(message_id, conversation_id, resources))
+                    moved += len(resources)
+                # Embeddings were computed over the marker; backfill recomputes them
+                db.execute(
+                    update(Message).where(Message.id == message_id).values(content=text, embedding=None)
+                )
+            db.commit()
+            print(f"✓ {len(messages)} messages cleaned, {moved} resources stored")
+
+            print("Removing resource markers from reports...")
+            reports = db.execute(
+                select(Conversation.id, Conversation.report).where(
+                    Conversation.report.contains("<!-- RESOURCE_DATA:")
+                )
+            ).all()
+            for conversation_id, report in reports:
+                db.execute(
+                    update(Conversation).where(Conversation.id == conversation_id)
+                    .values(report=split_marker(report)[0])
+                )
+            db.commit()
+            print(f"✓ {len(reports)} reports cleaned")
+
+        except Exception as e:
+            db.rollback()
+            print(f"Resource marker migration failed: {e}")
+            return
+
+    print("\n✓ Database migration completed successfully!")
+    print("Run backfill_embeddings.py to re-embed the cleaned messages.")
+
+if __name__ == "__main__":
+    migrate_database()
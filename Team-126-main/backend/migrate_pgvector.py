@@ -3,7 +3,8 @@ Database migration script to add pgvector support
 This script will:
 1. Enable the pgvector extension in PostgreSQL
 2. Add embedding vector columns to the messages table
-3. Create vector similarity search indexes
+3. Create vector similarity search indexes (messages, health_services)
+4. Create full-text and per-conversation indexes for message search
 
 Prerequisites:
 - PostgreSQL database must be running
@@ -33,7 +34,7 @@ def migrate_to_pgvector():
 
         try:
             # Step 1: Enable pgvector extension
-            print("\n[1/4] Enabling pgvector extension...")
+            print("\n[1/6] Enabling pgvector extension...")
             conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
             conn.commit()
             print("✓ pgvector extension enabled")
@@ -49,7 +50,7 @@ def migrate_to_pgvector():
 
         try:
             # Step 2: Add embedding column to messages table
-            print("\n[2/4] Adding embedding column to messages table...")
+            print("\n[2/6] Adding embedding column to messages table...")
             conn.execute(text("""
                 ALTER TABLE messages
                 ADD COLUMN IF NOT EXISTS embedding vector(768);
@@ -62,7 +63,7 @@ def migrate_to_pgvector():
 
         try:
             # Step 3: Create vector similarity search index (HNSW)
-            print("\n[3/4] Creating vector similarity search index...")
+            print("\n[3/6] Creating vector similarity search index...")
             # Drop existing index if it exists
             conn.execute(text("""
                 DROP INDEX IF EXISTS messages_embedding_idx;
@@ -81,8 +82,45 @@ def migrate_to_pgvector():
             print("   Note: Index will be created automatically on first use")
 
         try:
-            # Step 4: Verify setup
-            print("\n[4/4] Verifying pgvector setup...")
+            # Step 4: Create HNSW index for hybrid health service search
+            print("\n[4/6] Creating health services embedding index...")
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_health_services_embedding
+                ON health_services
+                USING hnsw (embedding vector_cosine_ops);
+            """))
+            conn.commit()
+            print("✓ Health services embedding index created (HNSW)")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠ Health services index creation: {e}")
+            print("   Note: Run import_datasets.py first if health_services does not exist")
+
+        try:
+            # Step 5: Create indexes for hybrid message search
+            print("\n[5/6] Creating message search indexes...")
+            # Full-text index; the expression must match message_search.py
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_messages_content_fts
+                ON messages
+                USING gin (to_tsvector('english', coalesce(content, '')));
+            """))
+            # Per-conversation lookups (exact scans for small conversations)
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_messages_conversation_id
+                ON messages (conversation_id, id);
+            """))
+            conn.commit()
+            print("✓ Message full-text (GIN) and conversation indexes created")
+
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠ Message search index creation: {e}")
+
+        try:
+            # Step 6: Verify setup
+            print("\n[6/6] Verifying pgvector setup...")
             result = conn.execute(text("""
                 SELECT COUNT(*) as count
                 FROM information_schema.columns
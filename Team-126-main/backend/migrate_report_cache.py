@@ -0,0 +1,41 @@
+"""
+Database migration script to add report_message_id to the conversations table
+Reports are cached against the last message they cover; run this script to
+update your existing database schema
+"""
+
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+
+def migrate_database():
+    """Add the report_message_id column"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    with engine.connect() as conn:
+        print("Starting database migration...")
+
+        try:
+            print("Adding report_message_id column to conversations table...")
+            if DATABASE_URL.startswith("sqlite"):
+                conn.execute(text("ALTER TABLE conversations ADD COLUMN report_message_id INTEGER"))
+            else:
+                conn.execute(text("""
+                    ALTER TABLE conversations
+                    ADD COLUMN IF NOT EXISTS report_message_id INTEGER
+                """))
+            conn.commit()
+            print("✓ Conversations table updated")
+
+        except Exception as e:
+            print(f"Conversations table migration (may already exist): {e}")
+
+        print("\n✓ Database migration completed successfully!")
+        print("Existing reports are regenerated the next time their conversation is ended.")
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,34 @@
+"""
+Database migration script to create the report_jobs table
+Report job status is shared between API workers through this table; run
+this script to update your existing database schema
+"""
+
+from sqlalchemy import create_engine
+from database import DATABASE_URL
+from models import ReportJobRecord
+
+def migrate_database():
+    """Create report_jobs and its index"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    print("Starting database migration...")
+
+    try:
+        print("Creating report_jobs table...")
+        ReportJobRecord.__table__.create(bind=engine, checkfirst=True)
+        print("✓ report_jobs table ready")
+    except Exception as e:
+        print(f"report_jobs table creation failed: {e}")
+        return
+
+    print("\n✓ Database migration completed successfully!")
+    print("Report jobs can now be polled on any worker.")
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,51 @@
+"""
+Database migration script to create the response_cache table
+Answers to context-free questions are cached by embedding when
+RESPONSE_CACHE_ENABLED=true; run this script to update your existing
+database schema
+"""
+
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL
+from models import ResponseCacheEntry
+
+def migrate_database():
+    """Create response_cache and its vector index"""
+
+    # Configure engine based on database type
+    if DATABASE_URL.startswith("sqlite"):
+        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(DATABASE_URL)
+
+    print("Starting database migration...")
+
+    try:
+        print("Creating response_cache table...")
+        ResponseCacheEntry.__table__.create(bind=engine, checkfirst=True)
+        print("✓ response_cache table ready")
+    except Exception as e:
+        print(f"response_cache table creation failed: {e}")
+        return
+
+    if not DATABASE_URL.startswith("sqlite"):
+        with engine.connect() as conn:
+            try:
+                print("Creating response cache embedding index...")
+                conn.execute(text("""
+                    CREATE INDEX IF NOT EXISTS idx_response_cache_embedding
+                    ON response_cache
+                    USING hnsw (embedding vector_cosine_ops);
+                """))
+                conn.commit()
+                print("✓ Response cache embedding index created (HNSW)")
+
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠ Index creation: {e}")
+
+    print("\n✓ Database migration completed successfully!")
+    print("Set RESPONSE_CACHE_ENABLED=true to start caching answers.")
+
+if __name__ == "__main__":
+    migrate_database()
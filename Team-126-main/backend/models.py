@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -28,6 +28,9 @@ class Conversation(Base):
     started_at = Column(DateTime, default=datetime.utcnow)
     ended_at = Column(DateTime, nullable=True)
     report = Column(Text, nullable=True)
+    report_message_id = Column(Integer, nullable=True)  # Last message covered by report
+    summary = Column(Text, nullable=True)  # Running summary of turns older than the prompt window
+    summary_message_id = Column(Integer, nullable=True)  # Last message covered by summary
     latitude = Column(Float, nullable=True)  # User's current latitude
     longitude = Column(Float, nullable=True)  # User's current longitude
 
@@ -49,3 +52,78 @@ class Message(Base):
     embedding = Column(Vector(768), nullable=True)  # Semantic embedding of message content
 
     conversation = relationship("Conversation", back_populates="messages")
+
+
+class MessageResource(Base):
+    """
+    A resource (shelter, clinic, food bank, ...) attached to an assistant message
+
+    Search results are stored here instead of in the message text, so
+    messages, their embeddings and model prompts hold only the readable
+    reply. data is a snapshot of the resource as it was shown.
+    """
+    __tablename__ = "message_resources"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(Integer, ForeignKey("messages.id", ondelete="CASCADE"), nullable=False)
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    position = Column(Integer, nullable=False, default=0)  # Order within the message
+    resource_id = Column(String, nullable=True)  # Dataset id (unique together with resource_type)
+    resource_type = Column(String, nullable=True)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_message_resources_message", "message_id", "position"),
+        Index("idx_message_resources_conversation", "conversation_id", "message_id"),
+    )
+
+
+class ResponseCacheEntry(Base):
+    """
+    A chatbot answer reusable for similar context-free questions
+
+    Entries are matched by embedding similarity within the same coarse
+    location cell and dataset version, and expire at expires_at.
+    """
+    __tablename__ = "response_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    query_text = Column(Text, nullable=False)
+    location_cell = Column(String, nullable=False)  # Rounded "lat,lon" or "none"
+    dataset_version = Column(String, nullable=False)  # Resource datasets the answer was based on
+    embedding = Column(Vector(768), nullable=False)
+    response = Column(Text, nullable=False)
+    resources = Column(JSON, nullable=True)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_response_cache_cell", "location_cell", "dataset_version", "expires_at"),
+    )
+
+
+class ReportJobRecord(Base):
+    """
+    Status of a background report job, shared by all API workers
+
+    The worker running a job keeps its row up to date, so any worker can
+    answer polls for it. One row per (conversation_id, last_message_id), so
+    requests reaching different workers share one job.
+    """
+    __tablename__ = "report_jobs"
+
+    id = Column(String, primary_key=True)  # Job id returned to clients
+    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    last_message_id = Column(Integer, nullable=True)  # Last message the report covers
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, failed
+    report = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # Last status change
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("idx_report_jobs_state", "conversation_id", "last_message_id", unique=True),
+    )
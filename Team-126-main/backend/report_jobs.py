@@ -0,0 +1,362 @@
+"""
+Background conversation report jobs
+
+Ending a conversation submits a report job instead of generating the report
+inside the request. Jobs run on the event loop (the model call is async and
+database work runs in worker threads), at most REPORT_MAX_CONCURRENT at a
+time per worker. Clients poll the job or wait for it on a WebSocket.
+
+Job status is kept in the report_jobs table, so with several API workers a
+poll may reach any of them, and concurrent requests for the same
+(conversation_id, last_message_id) share one job across workers. Finished
+reports are also stored on the conversation together with the id of the
+last message they cover, so ending an unchanged conversation again returns
+the stored report without a job.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import os
+import uuid
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Conversation, Message, ReportJobRecord
+from chatbot import build_conversation_report
+from message_resources import load_conversation_resources
+
+# Reports generated at the same time
+REPORT_MAX_CONCURRENT = int(os.getenv("REPORT_MAX_CONCURRENT", "2"))
+
+# Finished jobs kept in memory (older ones are read from report_jobs)
+REPORT_JOB_HISTORY = int(os.getenv("REPORT_JOB_HISTORY", "256"))
+
+# Pending or running jobs not updated for this long are treated as failed
+# (the worker running them is gone) and replaced on the next request
+REPORT_JOB_TIMEOUT_SECONDS = int(os.getenv("REPORT_JOB_TIMEOUT_SECONDS", "600"))
+
+# report_jobs rows older than this are deleted (seconds)
+REPORT_JOB_RETENTION_SECONDS = 86400
+
+# How often a wait on another worker's job re-reads its row (seconds)
+REPORT_POLL_SECONDS = 1.0
+
+
+def load_report_messages(conversation_id: int, last_message_id: Optional[int]) -> List[Dict[str, str]]:
+    """Messages a report covers, oldest first"""
+    db = SessionLocal()
+    try:
+        query = select(Message.role, Message.content).where(Message.conversation_id == conversation_id)
+        if last_message_id is not None:
+            query = query.where(Message.id <= last_message_id)
+        rows = db.execute(query.order_by(Message.id)).all()
+        return [{"role": role, "content": content} for role, content in rows]
+    finally:
+        db.close()
+
+
+def load_report_resources(conversation_id: int, last_message_id: Optional[int]) -> List[Dict]:
+    """Resources shared up to the last message a report covers"""
+    db = SessionLocal()
+    try:
+        return load_conversation_resources(db, conversation_id, last_message_id)
+    finally:
+        db.close()
+
+
+def store_report(conversation_id: int, last_message_id: Optional[int], report: str):
+    """Save a finished report unless a report covering later messages is already stored"""
+    db = SessionLocal()
+    try:
+        query = update(Conversation).where(Conversation.id == conversation_id)
+        if last_message_id is not None:
+            query = query.where(or_(
+                Conversation.report_message_id.is_(None),
+                Conversation.report_message_id <= last_message_id
+            ))
+        db.execute(query.values(report=report, report_message_id=last_message_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _is_abandoned(record: ReportJobRecord, now: datetime) -> bool:
+    """Whether a pending or running job stopped being updated"""
+    return (
+        record.status in ("pending", "running")
+        and record.updated_at < now - timedelta(seconds=REPORT_JOB_TIMEOUT_SECONDS)
+    )
+
+
+def job_record_dict(db: Session, record: ReportJobRecord) -> Dict:
+    """Job status from its row, in the shape of ReportJob.to_dict"""
+    status, error = record.status, record.error
+    if _is_abandoned(record, datetime.utcnow()):
+        status, error = "failed", "Report generation stopped responding"
+
+    resources = []
+    if status == "done":
+        resources = load_conversation_resources(db, record.conversation_id, record.last_message_id)
+
+    return {
+        "job_id": record.id,
+        "conversation_id": record.conversation_id,
+        "status": status,
+        "report": record.report,
+        "resources": resources,
+        "error": error,
+        "cached": False,
+        "created_at": record.created_at,
+        "finished_at": record.finished_at,
+    }
+
+
+def claim_report_job(job_id: str, conversation_id: int, last_message_id: Optional[int]) -> Optional[Dict]:
+    """
+    Record a pending job unless one already exists for this conversation state
+
+    A failed or abandoned job for the same state is replaced. Rows older
+    than REPORT_JOB_RETENTION_SECONDS are purged.
+
+    Args:
+        job_id: Id of the new job
+        conversation_id: Conversation to report on
+        last_message_id: Last message the report covers
+
+    Returns:
+        Status of the existing job, or None if job_id was recorded
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        same_state = select(ReportJobRecord).where(
+            ReportJobRecord.conversation_id == conversation_id,
+            ReportJobRecord.last_message_id == last_message_id
+        )
+        db.execute(delete(ReportJobRecord).where(
+            ReportJobRecord.created_at < now - timedelta(seconds=REPORT_JOB_RETENTION_SECONDS)
+        ))
+
+        existing = db.execute(same_state).scalars().first()
+        if existing is not None:
+            if existing.status != "failed" and not _is_abandoned(existing, now):
+                result = job_record_dict(db, existing)
+                db.commit()
+                return result
+            db.delete(existing)
+            db.flush()
+
+        db.add(ReportJobRecord(
+            id=job_id,
+            conversation_id=conversation_id,
+            last_message_id=last_message_id,
+            status="pending",
+            created_at=now,
+            updated_at=now
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker recorded a job for this state first
+            db.rollback()
+            return job_record_dict(db, db.execute(same_state).scalars().one())
+        return None
+    finally:
+        db.close()
+
+
+def update_report_job(job_id: str, status: str, report: Optional[str] = None, error: Optional[str] = None):
+    """Record a job's status (and its report or error once finished)"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        values = {"status": status, "report": report, "error": error, "updated_at": now}
+        if status in ("done", "failed"):
+            values["finished_at"] = now
+        db.execute(update(ReportJobRecord).where(ReportJobRecord.id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_report_job(job_id: str) -> Optional[Dict]:
+    """Job status from report_jobs (None if unknown)"""
+    db = SessionLocal()
+    try:
+        record = db.get(ReportJobRecord, job_id)
+        return job_record_dict(db, record) if record is not None else None
+    finally:
+        db.close()
+
+
+class ReportJob:
+    """One report generation for a conversation as of a given last message"""
+
+    def __init__(self, conversation_id: int, last_message_id: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.conversation_id = conversation_id
+        self.last_message_id = last_message_id
+        self.status = "pending"  # pending, running, done, failed
+        self.report: Optional[str] = None
+        self.resources: List[Dict] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.finished = asyncio.Event()
+
+    def to_dict(self) -> Dict:
+        """Job status for API responses"""
+        return {
+            "job_id": self.id,
+            "conversation_id": self.conversation_id,
+            "status": self.status,
+            "report": self.report,
+            "resources": self.resources,
+            "error": self.error,
+            "cached": False,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ReportJobQueue:
+    """Runs report jobs in the background and answers polls for jobs of any worker"""
+
+    def __init__(self, max_concurrent: int = REPORT_MAX_CONCURRENT, history: int = REPORT_JOB_HISTORY):
+        self.max_concurrent = max_concurrent
+        self.history = history
+
+        self._jobs: "OrderedDict[str, ReportJob]" = OrderedDict()
+        self._by_key: Dict[Tuple[int, Optional[int]], ReportJob] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+
+    async def submit(self, conversation_id: int, last_message_id: Optional[int]) -> Dict:
+        """
+        Start a report job, or return the one already recorded for this state
+
+        Args:
+            conversation_id: Conversation to report on
+            last_message_id: Last message the report covers
+
+        Returns:
+            Job status (poll with status or wait)
+        """
+        key = (conversation_id, last_message_id)
+        job = self._by_key.get(key)
+        if job is not None and job.status != "failed":
+            return job.to_dict()
+
+        job = ReportJob(conversation_id, last_message_id)
+        existing = await asyncio.to_thread(claim_report_job, job.id, conversation_id, last_message_id)
+        if existing is not None:
+            return existing
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        self._jobs[job.id] = job
+        self._by_key[key] = job
+        self._trim()
+
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        print(f"[Report Jobs] Queued report for conversation {conversation_id} (job {job.id})")
+        return job.to_dict()
+
+    async def status(self, job_id: str) -> Optional[Dict]:
+        """Status of a job run by any worker (None if unknown or expired)"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return await asyncio.to_thread(load_report_job, job_id)
+
+    async def wait(self, job_id: str) -> Optional[Dict]:
+        """Status of a job once it has finished (None if unknown or expired)"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            await job.finished.wait()
+            return job.to_dict()
+
+        # Run by another worker: follow its row
+        while True:
+            result = await asyncio.to_thread(load_report_job, job_id)
+            if result is None or result["status"] in ("done", "failed"):
+                return result
+            await asyncio.sleep(REPORT_POLL_SECONDS)
+
+    async def _run(self, job: ReportJob):
+        """Generate, store and publish one report"""
+        try:
+            async with self._semaphore:
+                job.status = "running"
+                await asyncio.to_thread(update_report_job, job.id, "running")
+                messages = await asyncio.to_thread(
+                    load_report_messages, job.conversation_id, job.last_message_id
+                )
+                report, resources = await asyncio.gather(
+                    build_conversation_report(messages, conversation_id=job.conversation_id),
+                    asyncio.to_thread(load_report_resources, job.conversation_id, job.last_message_id)
+                )
+                await asyncio.to_thread(store_report, job.conversation_id, job.last_message_id, report)
+                await asyncio.to_thread(update_report_job, job.id, "done", report)
+            job.report = report
+            job.resources = resources
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Report generation was cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"[Report Jobs] Report for conversation {job.conversation_id} failed: {str(e)}")
+        finally:
+            if job.status == "failed":
+                try:
+                    await asyncio.to_thread(update_report_job, job.id, "failed", error=job.error)
+                except Exception as e:
+                    print(f"[Report Jobs] Could not record failure of job {job.id}: {str(e)}")
+            job.finished_at = datetime.utcnow()
+            job.finished.set()
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond the history size"""
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            job = self._jobs[job_id]
+            if job.finished.is_set():
+                del self._jobs[job_id]
+                if self._by_key.get((job.conversation_id, job.last_message_id)) is job:
+                    del self._by_key[(job.conversation_id, job.last_message_id)]
+                excess -= 1
+
+    async def stop(self):
+        """Cancel running jobs"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        """
+        Get counts of this worker's jobs by status
+
+        Returns:
+            Dictionary of status -> job count
+        """
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+# Process-wide queue, used by the API server
+report_jobs = ReportJobQueue()
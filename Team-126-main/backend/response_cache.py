@@ -0,0 +1,342 @@
+"""
+Semantic cache of chatbot answers to frequently asked questions
+
+Opt-in with RESPONSE_CACHE_ENABLED=true. Questions that don't depend on
+earlier turns ("where can I get food tonight") are embedded and matched
+against earlier answers given in the same coarse location cell; a match at
+or above RESPONSE_CACHE_THRESHOLD cosine similarity is returned without a
+model call.
+
+Entries expire after RESPONSE_CACHE_TTL_SECONDS and only match while the
+local resource datasets are unchanged (resource_catalog.version()).
+import_datasets.py clears the cache after importing; run this module
+directly to clear it by hand.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import os
+import re
+import time
+
+import numpy as np
+from sqlalchemy import delete, text, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ResponseCacheEntry
+from embeddings import generate_embedding_async
+from message_search import prepare_filtered_vector_scan
+from chatbot import CONNECTION_ERROR_REPLY
+from tools.dataset_search import resource_catalog
+
+# Off unless explicitly enabled
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+
+# Minimum cosine similarity for a cached answer to be reused
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+
+# Lifetime of a cached answer (seconds)
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "21600"))
+
+# Size of a location cell in degrees (0.02 is about 2 km in San Diego)
+RESPONSE_CACHE_CELL_DEGREES = float(os.getenv("RESPONSE_CACHE_CELL_DEGREES", "0.02"))
+
+# Expired entries are deleted at most this often (seconds)
+PURGE_INTERVAL_SECONDS = 600
+
+# Words that point back at earlier turns ("is it open?", "what about those?")
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(it|its|that|those|these|them|they|this one|the first|the second|the last|"
+    r"more|else|again|above|earlier|previous|same)\b",
+    re.IGNORECASE
+)
+
+# Location shares sent by the frontend and the assistant's location requests
+LOCATION_SHARE_PREFIX = "My current location is"
+LOCATION_REQUEST_PREFIX = '{"type": "request_location"'
+
+NEAREST_ENTRY_SQL = """
+    SELECT id, response, resources, 1 - (embedding <=> CAST(:query_embedding AS vector)) AS similarity
+    FROM response_cache
+    WHERE location_cell = :location_cell
+    AND dataset_version = :dataset_version
+    AND expires_at > :now
+    ORDER BY embedding <=> CAST(:query_embedding AS vector)
+    LIMIT 1
+"""
+
+
+def location_cell(latitude: Optional[float], longitude: Optional[float]) -> str:
+    """Coarse grid cell of a location ("none" when unknown)"""
+    if latitude is None or longitude is None:
+        return "none"
+    size = RESPONSE_CACHE_CELL_DEGREES
+    return f"{np.floor(latitude / size) * size:.4f},{np.floor(longitude / size) * size:.4f}"
+
+
+def _is_location_exchange(message: Dict) -> bool:
+    """Location request or share, which doesn't make later questions context-dependent"""
+    content = message.get("content") or ""
+    return content.startswith(LOCATION_SHARE_PREFIX) or content.startswith(LOCATION_REQUEST_PREFIX)
+
+
+def is_first_question(prior_messages: List[Dict]) -> bool:
+    """
+    Whether nothing but location exchanges came before the current message
+
+    Only answers to first questions are stored: later answers were generated
+    with the conversation (summary, recent turns, recalled messages) in the
+    prompt and may use one person's situation.
+    """
+    return all(_is_location_exchange(message) for message in prior_messages)
+
+
+def is_context_free(user_message: str, prior_messages: List[Dict]) -> bool:
+    """
+    Whether an answer to user_message can be shared with other conversations
+
+    True for the first question of a conversation (location exchanges
+    aside), and for later questions without words referring back to
+    earlier turns. Later questions may read the cache; only first questions
+    are stored (is_first_question).
+
+    Args:
+        user_message: Current user message
+        prior_messages: Messages before it in the prompt window
+
+    Returns:
+        Whether the question may be answered from the cache
+    """
+    if not user_message or user_message.startswith(LOCATION_SHARE_PREFIX):
+        return False
+    if is_first_question(prior_messages):
+        return True
+    return FOLLOW_UP_PATTERN.search(user_message) is None
+
+
+def is_cacheable_reply(reply: str) -> bool:
+    """Replies worth storing (not errors or location requests)"""
+    return bool(reply) and not reply.startswith(CONNECTION_ERROR_REPLY) and not reply.startswith(LOCATION_REQUEST_PREFIX)
+
+
+def find_cached_response(
+    db: Session,
+    query_embedding: List[float],
+    cell: str,
+    dataset_version: str,
+    threshold: float = RESPONSE_CACHE_THRESHOLD
+) -> Optional[Tuple[str, List[Dict], float]]:
+    """
+    Closest unexpired answer in a cell, if similar enough
+
+    Args:
+        db: Database session (the caller commits the hit counter)
+        query_embedding: Embedding of the user message
+        cell: Location cell from location_cell
+        dataset_version: Current resource_catalog.version()
+        threshold: Minimum cosine similarity
+
+    Returns:
+        Tuple of (response, resources, similarity), or None
+    """
+    now = datetime.utcnow()
+    if db.get_bind().dialect.name == "postgresql":
+        prepare_filtered_vector_scan(db, 40)
+        row = db.execute(text(NEAREST_ENTRY_SQL), {
+            "query_embedding": "[" + ",".join(map(str, query_embedding)) + "]",
+            "location_cell": cell,
+            "dataset_version": dataset_version,
+            "now": now
+        }).first()
+        best = (row.id, row.response, row.resources, float(row.similarity)) if row else None
+    else:
+        # SQLite: exact cosine similarity over the cell's entries
+        rows = db.query(
+            ResponseCacheEntry.id, ResponseCacheEntry.response,
+            ResponseCacheEntry.resources, ResponseCacheEntry.embedding
+        ).filter(
+            ResponseCacheEntry.location_cell == cell,
+            ResponseCacheEntry.dataset_version == dataset_version,
+            ResponseCacheEntry.expires_at > now
+        ).all()
+        best = None
+        if rows:
+            matrix = np.asarray([row.embedding for row in rows], dtype=np.float32)
+            query = np.asarray(query_embedding, dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            scores = (matrix @ query) / np.where(norms == 0, 1, norms)
+            i = int(np.argmax(scores))
+            best = (rows[i].id, rows[i].response, rows[i].resources, float(scores[i]))
+
+    if best is None or best[3] < threshold:
+        return None
+
+    entry_id, response, resources, similarity = best
+    db.execute(update(ResponseCacheEntry).where(ResponseCacheEntry.id == entry_id).values(
+        hits=ResponseCacheEntry.hits + 1
+    ))
+    if isinstance(resources, str):
+        resources = json.loads(resources)
+    return response, resources or [], similarity
+
+
+def clear_response_cache(db: Session) -> int:
+    """
+    Delete every cached answer (after re-importing datasets)
+
+    Returns:
+        Number of entries deleted
+    """
+    deleted = db.execute(delete(ResponseCacheEntry)).rowcount
+    db.commit()
+    return deleted
+
+
+class ResponseCache:
+    """Async front end of the cache for the chat handler, with hit counters"""
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self._last_purge = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.failures = 0
+
+    async def lookup(
+        self,
+        user_message: str,
+        latitude: Optional[float],
+        longitude: Optional[float]
+    ) -> Optional[Tuple[str, List[Dict]]]:
+        """
+        Find a cached answer for a context-free question
+
+        Args:
+            user_message: Current user message
+            latitude: Conversation latitude (None if unknown)
+            longitude: Conversation longitude (None if unknown)
+
+        Returns:
+            Tuple of (response, resources) on a hit, otherwise None
+        """
+        try:
+            query_embedding = await generate_embedding_async(user_message)
+            if query_embedding is None:
+                return None
+            result = await asyncio.to_thread(
+                self._find, query_embedding, location_cell(latitude, longitude), resource_catalog.version()
+            )
+        except Exception as e:
+            self.failures += 1
+            print(f"[Response Cache] Lookup failed: {str(e)}")
+            return None
+
+        if result is None:
+            self.misses += 1
+            return None
+
+        response, resources, similarity = result
+        self.hits += 1
+        print(f"[Response Cache] Hit (similarity {similarity:.3f})")
+        return response, resources
+
+    async def store(
+        self,
+        user_message: str,
+        latitude: Optional[float],
+        longitude: Optional[float],
+        response: str,
+        resources: List[Dict]
+    ):
+        """Cache an answer to a context-free question (errors are logged, not raised)"""
+        if not is_cacheable_reply(response):
+            return
+        try:
+            # Served from the embedding cache: lookup already embedded this text
+            query_embedding = await generate_embedding_async(user_message)
+            if query_embedding is None:
+                return
+            await asyncio.to_thread(
+                self._insert, user_message, query_embedding,
+                location_cell(latitude, longitude), resource_catalog.version(), response, resources
+            )
+            self.stores += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"[Response Cache] Store failed: {str(e)}")
+
+    @staticmethod
+    def _find(query_embedding: List[float], cell: str, dataset_version: str):
+        """find_cached_response on its own session"""
+        db = SessionLocal()
+        try:
+            result = find_cached_response(db, query_embedding, cell, dataset_version)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    def _insert(
+        self,
+        user_message: str,
+        query_embedding: List[float],
+        cell: str,
+        dataset_version: str,
+        response: str,
+        resources: List[Dict]
+    ):
+        """Insert an entry on its own session, purging expired ones now and then"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.add(ResponseCacheEntry(
+                query_text=user_message,
+                location_cell=cell,
+                dataset_version=dataset_version,
+                embedding=query_embedding,
+                response=response,
+                resources=resources,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds)
+            ))
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                db.execute(delete(ResponseCacheEntry).where(ResponseCacheEntry.expires_at <= now))
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with enabled flag and hit, miss, store and failure counts
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "stores": self.stores,
+            "failures": self.failures,
+        }
+
+
+# Process-wide cache, used by the chat handler
+response_cache = ResponseCache()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(f"✓ Cleared {clear_response_cache(db)} cached responses")
+    finally:
+        db.close()
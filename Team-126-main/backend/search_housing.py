@@ -1,73 +1,77 @@
 """
 Demo script to search the housing JSON file
 """
-import json
 from typing import List, Dict, Optional
+from housing_index import get_housing_index
 
-def load_housing_data() -> Dict:
-    """Load the housing JSON data"""
-    with open('datasets/housing_elements.json', 'r', encoding='utf-8') as f:
-        return json.load(f)
 
-def search_housing(
+def search_housing_page(
     query: str = "",
     jurisdiction: Optional[str] = None,
     vacancy_status: Optional[str] = None,
     zoning_type: Optional[str] = None,
     min_units: Optional[int] = None,
     max_units: Optional[int] = None,
+    offset: int = 0,
     limit: int = 10
-) -> List[Dict]:
+) -> Dict:
     """
-    Search housing data with various filters
+    Search housing data with various filters, one page at a time
 
     Args:
-        query: Text search in searchable_text field
+        query: Text search in searchable_text field (every word must match)
         jurisdiction: Filter by jurisdiction
         vacancy_status: Filter by vacancy status (Vacant, etc.)
         zoning_type: Filter by simplified zoning type
         min_units: Minimum number of units
         max_units: Maximum number of units
+        offset: Number of matching records to skip
         limit: Maximum results to return
 
     Returns:
-        List of matching housing records
+        Dictionary with results, total, offset, limit and next_offset
     """
-    data = load_housing_data()
-    results = []
-
-    query_lower = query.lower() if query else ""
-
-    for record in data['data']:
-        # Text search
-        if query and query_lower not in record['searchable_text']:
-            continue
-
-        # Jurisdiction filter
-        if jurisdiction and record['jurisdiction'].lower() != jurisdiction.lower():
-            continue
-
-        # Vacancy status filter
-        if vacancy_status and record['vacancy_status'] != vacancy_status:
-            continue
-
-        # Zoning type filter
-        if zoning_type and record['zoning']['simplified'].lower() != zoning_type.lower():
-            continue
-
-        # Units filter
-        if min_units is not None and record['units'] < min_units:
-            continue
+    return get_housing_index().search(
+        query=query,
+        jurisdiction=jurisdiction,
+        vacancy_status=vacancy_status,
+        zoning_type=zoning_type,
+        min_units=min_units,
+        max_units=max_units,
+        offset=offset,
+        limit=limit
+    )
 
-        if max_units is not None and record['units'] > max_units:
-            continue
 
-        results.append(record)
+def search_housing(
+    query: str = "",
+    jurisdiction: Optional[str] = None,
+    vacancy_status: Optional[str] = None,
+    zoning_type: Optional[str] = None,
+    min_units: Optional[int] = None,
+    max_units: Optional[int] = None,
+    limit: int = 10,
+    offset: int = 0
+) -> List[Dict]:
+    """
+    Search housing data with various filters
 
-        if len(results) >= limit:
-            break
+    Args:
+        query: Text search in searchable_text field
+        jurisdiction: Filter by jurisdiction
+        vacancy_status: Filter by vacancy status (Vacant, etc.)
+        zoning_type: Filter by simplified zoning type
+        min_units: Minimum number of units
+        max_units: Maximum number of units
+        limit: Maximum results to return
+        offset: Number of matching records to skip
 
-    return results
+    Returns:
+        List of matching housing records
+    """
+    return search_housing_page(
+        query, jurisdiction, vacancy_status, zoning_type, min_units, max_units, offset, limit
+    )['results']
 
 def print_housing_results(results: List[Dict]):
     """Pretty print housing search results"""
@@ -139,16 +143,23 @@ def demo_searches():
     )
     print_housing_results(results)
 
+    # Search 6: Paginate through vacant properties
+    print("\n\n6️⃣  SEARCH: Vacant properties, second page")
+    print("-" * 80)
+    page = search_housing_page(vacancy_status="Vacant", offset=5, limit=5)
+    print(f"Showing {page['offset'] + 1}-{page['offset'] + len(page['results'])} of {page['total']:,}")
+    print_housing_results(page['results'])
+
     # Print summary statistics
-    data = load_housing_data()
+    summary = get_housing_index().summary
     print("\n\n" + "=" * 80)
     print("Dataset Summary")
     print("=" * 80)
-    print(f"\nTotal Records:     {data['summary']['total_records']:,}")
-    print(f"Total Units:       {data['summary']['total_units']:,}")
-    print(f"Jurisdictions:     {len(data['summary']['jurisdictions'])}")
-    print(f"Vacant Properties: {data['summary']['vacancy_counts']['vacant']:,}")
-    print(f"\nZoning Types: {', '.join(data['summary']['zoning_types'])}")
+    print(f"\nTotal Records:     {summary['total_records']:,}")
+    print(f"Total Units:       {summary['total_units']:,}")
+    print(f"Jurisdictions:     {len(summary['jurisdictions'])}")
+    print(f"Vacant Properties: {summary['vacancy_counts']['vacant']:,}")
+    print(f"\nZoning Types: {', '.join(summary['zoning_types'])}")
     print("\n" + "=" * 80)
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
 """Tools package"""
 from .location_tool import location_tool, get_location_func
-from .search_tool import search_web_func, perform_web_search
+from .search_tool import search_web_func, perform_web_search, perform_web_search_async
 
-__all__ = ['location_tool', 'get_location_func', 'search_web_func', 'perform_web_search']
+__all__ = ['location_tool', 'get_location_func', 'search_web_func', 'perform_web_search', 'perform_web_search_async']
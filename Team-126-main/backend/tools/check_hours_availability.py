@@ -5,7 +5,8 @@ Tool for checking resource hours and availability
 from vertexai.generative_models import FunctionDeclaration
 from datetime import datetime
 from typing import Dict, Optional, List
-import requests
+from .http_client import http_client, Deadline, run_with_deadline, BROWSER_USER_AGENT
+from .lookups import instant_answer
 
 # Define check hours function
 check_hours_func = FunctionDeclaration(
@@ -86,85 +87,103 @@ def parse_hours_string(hours_str: str) -> Optional[Dict]:
     return None
 
 
+async def _check_resource_availability(resource_name: str, resource_type: str, phone_number: Optional[str] = None) -> Dict:
+    """Look up hours on the shared HTTP client (runs on the client loop)"""
+    day_name, current_time, hour_24 = get_current_day_time()
+
+    # Search for resource information
+    search_query = f"{resource_name} {resource_type} hours San Diego"
+    headers = {
+        'User-Agent': BROWSER_USER_AGENT
+    }
+
+    data = await run_with_deadline(instant_answer(search_query, headers=headers), Deadline()) or {}
+
+    # Extract hours information from abstract or related topics
+    hours_info = None
+    source = None
+
+    if data.get('Abstract'):
+        hours_info = data.get('Abstract', '')
+        source = data.get('AbstractURL', '')
+
+    result = {
+        'resource_name': resource_name,
+        'resource_type': resource_type,
+        'current_time': current_time,
+        'current_day': day_name,
+        'search_query': search_query,
+        'phone_number': phone_number or 'Not provided'
+    }
+
+    if hours_info:
+        result['hours_found'] = hours_info
+        result['source_url'] = source
+
+        # Try to determine if open
+        hours_lower = hours_info.lower()
+        if "24" in hours_lower or "24/7" in hours_lower:
+            result['is_open'] = True
+            result['status'] = "Open 24/7"
+        elif "closed" in hours_lower:
+            result['is_open'] = False
+            result['status'] = "Currently closed"
+        else:
+            result['status'] = "Hours information found - verify with resource"
+            result['is_open'] = None  # Uncertain
+    else:
+        result['hours_found'] = None
+        result['status'] = "Hours not found in search"
+        result['is_open'] = None
+        result['recommendation'] = f"Call {phone_number}" if phone_number else "Call the resource directly to confirm hours"
+
+    return result
+
+
+def _availability_error(resource_name: str, resource_type: str, phone_number: Optional[str], error: Exception) -> Dict:
+    """Fallback result when the availability check fails"""
+    print(f"Error checking availability: {str(error)}")
+    return {
+        'resource_name': resource_name,
+        'resource_type': resource_type,
+        'status': 'Unable to check',
+        'error': str(error),
+        'recommendation': f"Call {phone_number if phone_number else 'the resource'} directly or visit 211.org"
+    }
+
+
 def check_resource_availability(resource_name: str, resource_type: str, phone_number: Optional[str] = None) -> Dict:
     """
     Check if a resource is currently open
-    
+
+    The lookup uses the shared HTTP client and gives up after
+    TOOL_DEADLINE_SECONDS, reporting the hours as not found.
+
     Args:
         resource_name: Name of the resource
         resource_type: Type of resource (shelter, food_bank, healthcare, other)
         phone_number: Optional phone number for verification
-        
+
     Returns:
         Dictionary with availability status and hours information
     """
     try:
-        day_name, current_time, hour_24 = get_current_day_time()
-        
-        # Search for resource information
-        search_query = f"{resource_name} {resource_type} hours San Diego"
-        url = "https://api.duckduckgo.com/"
-        params = {
-            'q': search_query,
-            'format': 'json',
-            'no_html': 1
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        data = response.json()
-        
-        # Extract hours information from abstract or related topics
-        hours_info = None
-        source = None
-        
-        if data.get('Abstract'):
-            hours_info = data.get('Abstract', '')
-            source = data.get('AbstractURL', '')
-        
-        result = {
-            'resource_name': resource_name,
-            'resource_type': resource_type,
-            'current_time': current_time,
-            'current_day': day_name,
-            'search_query': search_query,
-            'phone_number': phone_number or 'Not provided'
-        }
-        
-        if hours_info:
-            result['hours_found'] = hours_info
-            result['source_url'] = source
-            
-            # Try to determine if open
-            hours_lower = hours_info.lower()
-            if "24" in hours_lower or "24/7" in hours_lower:
-                result['is_open'] = True
-                result['status'] = "Open 24/7"
-            elif "closed" in hours_lower:
-                result['is_open'] = False
-                result['status'] = "Currently closed"
-            else:
-                result['status'] = "Hours information found - verify with resource"
-                result['is_open'] = None  # Uncertain
-        else:
-            result['hours_found'] = None
-            result['status'] = "Hours not found in search"
-            result['is_open'] = None
-            result['recommendation'] = f"Call {phone_number}" if phone_number else "Call the resource directly to confirm hours"
-        
-        return result
-        
+        return http_client.run(_check_resource_availability(resource_name, resource_type, phone_number))
+    except Exception as e:
+        return _availability_error(resource_name, resource_type, phone_number, e)
+
+
+async def check_resource_availability_async(resource_name: str, resource_type: str, phone_number: Optional[str] = None) -> Dict:
+    """
+    Async version of check_resource_availability for callers already on an event loop
+
+    Returns:
+        Dictionary with availability status and hours information
+    """
+    try:
+        return await http_client.run_async(_check_resource_availability(resource_name, resource_type, phone_number))
     except Exception as e:
-        print(f"Error checking availability: {str(e)}")
-        return {
-            'resource_name': resource_name,
-            'resource_type': resource_type,
-            'status': 'Unable to check',
-            'error': str(e),
-            'recommendation': f"Call {phone_number if phone_number else 'the resource'} directly or visit 211.org"
-        }
+        return _availability_error(resource_name, resource_type, phone_number, e)
 
 
 def format_availability_response(availability_data: Dict) -> str:
@@ -2,14 +2,21 @@
 Local dataset search functionality
 """
 
+import hashlib
 import json
 import os
 import math
 from typing import List, Dict, Optional
+import numpy as np
+
+from .transit_index import find_nearby_transit
 
 # Path to datasets directory
 DATASETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'datasets')
 
+# Datasets the search tool reads
+LOCAL_DATASETS = ['healthcare_resources.json', 'shelters.json', 'food_banks.json']
+
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -29,6 +36,166 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+class _Dataset:
+    """One JSON dataset held in memory with coordinates in contiguous arrays"""
+
+    def __init__(self, path: str):
+        self.mtime = os.path.getmtime(path)
+
+        with open(path, 'r') as f:
+            self.resources: List[Dict] = json.load(f)
+
+        self.latitudes = np.full(len(self.resources), np.nan)
+        self.longitudes = np.full(len(self.resources), np.nan)
+        for i, resource in enumerate(self.resources):
+            coordinates = resource.get('coordinates')
+            if coordinates:
+                self.latitudes[i] = coordinates['latitude']
+                self.longitudes[i] = coordinates['longitude']
+
+
+class ResourceCatalog:
+    """
+    Memory-resident catalog of the local JSON datasets
+
+    Each dataset is parsed once and reloaded only when its file modification
+    time changes. Distances to all resources are computed in one vectorized
+    pass and the nearest results are selected with argpartition.
+    """
+
+    def __init__(self, datasets_dir: str = DATASETS_DIR):
+        self.datasets_dir = datasets_dir
+        self._datasets: Dict[str, _Dataset] = {}
+        self._combined: Dict[tuple, tuple] = {}
+
+    def get_dataset(self, dataset_file: str) -> Optional[_Dataset]:
+        """
+        Get a dataset, loading or reloading it if the file changed
+
+        Returns:
+            The loaded dataset, or None if the file is missing or unreadable
+        """
+        dataset_path = os.path.join(self.datasets_dir, dataset_file)
+
+        try:
+            mtime = os.path.getmtime(dataset_path)
+        except OSError:
+            self._datasets.pop(dataset_file, None)
+            print(f"[Dataset Search] Warning: {dataset_file} not found")
+            return None
+
+        dataset = self._datasets.get(dataset_file)
+        if dataset is None or dataset.mtime != mtime:
+            try:
+                dataset = _Dataset(dataset_path)
+            except Exception as e:
+                print(f"[Dataset Search] Error reading {dataset_file}: {str(e)}")
+                return None
+            self._datasets[dataset_file] = dataset
+            print(f"[Dataset Search] Loaded {len(dataset.resources)} resources from {dataset_file}")
+
+        return dataset
+
+    def version(self) -> str:
+        """Short fingerprint of the dataset files on disk (changes when any is replaced)"""
+        stamps = []
+        for dataset_file in LOCAL_DATASETS:
+            try:
+                stamps.append(f"{dataset_file}:{os.path.getmtime(os.path.join(self.datasets_dir, dataset_file))}")
+            except OSError:
+                stamps.append(f"{dataset_file}:missing")
+        return hashlib.sha1("|".join(stamps).encode()).hexdigest()[:16]
+
+    def _combine(self, dataset_files: List[str]) -> tuple:
+        """Concatenate resources and coordinates of several datasets (cached per file set)"""
+        datasets = [(name, self.get_dataset(name)) for name in dataset_files]
+        datasets = [(name, dataset) for name, dataset in datasets if dataset is not None]
+
+        key = tuple((name, id(dataset)) for name, dataset in datasets)
+        combined = self._combined.get(tuple(dataset_files))
+        if combined is None or combined[0] != key:
+            resources = [r for _, dataset in datasets for r in dataset.resources]
+            if datasets:
+                latitudes = np.concatenate([dataset.latitudes for _, dataset in datasets])
+                longitudes = np.concatenate([dataset.longitudes for _, dataset in datasets])
+            else:
+                latitudes = longitudes = np.empty(0)
+            combined = (key, resources, latitudes, longitudes)
+            self._combined[tuple(dataset_files)] = combined
+
+        return combined[1:]
+
+    def search(
+        self,
+        dataset_files: List[str],
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None,
+        max_results: int = 5
+    ) -> List[Dict]:
+        """
+        Get the nearest resources from the given datasets
+
+        Args:
+            dataset_files: Dataset file names to search
+            latitude: User's latitude for distance sorting
+            longitude: User's longitude for distance sorting
+            max_results: Maximum number of results to return
+
+        Returns:
+            Copies of the matching resources (with 'distance_miles' when a
+            location is given), nearest first; resources without coordinates last
+        """
+        resources, latitudes, longitudes = self._combine(dataset_files)
+        if not resources or max_results <= 0:
+            return []
+
+        if latitude is None or longitude is None:
+            return [dict(resource) for resource in resources[:max_results]]
+
+        distances = haversine_miles(latitude, longitude, latitudes, longitudes)
+        distances = np.where(np.isnan(distances), np.inf, distances)
+
+        k = min(max_results, len(resources))
+        if k < len(resources):
+            # Keep every resource tied with the k-th distance so ordering stays stable
+            kth_distance = np.partition(distances, k - 1)[k - 1]
+            candidates = np.flatnonzero(distances <= kth_distance)
+        else:
+            candidates = np.arange(len(resources))
+        top = candidates[np.lexsort((candidates, distances[candidates]))][:k]
+
+        results = []
+        for i in top:
+            resource = dict(resources[i])
+            if np.isfinite(distances[i]):
+                resource['distance_miles'] = round(float(distances[i]), 2)
+            results.append(resource)
+        return results
+
+
+def haversine_miles(lat: float, lon: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Haversine distance in miles from one point to many points
+
+    Entries with NaN coordinates produce NaN distances.
+    """
+    R = 3959  # Earth's radius in miles
+
+    lat1_rad = math.radians(lat)
+    lat2_rad = np.radians(latitudes)
+    delta_lat = lat2_rad - lat1_rad
+    delta_lon = np.radians(longitudes - lon)
+
+    a = np.sin(delta_lat/2)**2 + math.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(delta_lon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+
+    return R * c
+
+
+# Process-wide catalog of local datasets
+resource_catalog = ResourceCatalog()
+
+
 def search_local_datasets(query: str, latitude: Optional[float] = None, longitude: Optional[float] = None, max_results: int = 5) -> List[Dict]:
     """
     Search local JSON datasets for resources
@@ -43,7 +210,6 @@ def search_local_datasets(query: str, latitude: Optional[float] = None, longitud
         List of matching resources sorted by distance
     """
     query_lower = query.lower()
-    results = []
 
     # Determine which datasets to search based on query
     datasets_to_search = []
@@ -59,46 +225,23 @@ def search_local_datasets(query: str, latitude: Optional[float] = None, longitud
 
     # If no specific category found, search all datasets
     if not datasets_to_search:
-        datasets_to_search = ['healthcare_resources.json', 'shelters.json', 'food_banks.json']
+        datasets_to_search = list(LOCAL_DATASETS)
 
     print(f"[Dataset Search] Query: '{query}'")
     print(f"[Dataset Search] Searching datasets: {datasets_to_search}")
 
-    # Search each relevant dataset
-    for dataset_file in datasets_to_search:
-        dataset_path = os.path.join(DATASETS_DIR, dataset_file)
-
-        if not os.path.exists(dataset_path):
-            print(f"[Dataset Search] Warning: {dataset_file} not found")
-            continue
-
-        try:
-            with open(dataset_path, 'r') as f:
-                data = json.load(f)
+    results = resource_catalog.search(datasets_to_search, latitude, longitude, max_results)
 
-            for resource in data:
-                # Calculate distance if coordinates provided
-                distance = None
-                if latitude is not None and longitude is not None and 'coordinates' in resource:
-                    distance = calculate_distance(
-                        latitude, longitude,
-                        resource['coordinates']['latitude'],
-                        resource['coordinates']['longitude']
-                    )
-                    resource['distance_miles'] = round(distance, 2)
-
-                results.append(resource)
-
-        except Exception as e:
-            print(f"[Dataset Search] Error reading {dataset_file}: {str(e)}")
-
-    # Sort by distance if coordinates provided
-    if latitude is not None and longitude is not None:
-        results.sort(key=lambda x: x.get('distance_miles', float('inf')))
+    for resource in results:
+        coordinates = resource.get('coordinates')
+        if coordinates:
+            resource['nearby_transit'] = find_nearby_transit(
+                coordinates['latitude'], coordinates['longitude'], limit=3, max_distance_km=1.0
+            )
 
     print(f"[Dataset Search] Found {len(results)} results")
 
-    return results[:max_results]
+    return results
 
 
 def format_results_for_llm(results: List[Dict]) -> str:
@@ -120,6 +263,10 @@ def format_results_for_llm(results: List[Dict]) -> str:
         if 'distance_miles' in resource:
             formatted += f"   Distance: {resource['distance_miles']} miles from you\n"
 
+        if resource.get('nearby_transit'):
+            stop = resource['nearby_transit'][0]
+            formatted += f"   Nearest transit: {stop['name']} ({stop['distance_miles']:.2f} miles)\n"
+
         if 'services' in resource:
             formatted += f"   Services: {', '.join(resource['services'])}\n"
 
@@ -0,0 +1,165 @@
+"""
+Shared async HTTP layer for the chatbot tools
+
+All outbound tool requests (Nominatim, DuckDuckGo) go through one pooled
+httpx.AsyncClient. Independent lookups are fanned out concurrently under an
+overall deadline; whatever has finished when the deadline hits is returned
+and the rest is cancelled, so tool latency is bounded by the slowest single
+call rather than the sum of all calls.
+
+Service URLs can be overridden with environment variables, which allows the
+tools to be exercised offline against the local stub server in
+tools/stub_server.py.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, List, Optional
+import httpx
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+DUCKDUCKGO_API_URL = os.getenv("DUCKDUCKGO_API_URL", "https://api.duckduckgo.com/")
+
+# Overall time budget for one tool invocation (seconds)
+TOOL_DEADLINE_SECONDS = float(os.getenv("TOOL_DEADLINE_SECONDS", "8"))
+
+# Per-request timeout (seconds); requests are also cut off by the tool deadline
+TOOL_HTTP_TIMEOUT_SECONDS = float(os.getenv("TOOL_HTTP_TIMEOUT_SECONDS", "10"))
+
+# Connection pool size shared by all tools
+TOOL_HTTP_MAX_CONNECTIONS = int(os.getenv("TOOL_HTTP_MAX_CONNECTIONS", "20"))
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class Deadline:
+    """Absolute point in time shared by the steps of one tool invocation"""
+
+    def __init__(self, seconds: float = TOOL_DEADLINE_SECONDS):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class ToolHttpClient:
+    """
+    Pooled async HTTP client running on a dedicated event loop thread
+
+    The client lives on its own loop so it can be shared by async callers
+    (the websocket handlers) and by synchronous callers alike without
+    rebinding pooled connections to a different loop.
+    """
+
+    def __init__(self, max_connections: int = TOOL_HTTP_MAX_CONNECTIONS, timeout: float = TOOL_HTTP_TIMEOUT_SECONDS):
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop and client on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="tool-http", daemon=True)
+                thread.start()
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    ),
+                    follow_redirects=True
+                )
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the client loop and block for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return future.result(timeout)
+
+    async def run_async(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the client loop and await its result from another loop"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> Optional[Dict]:
+        """
+        GET a URL and decode the JSON body (must run on the client loop)
+
+        Returns:
+            Decoded JSON, or None for non-200 responses
+        """
+        response = await self._client.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+        if response.status_code != 200:
+            print(f"[HTTP] {url} returned {response.status_code}")
+            return None
+        return response.json()
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+
+
+# Process-wide client shared by all tools
+http_client = ToolHttpClient()
+
+
+async def gather_with_deadline(coros: List[Awaitable], deadline: Deadline, label: str = "HTTP") -> List[Optional[Any]]:
+    """
+    Run coroutines concurrently and keep whatever finishes before the deadline
+
+    Calls that fail or are still running at the deadline yield None; pending
+    calls are cancelled.
+
+    Args:
+        coros: Coroutines to run
+        deadline: Deadline for the whole batch
+        label: Log prefix
+
+    Returns:
+        Results aligned with coros (None for failed or timed-out calls)
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if not tasks:
+        return []
+
+    done, pending = await asyncio.wait(tasks, timeout=deadline.remaining())
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"[{label}] Deadline reached, returning {len(done)}/{len(tasks)} results")
+
+    results = []
+    for task in tasks:
+        if task in done and not task.cancelled() and task.exception() is None:
+            results.append(task.result())
+        else:
+            if task in done and not task.cancelled():
+                print(f"[{label}] Request failed: {task.exception()}")
+            results.append(None)
+    return results
+
+
+async def run_with_deadline(coro: Awaitable, deadline: Deadline, label: str = "HTTP") -> Optional[Any]:
+    """
+    Await a single coroutine bounded by the shared deadline
+
+    Returns:
+        The result, or None on error or deadline
+    """
+    results = await gather_with_deadline([coro], deadline, label=label)
+    return results[0]
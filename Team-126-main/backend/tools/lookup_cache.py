@@ -0,0 +1,257 @@
+"""
+Shared TTL cache for external lookups made by the chatbot tools
+
+Reverse geocoding results are keyed by the geohash cell of the coordinates,
+so repeated turns within a neighbourhood reuse one Nominatim answer. Web
+search responses are keyed by the normalized query. Failed lookups are
+cached for a shorter negative TTL so an outage is not hammered on every
+turn. Each cache is a size-bounded in-memory LRU with an optional SQLite
+file so entries survive restarts.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# SQLite file shared by all lookup caches (empty string disables persistence)
+LOOKUP_CACHE_PATH = os.getenv("LOOKUP_CACHE_PATH", "./lookup_cache.db")
+
+# Geohash precision for reverse geocoding keys (5 ≈ 4.9 km cells, enough for city names)
+GEOCODE_CACHE_PRECISION = int(os.getenv("GEOCODE_CACHE_PRECISION", "5"))
+
+GEOCODE_CACHE_TTL_SECONDS = int(os.getenv("GEOCODE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(6 * 3600)))
+
+# How long failed lookups are remembered (seconds)
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "120"))
+
+LOOKUP_CACHE_MAX_ITEMS = int(os.getenv("LOOKUP_CACHE_MAX_ITEMS", "5000"))
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOCODE_CACHE_PRECISION) -> str:
+    """
+    Encode coordinates as a geohash string
+
+    Args:
+        latitude: Latitude coordinate
+        longitude: Longitude coordinate
+        precision: Number of characters (each adds 5 bits of resolution)
+
+    Returns:
+        Geohash of the cell containing the point
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so equivalent queries share a key"""
+    return " ".join(query.casefold().split())
+
+
+class LookupCache:
+    """
+    Size-bounded LRU with per-entry expiry and optional SQLite persistence
+
+    A cached value of None records a failed lookup (negative entry).
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: int,
+        negative_ttl_seconds: int = NEGATIVE_CACHE_TTL_SECONDS,
+        max_items: int = LOOKUP_CACHE_MAX_ITEMS,
+        path: Optional[str] = LOOKUP_CACHE_PATH
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_items = max_items
+
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            try:
+                self._open_disk(path)
+            except Exception as e:
+                print(f"[Lookup Cache] Persistence disabled for {namespace}: {e}")
+                self._db = None
+
+    def _open_disk(self, path: str):
+        """Open the SQLite file and drop expired entries"""
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lookup_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._db.execute("DELETE FROM lookup_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key
+
+        Returns:
+            Tuple of (found, value); value is None for cached failures
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._memory[key]
+                entry = None
+
+            if entry is None and self._db is not None:
+                entry = self._read_disk(key, now)
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self._memory.move_to_end(key)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, entry[1]
+
+    def put(self, key: str, value: Any):
+        """Store a value (None stores a negative entry with the shorter TTL)"""
+        ttl = self.ttl_seconds if value is not None else self.negative_ttl_seconds
+        entry = (time.time() + ttl, value)
+
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO lookup_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                        (self.namespace, key, json.dumps(value), entry[0])
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    print(f"[Lookup Cache] Failed to persist {self.namespace} entry: {e}")
+
+    def _remember(self, key: str, entry: Tuple[float, Any]):
+        """Insert into memory, evicting least recently used entries"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        """Fetch an unexpired entry from SQLite"""
+        try:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM lookup_cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, key, now)
+            ).fetchone()
+        except Exception as e:
+            print(f"[Lookup Cache] Failed to read {self.namespace} entry: {e}")
+            return None
+
+        if row is None:
+            return None
+        return (row[1], json.loads(row[0]))
+
+    def clear(self):
+        """Remove all entries in this namespace"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM lookup_cache WHERE namespace = ?", (self.namespace,))
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hit/miss counts and memory size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
+
+
+async def cached_lookup(cache: LookupCache, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return a cached value or fetch and cache it
+
+    Args:
+        cache: Cache to use
+        key: Cache key
+        fetch: Zero-argument coroutine function performing the lookup; a None
+            result is cached as a failure
+
+    Returns:
+        Cached or freshly fetched value
+    """
+    found, value = cache.get(key)
+    if found:
+        return value
+
+    value = await fetch()
+    cache.put(key, value)
+    return value
+
+
+# Process-wide caches shared by all tools
+geocode_cache = LookupCache("geocode", GEOCODE_CACHE_TTL_SECONDS)
+search_cache = LookupCache("search", SEARCH_CACHE_TTL_SECONDS)
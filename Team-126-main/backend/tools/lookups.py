@@ -0,0 +1,136 @@
+"""
+Cached external lookups shared by the chatbot tools
+
+Reverse geocoding (Nominatim) and DuckDuckGo Instant Answer queries run on
+the shared HTTP client and go through the lookup caches, so repeated turns in
+the same neighbourhood or with the same query skip the network entirely.
+"""
+
+import json
+from typing import Dict, Optional
+
+from .http_client import (
+    http_client,
+    Deadline,
+    run_with_deadline,
+    NOMINATIM_URL,
+    DUCKDUCKGO_API_URL,
+    TOOL_HTTP_TIMEOUT_SECONDS
+)
+from .lookup_cache import geocode_cache, search_cache, cached_lookup, geohash, normalize_query
+
+
+def _format_location(data: Optional[Dict]) -> Optional[str]:
+    """Build a "City, State" string from a Nominatim reverse geocoding response"""
+    if not data:
+        return None
+
+    address = data.get('address', {})
+
+    # Try to get city, state, country
+    city = address.get('city') or address.get('town') or address.get('village')
+    state = address.get('state')
+    country = address.get('country')
+
+    if city and state:
+        return f"{city}, {state}"
+    elif city and country:
+        return f"{city}, {country}"
+    elif city:
+        return city
+
+    return None
+
+
+async def _fetch_location_name(latitude: float, longitude: float) -> Optional[str]:
+    """Call Nominatim (OpenStreetMap) reverse geocoding"""
+    params = {
+        'lat': latitude,
+        'lon': longitude,
+        'format': 'json',
+        'zoom': 10  # City level
+    }
+    headers = {
+        'User-Agent': 'HomelessAssistantApp/1.0'
+    }
+
+    try:
+        data = await http_client.get_json(NOMINATIM_URL, params=params, headers=headers, timeout=5)
+    except Exception as e:
+        print(f"Reverse geocoding error: {str(e)}")
+        return None
+    return _format_location(data)
+
+
+async def reverse_geocode(latitude: float, longitude: float, deadline: Deadline) -> Optional[str]:
+    """
+    Get the city name for coordinates, cached per geohash cell
+
+    Must run on the shared HTTP client loop.
+
+    Args:
+        latitude: Latitude coordinate
+        longitude: Longitude coordinate
+        deadline: Deadline shared with the rest of the tool call
+
+    Returns:
+        Location string (e.g., "San Diego, California") or None if unavailable
+    """
+    key = geohash(latitude, longitude)
+    return await run_with_deadline(
+        cached_lookup(geocode_cache, key, lambda: _fetch_location_name(latitude, longitude)),
+        deadline,
+        label="Geocode"
+    )
+
+
+def get_location_name(latitude: float, longitude: float) -> Optional[str]:
+    """
+    Get city/location name from coordinates using Nominatim reverse geocoding
+
+    Args:
+        latitude: Latitude coordinate
+        longitude: Longitude coordinate
+
+    Returns:
+        Location string (e.g., "San Diego, CA") or None if failed
+    """
+    try:
+        return http_client.run(reverse_geocode(latitude, longitude, Deadline()))
+    except Exception as e:
+        print(f"Reverse geocoding error: {str(e)}")
+        return None
+
+
+async def instant_answer(
+    query: str,
+    headers: Optional[Dict] = None,
+    timeout: float = TOOL_HTTP_TIMEOUT_SECONDS,
+    **params
+) -> Optional[Dict]:
+    """
+    Query the DuckDuckGo Instant Answer API, cached by normalized query
+
+    Must run on the shared HTTP client loop; callers bound it with a deadline.
+
+    Args:
+        query: Search query
+        headers: Optional request headers
+        timeout: Per-request timeout in seconds
+        **params: Extra API parameters (e.g. skip_disambig=1)
+
+    Returns:
+        Decoded API response, or None if the lookup failed
+    """
+    request_params = {'q': query, 'format': 'json', 'no_html': 1, **params}
+    extra = {k: v for k, v in request_params.items() if k != 'q'}
+    key = f"{normalize_query(query)}|{json.dumps(extra, sort_keys=True)}"
+
+    async def fetch() -> Optional[Dict]:
+        try:
+            return await http_client.get_json(DUCKDUCKGO_API_URL, params=request_params, headers=headers, timeout=timeout)
+        except Exception as e:
+            print(f"Search error for '{query}': {str(e)}")
+            return None
+
+    return await cached_lookup(search_cache, key, fetch)
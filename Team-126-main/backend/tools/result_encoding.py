@@ -0,0 +1,222 @@
+"""
+Compact encoding of tool results for the model
+
+Search results are sent to the model as one short line per resource with
+only the selected fields, instead of a Markdown block per resource. Each
+call has a token budget: long descriptions, service lists and requirements
+are truncated step by step until the text fits, and trailing resources are
+dropped as a last resort. Token counts are estimated locally (no extra
+model round trip) and recorded per call so the savings over the verbose
+format show up in tool_token_stats.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import math
+import os
+
+# Fields sent for each resource, in order
+RESOURCE_FIELDS = (
+    "name", "type", "address", "phone", "hours", "distance",
+    "transit", "services", "requirements", "description",
+)
+
+# Default fields (comma separated, subset of RESOURCE_FIELDS)
+TOOL_RESULT_FIELDS = tuple(
+    field.strip() for field in os.getenv("TOOL_RESULT_FIELDS", ",".join(RESOURCE_FIELDS)).split(",")
+    if field.strip() in RESOURCE_FIELDS
+)
+
+# Estimated tokens allowed per tool response
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "400"))
+
+# Characters per token used for estimates (Gemini averages about 4 for English)
+CHARS_PER_TOKEN = 4
+
+# Truncation steps tried in order until a response fits the budget:
+# (description chars, services listed, requirements chars, web snippet chars)
+TRUNCATION_STEPS = (
+    (240, 8, 160, 400),
+    (120, 4, 80, 200),
+    (60, 2, 40, 100),
+    (0, 0, 0, 60),
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated token count of text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def clip(text: str, limit: int) -> str:
+    """Single-line text cut to limit characters (with an ellipsis when cut)"""
+    text = " ".join(str(text).split())
+    if len(text) <= limit:
+        return text
+    return text[:max(limit - 1, 0)].rstrip() + "…"
+
+
+def encode_resource(resource: Dict, fields: Sequence[str], step: Tuple[int, int, int, int]) -> str:
+    """
+    One resource as a compact "key: value; ..." line
+
+    Missing fields are left out rather than sent as N/A.
+
+    Args:
+        resource: Local dataset resource
+        fields: Fields to include
+        step: Truncation step from TRUNCATION_STEPS
+
+    Returns:
+        Encoded line
+    """
+    description_chars, services_limit, requirements_chars, _ = step
+    parts = []
+    for field in fields:
+        if field == "name":
+            parts.append(str(resource.get("name", "")))
+        elif field == "type":
+            value = resource.get("category") or resource.get("type")
+            if value:
+                parts.append(f"type: {value}")
+        elif field == "distance":
+            if "distance_miles" in resource:
+                parts.append(f"{resource['distance_miles']} mi")
+        elif field == "transit":
+            if resource.get("nearby_transit"):
+                stop = resource["nearby_transit"][0]
+                parts.append(f"transit: {stop['name']} {stop['distance_miles']:.2f} mi")
+        elif field == "services":
+            services = resource.get("services") or []
+            if services and services_limit:
+                listed = ", ".join(services[:services_limit])
+                if len(services) > services_limit:
+                    listed += f" +{len(services) - services_limit} more"
+                parts.append(f"services: {listed}")
+        elif field == "requirements":
+            if resource.get("requirements") and requirements_chars:
+                parts.append(f"requirements: {clip(resource['requirements'], requirements_chars)}")
+        elif field == "description":
+            if resource.get("description") and description_chars:
+                parts.append(f"about: {clip(resource['description'], description_chars)}")
+        elif resource.get(field):
+            parts.append(f"{field}: {clip(resource[field], 120)}")
+    return "; ".join(parts)
+
+
+def encode_resources(
+    resources: List[Dict],
+    fields: Optional[Sequence[str]] = None,
+    token_budget: int = TOOL_RESULT_TOKEN_BUDGET,
+    header: str = ""
+) -> Tuple[str, int]:
+    """
+    Encode resources within a token budget
+
+    Args:
+        resources: Local dataset resources, best first
+        fields: Fields to include (defaults to TOOL_RESULT_FIELDS)
+        token_budget: Estimated tokens allowed
+        header: Text placed before the resource lines
+
+    Returns:
+        Tuple of (encoded text, estimated tokens)
+    """
+    fields = [field for field in (fields or TOOL_RESULT_FIELDS) if field in RESOURCE_FIELDS] or list(TOOL_RESULT_FIELDS)
+
+    for step in TRUNCATION_STEPS:
+        lines = [f"{idx}. {encode_resource(resource, fields, step)}" for idx, resource in enumerate(resources, 1)]
+        text = header + "\n".join(lines)
+        tokens = estimate_tokens(text)
+        if tokens <= token_budget:
+            return text, tokens
+
+    # Still too long at the tightest step: keep as many resources as fit
+    while len(lines) > 1 and tokens > token_budget:
+        lines.pop()
+        text = header + "\n".join(lines) + f"\n({len(resources) - len(lines)} more not shown)"
+        tokens = estimate_tokens(text)
+    return text, tokens
+
+
+def encode_search_results(
+    query: str,
+    search_results: List[Dict],
+    fields: Optional[Sequence[str]] = None,
+    token_budget: int = TOOL_RESULT_TOKEN_BUDGET
+) -> Tuple[str, int]:
+    """
+    Encode search_web results for the function response
+
+    Local dataset hits are encoded from their structured resources; web
+    results are sent as title, shortened snippet and URL.
+
+    Args:
+        query: Search query
+        search_results: Results from perform_web_search_async
+        fields: Resource fields to include
+        token_budget: Estimated tokens allowed
+
+    Returns:
+        Tuple of (encoded text, estimated tokens)
+    """
+    header = f"Results for '{query}':\n"
+    resources = [resource for result in search_results for resource in result.get("resources", [])]
+    if resources:
+        return encode_resources(resources, fields, token_budget, header=header + "From our local verified database:\n")
+
+    for step in TRUNCATION_STEPS:
+        lines = []
+        for idx, result in enumerate(search_results, 1):
+            line = f"{idx}. {result['title']}: {clip(result['snippet'], step[3])}"
+            if result.get("url"):
+                line += f" ({result['url']})"
+            lines.append(line)
+        text = header + "\n".join(lines)
+        tokens = estimate_tokens(text)
+        if tokens <= token_budget:
+            break
+    return text, tokens
+
+
+def verbose_search_tokens(query: str, search_results: List[Dict]) -> int:
+    """Estimated tokens of the same results in the verbose Markdown layout"""
+    text = f"Search results for '{query}':\n\n" + "".join(
+        f"{idx}. {result['title']}\n   {result['snippet']}\n   URL: {result.get('url', '')}\n\n"
+        for idx, result in enumerate(search_results, 1)
+    )
+    return estimate_tokens(text)
+
+
+class ToolTokenStats:
+    """Per-tool counters of encoded response size against the verbose format"""
+
+    def __init__(self):
+        self._tools: Dict[str, Dict[str, int]] = {}
+
+    def record(self, tool: str, tokens: int, verbose_tokens: int):
+        """Count one tool response"""
+        counters = self._tools.setdefault(tool, {"calls": 0, "tokens": 0, "verbose_tokens": 0})
+        counters["calls"] += 1
+        counters["tokens"] += tokens
+        counters["verbose_tokens"] += verbose_tokens
+
+    def stats(self) -> Dict:
+        """
+        Get token counters per tool
+
+        Returns:
+            Dictionary of tool -> calls, tokens sent, tokens the verbose
+            format would have sent, and average tokens per call
+        """
+        return {
+            tool: {
+                **counters,
+                "avg_tokens": round(counters["tokens"] / counters["calls"], 1),
+                "saved_tokens": counters["verbose_tokens"] - counters["tokens"],
+            }
+            for tool, counters in self._tools.items()
+        }
+
+
+# Process-wide counters, reported by the API server
+tool_token_stats = ToolTokenStats()
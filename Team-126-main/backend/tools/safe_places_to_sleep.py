@@ -3,9 +3,10 @@ Tool for finding safe places to sleep for unsheltered individuals
 """
 
 from vertexai.generative_models import FunctionDeclaration
-import requests
-from typing import Dict, Optional, List
+from typing import Dict, List
 from datetime import datetime
+from .http_client import http_client, Deadline, gather_with_deadline, BROWSER_USER_AGENT
+from .lookups import reverse_geocode, instant_answer
 
 # Define find safe places to sleep function
 find_safe_sleep_func = FunctionDeclaration(
@@ -45,67 +46,8 @@ find_safe_sleep_func = FunctionDeclaration(
 )
 
 
-def get_location_name(latitude: float, longitude: float) -> Optional[str]:
-    """
-    Get city/location name from coordinates using Nominatim reverse geocoding
-
-    Args:
-        latitude: Latitude coordinate
-        longitude: Longitude coordinate
-
-    Returns:
-        Location string (e.g., "San Diego, CA") or None if failed
-    """
-    try:
-        url = "https://nominatim.openstreetmap.org/reverse"
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'format': 'json',
-            'zoom': 10
-        }
-        headers = {
-            'User-Agent': 'SafeSleepAssistant/1.0'
-        }
-
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-
-        if response.status_code == 200:
-            data = response.json()
-            address = data.get('address', {})
-
-            city = address.get('city') or address.get('town') or address.get('village')
-            state = address.get('state')
-            country = address.get('country')
-
-            if city and state:
-                return f"{city}, {state}"
-            elif city and country:
-                return f"{city}, {country}"
-            elif city:
-                return city
-
-        return None
-    except Exception as e:
-        print(f"Reverse geocoding error: {str(e)}")
-        return None
-
-
-def search_safe_sleep_options(latitude: float, longitude: float, location_name: str, include_type: str = "all", max_distance_miles: int = 3) -> List[Dict]:
-    """
-    Search for safe sleep options using DuckDuckGo API
-
-    Args:
-        latitude: User latitude
-        longitude: User longitude
-        location_name: City/location name
-        include_type: Type of options to search for
-        max_distance_miles: Max distance to search
-
-    Returns:
-        List of safe sleep options
-    """
-    options = []
+def _build_search_queries(location_name: str, include_type: str) -> List[Dict]:
+    """DuckDuckGo queries for the requested types of safe sleep options"""
     search_queries = []
 
     if include_type in ["all", "safe_parking"]:
@@ -143,40 +85,64 @@ def search_safe_sleep_options(latitude: float, longitude: float, location_name:
             "description": "Transit hub with 24-hour access and seating"
         })
 
-    # Perform searches
-    for search_item in search_queries:
-        try:
-            url = "https://api.duckduckgo.com/"
-            params = {
-                'q': search_item['query'],
-                'format': 'json',
-                'no_html': 1,
-                'skip_disambig': 1
-            }
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
+    return search_queries
+
 
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            data = response.json()
+async def _search_safe_sleep_options(location_name: str, include_type: str, deadline: Deadline) -> List[Dict]:
+    """Run all option searches concurrently, keeping those done by the deadline"""
+    search_queries = _build_search_queries(location_name, include_type)
+    headers = {
+        'User-Agent': BROWSER_USER_AGENT
+    }
 
-            # Extract result
-            if data.get('Abstract'):
-                options.append({
-                    'type': search_item['type'],
-                    'category': search_item['description'],
-                    'info': data.get('Abstract', ''),
-                    'source_url': data.get('AbstractURL', ''),
-                    'heading': data.get('Heading', search_item['type'])
-                })
+    responses = await gather_with_deadline(
+        [
+            instant_answer(search_item['query'], headers=headers, skip_disambig=1)
+            for search_item in search_queries
+        ],
+        deadline,
+        label="Safe Sleep"
+    )
 
-        except Exception as e:
-            print(f"Search error for {search_item['type']}: {str(e)}")
-            continue
+    options = []
+    for search_item, data in zip(search_queries, responses):
+        # Extract result
+        if data and data.get('Abstract'):
+            options.append({
+                'type': search_item['type'],
+                'category': search_item['description'],
+                'info': data.get('Abstract', ''),
+                'source_url': data.get('AbstractURL', ''),
+                'heading': data.get('Heading', search_item['type'])
+            })
 
     return options
 
 
+def search_safe_sleep_options(latitude: float, longitude: float, location_name: str, include_type: str = "all", max_distance_miles: int = 3) -> List[Dict]:
+    """
+    Search for safe sleep options using DuckDuckGo API
+
+    All searches run concurrently on the shared HTTP client; searches still
+    running after TOOL_DEADLINE_SECONDS are dropped.
+
+    Args:
+        latitude: User latitude
+        longitude: User longitude
+        location_name: City/location name
+        include_type: Type of options to search for
+        max_distance_miles: Max distance to search
+
+    Returns:
+        List of safe sleep options
+    """
+    try:
+        return http_client.run(_search_safe_sleep_options(location_name, include_type, Deadline()))
+    except Exception as e:
+        print(f"Safe sleep search error: {str(e)}")
+        return []
+
+
 def get_weather_recommendations(weather_condition: str) -> str:
     """
     Get specific recommendations based on weather
@@ -196,6 +162,42 @@ def get_weather_recommendations(weather_condition: str) -> str:
     return recommendations.get(weather_condition, "Stay safe and seek well-lit, populated areas.")
 
 
+async def _find_safe_sleep(latitude: float, longitude: float, include_type: str, weather_condition: str, max_distance_miles: int) -> Dict:
+    """Geocode and search under one shared deadline (runs on the HTTP client loop)"""
+    deadline = Deadline()
+
+    location_name = await reverse_geocode(latitude, longitude, deadline)
+    if not location_name:
+        location_name = f"{latitude}, {longitude}"
+
+    current_time = datetime.now().strftime("%I:%M %p")
+
+    options = await _search_safe_sleep_options(location_name, include_type, deadline)
+
+    return {
+        'location': location_name,
+        'latitude': latitude,
+        'longitude': longitude,
+        'current_time': current_time,
+        'search_radius_miles': max_distance_miles,
+        'weather_condition': weather_condition,
+        'options_found': len(options),
+        'options': options,
+        'weather_recommendation': get_weather_recommendations(weather_condition),
+        'safety_tips': get_safety_tips()
+    }
+
+
+def _safe_sleep_error(latitude: float, longitude: float, error: Exception) -> Dict:
+    """Fallback result when the safe sleep lookup fails"""
+    print(f"Error finding safe sleep options: {str(error)}")
+    return {
+        'error': str(error),
+        'location': f"{latitude}, {longitude}",
+        'recommendation': "Call 211 or local emergency services for immediate shelter assistance"
+    }
+
+
 def find_safe_sleep(latitude: float, longitude: float, include_type: str = "all", weather_condition: str = "clear", max_distance_miles: int = 3) -> Dict:
     """
     Main function to find safe places to sleep
@@ -211,36 +213,26 @@ def find_safe_sleep(latitude: float, longitude: float, include_type: str = "all"
         Dictionary with safe sleep options and recommendations
     """
     try:
-        location_name = get_location_name(latitude, longitude)
-        if not location_name:
-            location_name = f"{latitude}, {longitude}"
-
-        current_time = datetime.now().strftime("%I:%M %p")
-
-        options = search_safe_sleep_options(latitude, longitude, location_name, include_type, max_distance_miles)
+        return http_client.run(
+            _find_safe_sleep(latitude, longitude, include_type, weather_condition, max_distance_miles)
+        )
+    except Exception as e:
+        return _safe_sleep_error(latitude, longitude, e)
 
-        result = {
-            'location': location_name,
-            'latitude': latitude,
-            'longitude': longitude,
-            'current_time': current_time,
-            'search_radius_miles': max_distance_miles,
-            'weather_condition': weather_condition,
-            'options_found': len(options),
-            'options': options,
-            'weather_recommendation': get_weather_recommendations(weather_condition),
-            'safety_tips': get_safety_tips()
-        }
 
-        return result
+async def find_safe_sleep_async(latitude: float, longitude: float, include_type: str = "all", weather_condition: str = "clear", max_distance_miles: int = 3) -> Dict:
+    """
+    Async version of find_safe_sleep for callers already on an event loop
 
+    Returns:
+        Dictionary with safe sleep options and recommendations
+    """
+    try:
+        return await http_client.run_async(
+            _find_safe_sleep(latitude, longitude, include_type, weather_condition, max_distance_miles)
+        )
     except Exception as e:
-        print(f"Error finding safe sleep options: {str(e)}")
-        return {
-            'error': str(e),
-            'location': f"{latitude}, {longitude}",
-            'recommendation': "Call 211 or local emergency services for immediate shelter assistance"
-        }
+        return _safe_sleep_error(latitude, longitude, e)
 
 
 def get_safety_tips() -> List[str]:
@@ -3,9 +3,12 @@ Search tool for finding resources online and in local datasets
 """
 
 from vertexai.generative_models import FunctionDeclaration
-import requests
 from typing import List, Dict, Optional
+from urllib.parse import quote
 from .dataset_search import search_local_datasets, format_results_for_llm
+from .http_client import http_client, Deadline, run_with_deadline
+from .lookups import reverse_geocode, instant_answer
+from .result_encoding import RESOURCE_FIELDS
 
 # Define search function (searches local datasets first, then web)
 search_web_func = FunctionDeclaration(
@@ -22,6 +25,11 @@ search_web_func = FunctionDeclaration(
                 "type": "integer",
                 "description": "Maximum number of search results to return (default: 5)",
                 "default": 5
+            },
+            "fields": {
+                "type": "array",
+                "items": {"type": "string", "enum": list(RESOURCE_FIELDS)},
+                "description": "Optional resource fields to return, e.g. ['name', 'address', 'phone'] when only contact details are needed. Omit to get the default fields."
             }
         },
         "required": ["query"]
@@ -29,58 +37,100 @@ search_web_func = FunctionDeclaration(
 )
 
 
-def get_location_name(latitude: float, longitude: float) -> Optional[str]:
+def _search_local(query: str, max_results: int, latitude: Optional[float], longitude: Optional[float]) -> List[Dict]:
     """
-    Get city/location name from coordinates using Nominatim reverse geocoding
-
-    Args:
-        latitude: Latitude coordinate
-        longitude: Longitude coordinate
+    Search the local datasets and format any hits as a single result
 
-    Returns:
-        Location string (e.g., "Los Angeles, CA") or None if failed
+    The result's snippet is the text for the model; the structured resources
+    (for the frontend map and reports) travel separately under 'resources'.
     """
-    try:
-        # Use Nominatim (OpenStreetMap) reverse geocoding API
-        url = "https://nominatim.openstreetmap.org/reverse"
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'format': 'json',
-            'zoom': 10  # City level
-        }
-        headers = {
-            'User-Agent': 'HomelessAssistantApp/1.0'
-        }
+    print(f"[Search] Searching local datasets for: {query}")
+    local_results = search_local_datasets(query, latitude, longitude, max_results)
 
-        response = requests.get(url, params=params, headers=headers, timeout=5)
+    if not local_results:
+        return []
 
-        if response.status_code == 200:
-            data = response.json()
-            address = data.get('address', {})
+    # Format local results for the LLM
+    formatted_text = format_results_for_llm(local_results)
+    print(f"[Search] Found {len(local_results)} results in local datasets")
 
-            # Try to get city, state, country
-            city = address.get('city') or address.get('town') or address.get('village')
-            state = address.get('state')
-            country = address.get('country')
+    return [{
+        'title': 'Local Resources Database',
+        'snippet': formatted_text,
+        'url': 'local://database',
+        'resources': local_results
+    }]
 
-            if city and state:
-                return f"{city}, {state}"
-            elif city and country:
-                return f"{city}, {country}"
-            elif city:
-                return city
 
-        return None
-    except Exception as e:
-        print(f"Reverse geocoding error: {str(e)}")
-        return None
+async def _search_web(query: str, max_results: int, latitude: Optional[float], longitude: Optional[float], deadline: Deadline) -> List[Dict[str, str]]:
+    """
+    Web search through the DuckDuckGo Instant Answer API
+
+    Runs on the shared HTTP client. Reverse geocoding and the search share
+    one deadline and are served from the lookup caches when possible; if the
+    deadline runs out, the search info fallback is returned.
+    """
+    print("[Search] No local results found, falling back to web search")
+    # If location is provided, enhance the query with location
+    enhanced_query = query
+    if latitude is not None and longitude is not None:
+        location_name = await reverse_geocode(latitude, longitude, deadline)
+        if location_name:
+            enhanced_query = f"{query} near {location_name}"
+            print(f"[Search] Enhanced query with location: {enhanced_query}")
+        else:
+            # Fallback: use coordinates directly
+            enhanced_query = f"{query} near {latitude},{longitude}"
+            print(f"[Search] Using coordinates in query: {enhanced_query}")
+
+    data = await run_with_deadline(instant_answer(enhanced_query, skip_disambig=1), deadline) or {}
+
+    results = []
+
+    # Extract Abstract
+    if data.get('Abstract'):
+        results.append({
+            'title': data.get('Heading', 'Result'),
+            'snippet': data.get('Abstract', ''),
+            'url': data.get('AbstractURL', '')
+        })
+
+    # Extract Related Topics
+    for topic in data.get('RelatedTopics', [])[:max_results]:
+        if isinstance(topic, dict) and 'Text' in topic:
+            results.append({
+                'title': topic.get('Text', '').split(' - ')[0] if ' - ' in topic.get('Text', '') else 'Related',
+                'snippet': topic.get('Text', ''),
+                'url': topic.get('FirstURL', '')
+            })
+
+    return results[:max_results] if results else [
+        {
+            'title': 'Search Info',
+            'snippet': f'Search query: {enhanced_query}. For better results, try searching online directly or contact local 211 services.',
+            'url': f'https://duckduckgo.com/?q={quote(enhanced_query)}'
+        }
+    ]
 
 
-def perform_web_search(query: str, max_results: int = 5, latitude: Optional[float] = None, longitude: Optional[float] = None) -> List[Dict[str, str]]:
+def _search_unavailable(error: Exception) -> List[Dict[str, str]]:
+    """Fallback result when searching fails"""
+    print(f"Search error: {str(error)}")
+    return [
+        {
+            'title': 'Search Unavailable',
+            'snippet': f'Unable to search at this time. Try: Call 211 for local resources, or visit https://www.211.org',
+            'url': 'https://www.211.org'
+        }
+    ]
+
+
+async def perform_web_search_async(query: str, max_results: int = 5, latitude: Optional[float] = None, longitude: Optional[float] = None) -> List[Dict]:
     """
     Search for resources - first checks local datasets, then falls back to web search
 
+    Web lookups run on the shared HTTP client under TOOL_DEADLINE_SECONDS.
+
     Args:
         query: Search query string
         max_results: Maximum number of results to return
@@ -88,106 +138,41 @@ def perform_web_search(query: str, max_results: int = 5, latitude: Optional[floa
         longitude: Optional user longitude for location-based search
 
     Returns:
-        List of search results with title, snippet, and URL
+        List of search results with title, snippet, and URL (local dataset
+        hits also carry the structured 'resources')
     """
     try:
         # FIRST: Try to find results in local datasets
-        print(f"[Search] Searching local datasets for: {query}")
-        local_results = search_local_datasets(query, latitude, longitude, max_results)
-
+        local_results = _search_local(query, max_results, latitude, longitude)
         if local_results:
-            # Format local results for the LLM
-            formatted_text = format_results_for_llm(local_results)
-            print(f"[Search] Found {len(local_results)} results in local datasets")
-
-            # Also include structured data for the frontend map
-            import json
-            structured_data = json.dumps({
-                'type': 'resource_list',
-                'resources': local_results
-            })
+            return local_results
 
-            return [{
-                'title': 'Local Resources Database',
-                'snippet': formatted_text + f"\n\n<!-- RESOURCE_DATA:{structured_data} -->",
-                'url': 'local://database'
-            }]
-
-        # If no local results, fall back to web search
-        print("[Search] No local results found, falling back to web search")
-        # If location is provided, enhance the query with location
-        enhanced_query = query
-        if latitude is not None and longitude is not None:
-            location_name = get_location_name(latitude, longitude)
-            if location_name:
-                enhanced_query = f"{query} near {location_name}"
-                print(f"[Search] Enhanced query with location: {enhanced_query}")
-            else:
-                # Fallback: use coordinates directly
-                enhanced_query = f"{query} near {latitude},{longitude}"
-                print(f"[Search] Using coordinates in query: {enhanced_query}")
-
-        # Use DuckDuckGo's HTML API for better results
-        url = "https://html.duckduckgo.com/html/"
-        params = {
-            'q': enhanced_query
-        }
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        return await http_client.run_async(_search_web(query, max_results, latitude, longitude, Deadline()))
 
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-
-        if response.status_code == 200:
-            # Parse the HTML response to extract results
-            # For simplicity, we'll use the Instant Answer API instead
-            pass
+    except Exception as e:
+        return _search_unavailable(e)
 
-        # Fallback: Use DuckDuckGo Instant Answer API
-        instant_url = "https://api.duckduckgo.com/"
-        params = {
-            'q': enhanced_query,
-            'format': 'json',
-            'no_html': 1,
-            'skip_disambig': 1
-        }
 
-        response = requests.get(instant_url, params=params, timeout=10)
-        data = response.json()
+def perform_web_search(query: str, max_results: int = 5, latitude: Optional[float] = None, longitude: Optional[float] = None) -> List[Dict]:
+    """
+    Blocking version of perform_web_search_async
 
-        results = []
+    Args:
+        query: Search query string
+        max_results: Maximum number of results to return
+        latitude: Optional user latitude for location-based search
+        longitude: Optional user longitude for location-based search
 
-        # Extract Abstract
-        if data.get('Abstract'):
-            results.append({
-                'title': data.get('Heading', 'Result'),
-                'snippet': data.get('Abstract', ''),
-                'url': data.get('AbstractURL', '')
-            })
+    Returns:
+        List of search results with title, snippet, and URL (local dataset
+        hits also carry the structured 'resources')
+    """
+    try:
+        local_results = _search_local(query, max_results, latitude, longitude)
+        if local_results:
+            return local_results
 
-        # Extract Related Topics
-        for topic in data.get('RelatedTopics', [])[:max_results]:
-            if isinstance(topic, dict) and 'Text' in topic:
-                results.append({
-                    'title': topic.get('Text', '').split(' - ')[0] if ' - ' in topic.get('Text', '') else 'Related',
-                    'snippet': topic.get('Text', ''),
-                    'url': topic.get('FirstURL', '')
-                })
-
-        return results[:max_results] if results else [
-            {
-                'title': 'Search Info',
-                'snippet': f'Search query: {enhanced_query}. For better results, try searching online directly or contact local 211 services.',
-                'url': f'https://duckduckgo.com/?q={requests.utils.quote(enhanced_query)}'
-            }
-        ]
+        return http_client.run(_search_web(query, max_results, latitude, longitude, Deadline()))
 
     except Exception as e:
-        print(f"Search error: {str(e)}")
-        return [
-            {
-                'title': 'Search Unavailable',
-                'snippet': f'Unable to search at this time. Try: Call 211 for local resources, or visit https://www.211.org',
-                'url': 'https://www.211.org'
-            }
-        ]
+        return _search_unavailable(e)
@@ -0,0 +1,92 @@
+"""
+Local stub of the external services used by the chatbot tools
+
+Serves canned Nominatim reverse geocoding and DuckDuckGo Instant Answer
+responses so the tool lookups can be exercised offline. Point the tools at
+it through the URL overrides in http_client:
+
+    python tools/stub_server.py [--port 8089] [--delay 0.2]
+    NOMINATIM_URL=http://127.0.0.1:8089/reverse DUCKDUCKGO_API_URL=http://127.0.0.1:8089/ uvicorn main:app
+
+--delay adds latency to every response, e.g. to check that tool calls stay
+within TOOL_DEADLINE_SECONDS.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import time
+
+# Nominatim /reverse response (only the fields the tools read)
+REVERSE_GEOCODE_RESPONSE = {
+    "display_name": "San Diego, San Diego County, California, United States",
+    "address": {
+        "city": "San Diego",
+        "county": "San Diego County",
+        "state": "California",
+        "country": "United States",
+        "country_code": "us"
+    }
+}
+
+
+def instant_answer_response(query: str) -> Dict:
+    """Canned DuckDuckGo Instant Answer response echoing the query"""
+    return {
+        "Heading": query.title(),
+        "Abstract": f"Stub answer for '{query}': open daily 8am-5pm, walk-ins welcome.",
+        "AbstractURL": "https://example.org/stub",
+        "RelatedTopics": [
+            {"Text": f"{query.title()} - first related stub result", "FirstURL": "https://example.org/stub/1"},
+            {"Text": f"{query.title()} - second related stub result", "FirstURL": "https://example.org/stub/2"}
+        ]
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """GET /reverse answers as Nominatim; any other path as DuckDuckGo"""
+
+    delay = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip("/") == "/reverse":
+            body = REVERSE_GEOCODE_RESPONSE
+        else:
+            query = parse_qs(url.query).get("q", [""])[0]
+            body = instant_answer_response(query)
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        print(f"[Stub Server] {self.command} {self.path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve canned Nominatim and DuckDuckGo responses")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on")
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"✓ Stub server on http://{args.host}:{args.port}")
+    print(f"  NOMINATIM_URL=http://{args.host}:{args.port}/reverse")
+    print(f"  DUCKDUCKGO_API_URL=http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
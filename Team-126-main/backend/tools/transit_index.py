@@ -0,0 +1,272 @@
+"""
+In-process spatial index over the transit stops dataset
+
+Stops from datasets/transit_stops.json are bucketed into a uniform
+latitude/longitude grid so nearest-stop and radius queries only look at
+nearby cells. Used when PostGIS is not available (SQLite deployments and
+local dataset results).
+
+Run this module directly to benchmark build and query time.
+"""
+
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+TRANSIT_STOPS_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'datasets', 'transit_stops.json'
+)
+
+# Grid cell size in degrees (~1.1 km of latitude)
+DEFAULT_CELL_DEGREES = 0.01
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+class TransitStopIndex:
+    """Uniform grid index over transit stop coordinates"""
+
+    def __init__(self, stops: List[Dict], cell_degrees: float = DEFAULT_CELL_DEGREES):
+        """
+        Build the index
+
+        Args:
+            stops: Stops in transit_stops.json format (id, name, agency, coordinates, ...)
+            cell_degrees: Grid cell size in degrees
+        """
+        self.cell_degrees = cell_degrees
+
+        stops = [s for s in stops if s.get('coordinates')]
+        latitudes = np.array([s['coordinates']['latitude'] for s in stops], dtype=np.float64)
+        longitudes = np.array([s['coordinates']['longitude'] for s in stops], dtype=np.float64)
+
+        # Sort stops by cell so each cell is a contiguous slice
+        rows = np.floor(latitudes / cell_degrees).astype(np.int64)
+        cols = np.floor(longitudes / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+
+        self.stops = [stops[i] for i in order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        rows, cols = rows[order], cols[order]
+
+        self._cells: Dict[tuple, tuple] = {}
+        if len(self.stops):
+            boundaries = np.flatnonzero((np.diff(rows) != 0) | (np.diff(cols) != 0)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(self.stops)]))
+            for start, end in zip(starts, ends):
+                self._cells[(int(rows[start]), int(cols[start]))] = (int(start), int(end))
+
+    def __len__(self) -> int:
+        return len(self.stops)
+
+    def _candidates(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        """Indexes of stops in grid cells overlapping the radius bounding box"""
+        lat_delta = radius_km / KM_PER_DEGREE_LAT
+        cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+        lon_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+
+        row_min = math.floor((latitude - lat_delta) / self.cell_degrees)
+        row_max = math.floor((latitude + lat_delta) / self.cell_degrees)
+        col_min = math.floor((longitude - lon_delta) / self.cell_degrees)
+        col_max = math.floor((longitude + lon_delta) / self.cell_degrees)
+
+        # Very large radii: scanning every stop is cheaper than visiting empty cells
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self._cells):
+            return np.arange(len(self.stops))
+
+        slices = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                cell = self._cells.get((row, col))
+                if cell:
+                    slices.append(np.arange(cell[0], cell[1]))
+
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def _distances_km(self, latitude: float, longitude: float, indexes: np.ndarray) -> np.ndarray:
+        """Haversine distances in km from a point to the given stops"""
+        R = 6371  # Earth's radius in kilometers
+
+        lat1 = math.radians(latitude)
+        lat2 = np.radians(self.latitudes[indexes])
+        dlat = lat2 - lat1
+        dlon = np.radians(self.longitudes[indexes] - longitude)
+
+        a = np.sin(dlat/2)**2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+        return 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Find stops within a radius, nearest first
+
+        Args:
+            latitude: Query latitude
+            longitude: Query longitude
+            radius_km: Search radius in km
+            limit: Optional maximum number of stops
+
+        Returns:
+            List of stops with distance_km and distance_miles
+        """
+        indexes = self._candidates(latitude, longitude, radius_km)
+        if indexes.size == 0:
+            return []
+
+        distances = self._distances_km(latitude, longitude, indexes)
+        mask = distances <= radius_km
+        indexes, distances = indexes[mask], distances[mask]
+
+        order = np.argsort(distances, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [self._result(indexes[i], distances[i]) for i in order]
+
+    def nearest(self, latitude: float, longitude: float, k: int = 3, max_distance_km: Optional[float] = None) -> List[Dict]:
+        """
+        Find the k nearest stops
+
+        The search radius doubles until k stops are found inside it (or the
+        maximum distance is reached), so results are exact.
+
+        Args:
+            latitude: Query latitude
+            longitude: Query longitude
+            k: Number of stops to return
+            max_distance_km: Optional maximum distance in km
+
+        Returns:
+            List of up to k stops with distance_km and distance_miles, nearest first
+        """
+        if k <= 0 or not len(self.stops):
+            return []
+
+        radius = self.cell_degrees * KM_PER_DEGREE_LAT
+        if max_distance_km is not None:
+            radius = min(radius, max_distance_km)
+
+        while True:
+            results = self.within_radius(latitude, longitude, radius, limit=k)
+            if len(results) >= k or len(results) == len(self.stops):
+                return results
+            if max_distance_km is not None and radius >= max_distance_km:
+                return results
+            if radius > math.pi * 6371:
+                return results
+            radius *= 2
+            if max_distance_km is not None:
+                radius = min(radius, max_distance_km)
+
+    def _result(self, index: int, distance_km: float) -> Dict:
+        """Stop in the same format as hybrid_search.find_nearest_transit_stops"""
+        stop = self.stops[index]
+        return {
+            "id": stop.get('id'),
+            "name": stop.get('name'),
+            "latitude": float(self.latitudes[index]),
+            "longitude": float(self.longitudes[index]),
+            "agency": stop.get('agency'),
+            "code": stop.get('stop_code'),
+            "wheelchair_accessible": bool(stop.get('wheelchair_accessible')),
+            "distance_km": float(distance_km),
+            "distance_miles": float(distance_km) * 0.621371
+        }
+
+
+_transit_index: Optional[TransitStopIndex] = None
+
+
+def get_transit_index() -> Optional[TransitStopIndex]:
+    """
+    Get the process-wide transit stop index, building it on first use
+
+    Returns:
+        The index, or None if transit_stops.json is missing or unreadable
+    """
+    global _transit_index
+
+    if _transit_index is None:
+        try:
+            with open(TRANSIT_STOPS_FILE, 'r', encoding='utf-8') as f:
+                stops = json.load(f)
+            _transit_index = TransitStopIndex(stops)
+            print(f"[Transit Index] Indexed {len(_transit_index)} transit stops")
+        except Exception as e:
+            print(f"[Transit Index] Unable to build index: {str(e)}")
+            return None
+
+    return _transit_index
+
+
+def find_nearby_transit(latitude: float, longitude: float, limit: int = 3, max_distance_km: float = 1.0) -> List[Dict]:
+    """
+    Find the nearest transit stops without a database
+
+    Args:
+        latitude: Location latitude
+        longitude: Location longitude
+        limit: Maximum number of stops to return
+        max_distance_km: Maximum search radius in km
+
+    Returns:
+        List of nearest transit stops with distance (empty if the index is unavailable)
+    """
+    index = get_transit_index()
+    if index is None:
+        return []
+    return index.nearest(latitude, longitude, k=limit, max_distance_km=max_distance_km)
+
+
+def benchmark(queries: int = 2000):
+    """Benchmark index build and query time against a linear scan"""
+    with open(TRANSIT_STOPS_FILE, 'r', encoding='utf-8') as f:
+        stops = json.load(f)
+
+    print("=" * 60)
+    print("Transit Stop Index Benchmark")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    index = TransitStopIndex(stops)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"\nStops indexed:     {len(index):,}")
+    print(f"Grid cells:        {len(index._cells):,}")
+    print(f"Build time:        {build_ms:.1f} ms")
+
+    rng = np.random.default_rng(42)
+    picks = rng.integers(0, len(index), size=queries)
+    points = [
+        (index.latitudes[i] + rng.normal(0, 0.01), index.longitudes[i] + rng.normal(0, 0.01))
+        for i in picks
+    ]
+
+    start = time.perf_counter()
+    for lat, lon in points:
+        index.nearest(lat, lon, k=3, max_distance_km=1.0)
+    knn_us = (time.perf_counter() - start) / queries * 1e6
+
+    start = time.perf_counter()
+    for lat, lon in points:
+        index.within_radius(lat, lon, 2.0)
+    radius_us = (time.perf_counter() - start) / queries * 1e6
+
+    all_indexes = np.arange(len(index))
+    start = time.perf_counter()
+    for lat, lon in points[:200]:
+        distances = index._distances_km(lat, lon, all_indexes)
+        np.argsort(distances)[:3]
+    scan_us = (time.perf_counter() - start) / 200 * 1e6
+
+    print(f"\n{queries:,} queries near random stops:")
+    print(f"  k-nearest (k=3, 1 km):  {knn_us:8.1f} µs/query")
+    print(f"  radius (2 km):          {radius_us:8.1f} µs/query")
+    print(f"  linear scan (numpy):    {scan_us:8.1f} µs/query")
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    benchmark()
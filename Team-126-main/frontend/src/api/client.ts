@@ -109,6 +109,24 @@ export const api = {
     const response = await apiClient.get(`/conversation/${conversation_id}/report`)
     return response.data
   },
+
+  getReportJob: async (job_id: string) => {
+    const response = await apiClient.get(`/reports/${job_id}`)
+    return response.data
+  },
+
+  // Ends the conversation and polls the report job until the report is ready
+  waitForReport: async (conversation_id: number, intervalMs = 1500) => {
+    let job = await api.endConversation(conversation_id)
+    while (job.status === 'pending' || job.status === 'running') {
+      await new Promise(resolve => setTimeout(resolve, intervalMs))
+      job = await api.getReportJob(job.job_id)
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Report generation failed')
+    }
+    return job
+  },
 }
 
 export { API_BASE_URL }
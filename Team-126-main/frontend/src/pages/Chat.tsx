@@ -15,6 +15,7 @@ interface Message {
   role: 'user' | 'assistant'
   content: string
   timestamp: string
+  streaming?: boolean
 }
 
 // Character configuration - switch between different character types here
@@ -271,7 +272,7 @@ function Chat() {
 
         // Connect WebSocket
         const token = localStorage.getItem('auth-storage')
-        const websocket = new WebSocket(`ws://localhost:8000/ws/${data.conversation_id}`)
+        const websocket = new WebSocket(`ws://localhost:8000/ws/${data.conversation_id}?stream=true`)
 
         websocket.onopen = () => {
           console.log('WebSocket connected')
@@ -284,6 +285,23 @@ function Chat() {
             return
           }
 
+          // Streamed reply text - grow the in-progress assistant message
+          if (data.type === 'chunk') {
+            setMessages(prev => {
+              const last = prev[prev.length - 1]
+              if (last && last.streaming) {
+                return [...prev.slice(0, -1), { ...last, content: last.content + data.content }]
+              }
+              return [...prev, {
+                role: 'assistant',
+                content: data.content,
+                timestamp: new Date().toISOString(),
+                streaming: true
+              }]
+            })
+            return
+          }
+
           // Check if the response is a JSON string with location request
           let content = data.content
           console.log('[WS] Received content:', content)
@@ -296,6 +314,7 @@ function Chat() {
               console.log('[WS] Location request detected!')
 
               // DO NOT display the location request message - handle it silently in the background
+              setMessages(prev => prev.filter(m => !m.streaming))
 
               // Automatically get location
               console.log('[Location] Requesting location from browser...')
@@ -333,35 +352,20 @@ function Chat() {
             console.log('[WS] Not JSON or parse failed:', e)
           }
 
-          // Parse resource data if present
-          let displayContent = content
-          console.log('[Resources] Checking message for resource data...')
-          const resourceMatch = content.match(/<!-- RESOURCE_DATA:(.+?) -->/s)
-          if (resourceMatch) {
-            console.log('[Resources] Found resource data marker')
-            try {
-              const resourceData = JSON.parse(resourceMatch[1])
-              console.log('[Resources] Parsed resource data:', resourceData)
-              if (resourceData.type === 'resource_list' && resourceData.resources) {
-                setResources(resourceData.resources)
-                console.log('[Resources] Set', resourceData.resources.length, 'resources to state')
-              }
-              // Remove the resource data comment from display
-              displayContent = content.replace(/<!-- RESOURCE_DATA:.+? -->/s, '')
-            } catch (e) {
-              console.error('[Resources] Failed to parse resource data:', e)
-              console.error('[Resources] Raw match:', resourceMatch[1])
-            }
-          } else {
-            console.log('[Resources] No resource data found in message')
+          // Search results arrive alongside the reply, not inside its text
+          if (data.resources && data.resources.length > 0) {
+            setResources(data.resources)
+            console.log('[Resources] Set', data.resources.length, 'resources to state')
           }
+          const displayContent = content
 
           const newMessage: Message = {
             role: data.role,
             content: displayContent,
             timestamp: data.timestamp
           }
-          setMessages(prev => [...prev, newMessage])
+          // Replace the in-progress streamed message with the final reply
+          setMessages(prev => [...prev.filter(m => !m.streaming), newMessage])
 
           // Speak the response if in voice mode
           if (isVoiceMode && data.role === 'assistant') {
@@ -421,30 +425,13 @@ function Chat() {
     if (!conversationId) return
 
     try {
-      const data = await api.endConversation(conversationId)
-
-      // Parse resource data from report if present
-      console.log('[Report] Checking for resource data...')
-      const resourceMatch = data.report.match(/<!-- RESOURCE_DATA:(.+?) -->/s)
-      if (resourceMatch) {
-        console.log('[Report] Found resource data marker')
-        try {
-          const resourceData = JSON.parse(resourceMatch[1])
-          console.log('[Report] Parsed resource data:', resourceData)
-          if (resourceData.type === 'resource_list' && resourceData.resources) {
-            setReportResources(resourceData.resources)
-            console.log('[Report] Set', resourceData.resources.length, 'resources to state')
-          }
-          // Remove resource marker from displayed report
-          setReport(data.report.replace(/<!-- RESOURCE_DATA:.+? -->/s, ''))
-        } catch (e) {
-          console.error('[Report] Failed to parse resource data:', e)
-          setReport(data.report)
-        }
-      } else {
-        console.log('[Report] No resource data found')
-        setReport(data.report)
+      const data = await api.waitForReport(conversationId)
+
+      if (data.resources && data.resources.length > 0) {
+        setReportResources(data.resources)
+        console.log('[Report] Set', data.resources.length, 'resources to state')
       }
+      setReport(data.report)
 
       setShowReport(true)
     } catch (err) {
@@ -53,6 +53,7 @@ export function HealthDashboard() {
   const [vitals, setVitals] = useState<VitalSign[]>([])
   const [carePlans, setCarePlans] = useState<CarePlan[]>([])
   const [goals, setGoals] = useState<HealthGoal[]>([])
+  const [recentSymptomsCount, setRecentSymptomsCount] = useState(0)
   const [activeTab, setActiveTab] = useState('overview')
 
   // Medication form state
@@ -90,12 +91,13 @@ export function HealthDashboard() {
   const loadDashboardData = async () => {
     try {
       // Load all health data
-      const [medsRes, symptomsRes, vitalsRes, plansRes, goalsRes] = await Promise.all([
+      const [medsRes, symptomsRes, vitalsRes, plansRes, goalsRes, summaryRes] = await Promise.all([
         api.get(`/api/health/medications?user_id=${userId}`),
         api.get(`/api/health/symptoms?user_id=${userId}`),
         api.get(`/api/health/vitals?user_id=${userId}&limit=10`),
         api.get(`/api/health/care-plans?user_id=${userId}`),
-        api.get(`/api/health/goals?user_id=${userId}`)
+        api.get(`/api/health/goals?user_id=${userId}`),
+        api.get(`/api/health/dashboard/${userId}`)
       ])
 
       setMedications(medsRes.data)
@@ -103,6 +105,8 @@ export function HealthDashboard() {
       setVitals(vitalsRes.data)
       setCarePlans(plansRes.data)
       setGoals(goalsRes.data)
+      // The symptom list is paged, so the 7-day count comes from the summary
+      setRecentSymptomsCount(summaryRes.data.recent_symptoms_count)
     } catch (error) {
       console.error('Error loading health dashboard:', error)
     }
@@ -217,7 +221,7 @@ export function HealthDashboard() {
             </div>
             <div className="stat-card">
               <h3>📋 Symptoms Logged (7 days)</h3>
-              <p className="stat-number">{symptoms.length}</p>
+              <p className="stat-number">{recentSymptomsCount}</p>
             </div>
             <div className="stat-card">
               <h3>❤️ Vital Readings</h3>